@@ -13,7 +13,7 @@ load_dotenv()
 
 # Import Base and models
 from app.database import Base
-from app.models import User, Track, Job, File, CreditLedger
+from app.models import User, Track, Job, JobEvent, File, CreditLedger
 
 # this is the Alembic Config object
 config = context.config
@@ -0,0 +1,34 @@
+"""Materialized credit balances for ledger reconciliation
+
+Revision ID: 004
+Revises: 003
+Create Date: 2025-02-10 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'credit_balances',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('ledger_total', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('last_ledger_id', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('user_id'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    )
+    # Incremental runs resume from the highest folded-in ledger id
+    op.create_index('ix_credit_balances_last_ledger_id', 'credit_balances', ['last_ledger_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_credit_balances_last_ledger_id', 'credit_balances')
+    op.drop_table('credit_balances')
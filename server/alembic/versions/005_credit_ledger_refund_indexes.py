@@ -0,0 +1,42 @@
+"""Indexes for credit ledger refund lookups
+
+Revision ID: 005
+Revises: 004
+Create Date: 2025-02-12 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Original render debit for a track (refund lookups)
+    op.create_index(
+        'ix_credit_ledger_debit_lookup',
+        'credit_ledger',
+        ['track_id', 'user_id'],
+        postgresql_where=sa.text("delta < 0 AND reason = 'track_generate'"),
+    )
+    # At most one refund per track, so concurrent refunds can't both credit
+    # (also serves refund idempotency checks)
+    op.create_index(
+        'ix_credit_ledger_track_refund',
+        'credit_ledger',
+        ['track_id', 'user_id'],
+        unique=True,
+        postgresql_where=sa.text("delta > 0"),
+    )
+    # Per-user ledger history and reconciliation scans
+    op.create_index('ix_credit_ledger_user_id_id', 'credit_ledger', ['user_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_credit_ledger_user_id_id', 'credit_ledger')
+    op.drop_index('ix_credit_ledger_track_refund', 'credit_ledger')
+    op.drop_index('ix_credit_ledger_debit_lookup', 'credit_ledger')
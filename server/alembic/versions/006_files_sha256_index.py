@@ -0,0 +1,23 @@
+"""Index files.sha256 for analysis reuse
+
+Revision ID: 006
+Revises: 005
+Create Date: 2025-02-14 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_files_sha256', 'files', ['sha256'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_sha256', 'files')
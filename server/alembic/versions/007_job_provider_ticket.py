@@ -0,0 +1,23 @@
+"""Checkpoint provider tickets on jobs
+
+Revision ID: 007
+Revises: 006
+Create Date: 2025-02-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('provider_ticket', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('jobs', 'provider_ticket')
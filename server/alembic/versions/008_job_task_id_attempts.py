@@ -0,0 +1,34 @@
+"""Key jobs by Celery task id and count attempts
+
+Revision ID: 008
+Revises: 007
+Create Date: 2025-02-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('task_id', sa.String(), nullable=True))
+    op.add_column(
+        'jobs', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False)
+    )
+    # Jobs queued by create_track carried the Celery task id in provider_job_id
+    op.execute(
+        "UPDATE jobs SET task_id = provider_job_id, provider_job_id = NULL "
+        "WHERE status = 'QUEUED' AND provider_job_id IS NOT NULL"
+    )
+    op.create_index('ix_jobs_task_id', 'jobs', ['task_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_task_id', 'jobs')
+    op.drop_column('jobs', 'attempts')
+    op.drop_column('jobs', 'task_id')
@@ -0,0 +1,59 @@
+"""Partitioned job event log
+
+Revision ID: 009
+Revises: 008
+Create Date: 2025-02-19 10:00:00.000000
+
+"""
+from alembic import op
+from datetime import datetime, timezone
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+# Monthly partitions created up front; scripts/manage_job_event_partitions.py
+# keeps adding them ahead of time
+MONTHS_AHEAD = 3
+
+
+def create_month_partition(year: int, month: int) -> None:
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    next_year, next_month = year + month // 12, month % 12 + 1
+    op.execute(
+        f"CREATE TABLE IF NOT EXISTS job_events_y{year}m{month:02d} PARTITION OF job_events "
+        f"FOR VALUES FROM ('{year}-{month:02d}-01') TO ('{next_year}-{next_month:02d}-01')"
+    )
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TABLE job_events (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+            job_id INTEGER NOT NULL,
+            attempt INTEGER NOT NULL,
+            event VARCHAR NOT NULL,
+            level VARCHAR NOT NULL DEFAULT 'info',
+            provider VARCHAR,
+            provider_attempt INTEGER,
+            error_code VARCHAR,
+            message TEXT,
+            data JSON,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("CREATE INDEX ix_job_events_job_id_id ON job_events (job_id, id)")
+    # Catches rows outside the managed months so inserts never fail
+    op.execute("CREATE TABLE job_events_default PARTITION OF job_events DEFAULT")
+    now = datetime.now(timezone.utc)
+    for offset in range(MONTHS_AHEAD + 1):
+        create_month_partition(now.year, now.month + offset)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE job_events")
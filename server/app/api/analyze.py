@@ -1,19 +1,72 @@
 """
 Audio analysis API endpoints
 """
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request, status
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
-from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Optional, Tuple
+import hashlib
 import tempfile
 import os
 from app.services.audio_analyzer import get_audio_analyzer
 from app.services.storage import get_storage_service
-from app.database import get_db
-from sqlalchemy.orm import Session
+from app.database import get_async_db
+from sqlalchemy import select, case
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.file import File as FileModel, FileKind
 from app.models.user import User
 
-router = APIRouter()
+# Largest accepted request body for reference uploads
+MAX_REFERENCE_UPLOAD_BYTES = int(os.getenv("MAX_REFERENCE_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+
+def upload_too_large() -> HTTPException:
+    """413 error for uploads over the size cap"""
+    limit_mb = MAX_REFERENCE_UPLOAD_BYTES / (1024 * 1024)
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Upload too large (max {limit_mb:g}MB)",
+    )
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    Route that enforces MAX_REFERENCE_UPLOAD_BYTES while the body is read
+
+    Oversized uploads are rejected from Content-Length up front, or as soon
+    as the streamed body passes the cap, before multipart parsing spools
+    the rest of it to disk.
+    """
+
+    def get_route_handler(self) -> Callable:
+        original_handler = super().get_route_handler()
+
+        async def handler(request: Request):
+            content_length = request.headers.get("content-length")
+            if content_length and content_length.isdigit():
+                if int(content_length) > MAX_REFERENCE_UPLOAD_BYTES:
+                    raise upload_too_large()
+
+            receive = request.receive
+            received = 0
+
+            async def limited_receive():
+                nonlocal received
+                message = await receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > MAX_REFERENCE_UPLOAD_BYTES:
+                        raise upload_too_large()
+                return message
+
+            request._receive = limited_receive
+            return await original_handler(request)
+
+        return handler
+
+
+router = APIRouter(route_class=UploadLimitRoute)
 
 
 class AnalysisResponse(BaseModel):
@@ -24,39 +77,119 @@ class AnalysisResponse(BaseModel):
     file_id: Optional[int] = None
 
 
+# Bytes read from the upload per chunk while spooling to disk
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+async def spool_upload(file: UploadFile, suffix: str) -> Tuple[str, str]:
+    """
+    Copy an upload to a temp file in chunks, hashing as it goes
+    Returns (tmp_path, sha256 hex digest)
+
+    Hashing and writing run in the threadpool, off the event loop.
+    """
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+
+        def write_chunk(chunk: bytes):
+            digest.update(chunk)
+            tmp_file.write(chunk)
+
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                await run_in_threadpool(write_chunk, chunk)
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+    return tmp_file.name, digest.hexdigest()
+
+
+def reference_object_key(sha256: str, filename: Optional[str]) -> str:
+    """Content-addressed storage key, shared by every upload of the same bytes"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    return f"references/sha256/{sha256[:2]}/{sha256}{ext}"
+
+
+def analysis_response(file_record: FileModel) -> AnalysisResponse:
+    """Analysis response for a stored reference file"""
+    return AnalysisResponse(
+        bpm=file_record.bpm,
+        key=file_record.key,
+        energy=file_record.energy,
+        loudness=file_record.loudness,
+        file_id=file_record.id,
+    )
+
+
 @router.post("/reference", response_model=AnalysisResponse)
 async def analyze_reference(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # TODO: Add authentication dependency
 ):
     """Analyze reference audio file for BPM, key, energy, loudness"""
     # TODO: Get current user from auth
-    user = db.query(User).first()
+    user = await db.scalar(select(User).limit(1))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_path = tmp_file.name
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp3"
+    tmp_path, sha256 = await spool_upload(file, suffix)
 
     try:
-        # Analyze audio
-        analyzer = get_audio_analyzer()
-        analysis = analyzer.analyze(tmp_path)
+        # Known bytes: prefer the user's own record, else any analyzed copy
+        known = await db.scalar(
+            select(FileModel)
+            .filter(FileModel.sha256 == sha256, FileModel.kind == FileKind.REFERENCE)
+            .order_by(
+                case((FileModel.user_id == user.id, 0), else_=1),
+                FileModel.bpm.is_(None),
+                FileModel.id,
+            )
+            .limit(1)
+        )
 
-        # Upload to storage
+        # Same bytes are stored under their content address, unless the
+        # object has gone missing since; then they are stored again
         storage = get_storage_service()
-        object_key = f"references/{user.id}/{file.filename}"
-        file_url = storage.upload_file(tmp_path, object_key, content_type=file.content_type)
+        file_url = None
+        if known is not None:
+            known_key = storage.object_key_from_url(known.url)
+            if known_key and await run_in_threadpool(storage.object_exists, known_key):
+                file_url = known.url
+        if file_url is None:
+            object_key = reference_object_key(sha256, file.filename)
+            file_url = await run_in_threadpool(
+                storage.upload_file, tmp_path, object_key, content_type=file.content_type
+            )
+
+        if known is not None and known.user_id == user.id and known.bpm is not None:
+            if known.url != file_url:
+                known.url = file_url
+                await db.commit()
+            return analysis_response(known)
+
+        if known is not None and known.bpm is not None:
+            analysis = {
+                "bpm": known.bpm,
+                "key": known.key,
+                "energy": known.energy,
+                "loudness": known.loudness,
+                "duration_s": known.duration_s,
+            }
+        else:
+            # Analyze audio in the process pool
+            analyzer = get_audio_analyzer()
+            analysis = await analyzer.analyze_async(tmp_path)
 
         # Create file record
         file_record = FileModel(
             user_id=user.id,
             kind=FileKind.REFERENCE,
             url=file_url,
+            sha256=sha256,
             duration_s=analysis.get("duration_s"),
             bpm=analysis.get("bpm"),
             key=analysis.get("key"),
@@ -64,16 +197,8 @@ async def analyze_reference(
             loudness=analysis.get("loudness"),
         )
         db.add(file_record)
-        db.commit()
-        db.refresh(file_record)
+        await db.commit()
 
-        return AnalysisResponse(
-            bpm=analysis.get("bpm"),
-            key=analysis.get("key"),
-            energy=analysis.get("energy"),
-            loudness=analysis.get("loudness"),
-            file_id=file_record.id,
-        )
+        return analysis_response(file_record)
     finally:
         os.unlink(tmp_path)
-
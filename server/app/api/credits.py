@@ -2,12 +2,13 @@
 Credits API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
 import stripe
 import os
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
 from app.services.credit_service import get_credit_service
 from app.services.pricing_service import get_pricing_service
@@ -38,12 +39,12 @@ class PurchaseResponse(BaseModel):
 
 @router.get("", response_model=CreditsResponse)
 async def get_credits(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # TODO: Add authentication dependency
 ):
     """Get user's current credits and pricing breakdown"""
     # TODO: Get current user from auth
-    user = db.query(User).first()
+    user = await db.scalar(select(User).limit(1))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -62,12 +63,12 @@ async def get_credits(
 @router.post("/purchase", response_model=PurchaseResponse)
 async def purchase_credits(
     request: PurchaseRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # TODO: Add authentication dependency
 ):
     """Create Stripe checkout session for credit purchase"""
     # TODO: Get current user from auth
-    user = db.query(User).first()
+    user = await db.scalar(select(User).limit(1))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -126,12 +127,12 @@ async def purchase_credits(
 @router.post("/update-ppp")
 async def update_ppp_band(
     ppp_band: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # TODO: Add authentication dependency
 ):
     """Update user's PPP band"""
     # TODO: Get current user from auth
-    user = db.query(User).first()
+    user = await db.scalar(select(User).limit(1))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -143,23 +144,23 @@ async def update_ppp_band(
         )
     
     user.ppp_band = ppp_band
-    db.commit()
+    await db.commit()
     
     return {"ppp_band": ppp_band}
 
 
 @router.post("/toggle-solidarity")
 async def toggle_solidarity(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # TODO: Add authentication dependency
 ):
     """Toggle solidarity pricing opt-in"""
     # TODO: Get current user from auth
-    user = db.query(User).first()
+    user = await db.scalar(select(User).limit(1))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     user.solidarity_opt_in = not user.solidarity_opt_in
-    db.commit()
+    await db.commit()
     
     return {"solidarity_opt_in": user.solidarity_opt_in}
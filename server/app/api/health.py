@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from typing import Dict, Optional
 import os
 import logging
+from app.services.provider_registry import get_provider_registry
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +32,8 @@ async def health_check():
 
 @router.get("/health/providers", response_model=ProviderHealthResponse)
 async def provider_health():
-    """Check provider availability"""
+    """Check provider availability (reuses cached provider clients)"""
+    registry = get_provider_registry()
     fal_status = "ok"
     fal_error = None
     replicate_status = "ok"
@@ -39,8 +41,7 @@ async def provider_health():
     
     # Check FAL
     try:
-        from app.services.fal_provider import FALProvider
-        provider = FALProvider()
+        registry.get("fal")
         fal_status = "ok"
     except Exception as e:
         fal_status = "fail"
@@ -49,8 +50,7 @@ async def provider_health():
     
     # Check Replicate
     try:
-        from app.services.replicate_provider import ReplicateProvider
-        provider = ReplicateProvider()
+        registry.get("replicate")
         replicate_status = "ok"
     except Exception as e:
         replicate_status = "fail"
@@ -1,31 +1,125 @@
 """
 Job API endpoints for tracking generation progress
 """
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Optional
-from app.database import get_db
+from typing import AsyncIterator, List, Optional
+import asyncio
+import json
+import os
+from app.database import get_async_db, AsyncSessionLocal
 from app.models.job import Job, JobStatus
+from app.models.job_event import JobEvent
+from app.services.job_progress import RESYNC, get_job_progress_hub, job_payload
 
 router = APIRouter()
 
+# Most jobs returned by one batch status request
+MAX_BATCH_JOBS = int(os.getenv("MAX_BATCH_JOBS", "100"))
+# Most job events returned by one log page
+MAX_JOB_LOG_PAGE = int(os.getenv("MAX_JOB_LOG_PAGE", "200"))
+# Seconds between keepalive comments on an idle event stream
+JOB_EVENTS_KEEPALIVE_S = float(os.getenv("JOB_EVENTS_KEEPALIVE_S", "15"))
+
+TERMINAL_STATUSES = {JobStatus.COMPLETE.value, JobStatus.FAILED.value, JobStatus.CANCELLED.value}
+
 
 class JobResponse(BaseModel):
     id: int
     track_id: int
     status: str
     progress: float
+    attempts: int = 0
     error: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
+@router.get("", response_model=List[JobResponse])
+async def get_jobs(
+    ids: List[int] = Query(..., description="Job ids, e.g. ?ids=1&ids=2"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get the status of many jobs in one query (unknown ids are omitted)"""
+    if len(ids) > MAX_BATCH_JOBS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_JOBS} jobs per request"
+        )
+    result = await db.scalars(select(Job).where(Job.id.in_(set(ids))).order_by(Job.id))
+    return result.all()
+
+
+async def load_job_payload(job_id: int) -> Optional[dict]:
+    """Current job status from the database, in a short-lived session"""
+    async with AsyncSessionLocal() as db:
+        job = await db.get(Job, job_id)
+        return job_payload(job) if job else None
+
+
+def sse_event(payload: dict) -> str:
+    return f"event: progress\ndata: {json.dumps(payload)}\n\n"
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: int):
+    """
+    Server-sent events with job status until the job finishes
+
+    Updates are pushed from workers over Redis pub/sub. The job is also
+    re-read whenever the subscription is (re)established and on idle
+    keepalive intervals, so an update published while the subscription
+    was not live can't leave the stream open forever.
+    """
+    hub = get_job_progress_hub()
+    # Subscribe before reading so no update falls between the two
+    queue = hub.subscribe(job_id)
+    try:
+        payload = await load_job_payload(job_id)
+    except BaseException:
+        hub.unsubscribe(job_id, queue)
+        raise
+    if payload is None:
+        hub.unsubscribe(job_id, queue)
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events() -> AsyncIterator[str]:
+        current = payload
+        try:
+            yield sse_event(current)
+            while current["status"] not in TERMINAL_STATUSES:
+                idle = False
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=JOB_EVENTS_KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    update, idle = RESYNC, True
+                if update is RESYNC:
+                    update = await load_job_payload(job_id)
+                    if update is None:
+                        return
+                if update == current:
+                    if idle:
+                        yield ": keepalive\n\n"
+                    continue
+                current = update
+                yield sse_event(current)
+        finally:
+            hub.unsubscribe(job_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/{job_id}", response_model=JobResponse)
-async def get_job(job_id: int, db: Session = Depends(get_db)):
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get job status and progress"""
-    job = db.query(Job).filter(Job.id == job_id).first()
+    job = await db.get(Job, job_id)
     if not job:
         raise HTTPException(
             status_code=404, detail="Job not found"
@@ -34,44 +128,45 @@ async def get_job(job_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/{job_id}/logs")
-async def get_job_logs(job_id: int, limit: int = 50, db: Session = Depends(get_db)):
+async def get_job_logs(
+    job_id: int,
+    limit: int = Query(50, ge=1, le=MAX_JOB_LOG_PAGE),
+    after: Optional[int] = Query(None, description="Cursor: next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    Get recent logs for a job (last N provider messages)
-    Returns structured log entries with provider, attempt, error_code, etc.
+    Get a job's event log in order, one page at a time
+    Returns structured entries with provider, attempt, error_code, etc.
     """
-    job = db.query(Job).filter(Job.id == job_id).first()
+    job = await db.get(Job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
-    
-    # Get track to see provider used
-    from app.models.track import Track
-    track = db.query(Track).filter(Track.id == job.track_id).first()
-    
-    logs = []
-    
-    # Add job status changes as log entries
-    if job.error:
-        error_code = "403" if "403" in job.error or "Forbidden" in job.error else "unknown"
-        logs.append({
-            "timestamp": job.updated_at.isoformat() if job.updated_at else None,
-            "provider": track.provider if track else "unknown",
-            "attempt": 1,
-            "error_code": error_code,
-            "message": job.error,
-            "status": job.status.value,
-        })
-    
-    # Add track status info
-    if track:
-        logs.append({
-            "timestamp": track.updated_at.isoformat() if track.updated_at else track.created_at.isoformat() if track.created_at else None,
-            "provider": track.provider,
-            "attempt": 1,
-            "error_code": None,
-            "message": f"Track status: {track.status.value}",
-            "status": track.status.value,
-        })
-    
-    # Return last N entries
-    return {"job_id": job_id, "logs": logs[-limit:]}
 
+    # Keyset pagination on (job_id, id): each page is an index range scan
+    query = select(JobEvent).where(JobEvent.job_id == job_id)
+    if after is not None:
+        query = query.where(JobEvent.id > after)
+    events = (await db.scalars(query.order_by(JobEvent.id).limit(limit + 1))).all()
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    logs = [
+        {
+            "id": event.id,
+            "timestamp": event.created_at.isoformat() if event.created_at else None,
+            "event": event.event,
+            "level": event.level,
+            "provider": event.provider,
+            "attempt": event.attempt,
+            "provider_attempt": event.provider_attempt,
+            "error_code": event.error_code,
+            "message": event.message,
+            "data": event.data,
+        }
+        for event in events
+    ]
+    return {
+        "job_id": job_id,
+        "logs": logs,
+        "next_cursor": events[-1].id if has_more else None,
+    }
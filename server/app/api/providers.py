@@ -0,0 +1,70 @@
+"""
+Provider webhook endpoints for asynchronous render completion
+"""
+from fastapi import APIRouter, Request, HTTPException, status
+import json
+import logging
+import os
+import redis.asyncio as aioredis
+from app.services.model_provider import get_provider_class
+from app.services.generation_engine import (
+    webhook_pending_key, webhook_result_key, WEBHOOK_RESULT_TTL_S,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+redis_client = aioredis.from_url(
+    os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+)
+
+
+@router.post("/webhook/{provider_name}")
+async def provider_webhook(provider_name: str, request: Request):
+    """
+    Receive a provider completion webhook and hand it to the waiting worker
+
+    Only signed webhooks for renders this service submitted are accepted;
+    a provider without webhook verification configured gets none at all.
+    """
+    try:
+        provider_class = get_provider_class(provider_name)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown provider")
+
+    if not provider_class.webhooks_configured():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Webhooks disabled")
+
+    body = await request.body()
+    if not await provider_class.verify_webhook(request.headers, body):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid signature")
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payload")
+
+    request_id, outcome = provider_class.parse_webhook(payload)
+    if not request_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing request id")
+
+    # Claim the pending marker so each submitted render takes one outcome
+    if not await redis_client.delete(webhook_pending_key(provider_name, request_id)):
+        logger.warning(
+            f"Provider webhook for unknown or finished render: provider={provider_name}, "
+            f"request_id={request_id}"
+        )
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown request")
+
+    await redis_client.set(
+        webhook_result_key(provider_name, request_id),
+        json.dumps(outcome),
+        ex=WEBHOOK_RESULT_TTL_S,
+    )
+    logger.info(
+        f"Provider webhook received: provider={provider_name}, request_id={request_id}, "
+        f"ok={'error' not in outcome}"
+    )
+
+    return {"status": "success"}
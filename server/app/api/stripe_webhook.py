@@ -5,8 +5,8 @@ from fastapi import APIRouter, Request, HTTPException, Header, Depends
 import stripe
 import os
 import json
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.services.credit_service import get_credit_service
 from app.services.pricing_service import get_pricing_service
 
@@ -20,7 +20,7 @@ webhook_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
 async def stripe_webhook(
     request: Request,
     stripe_signature: str = Header(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Handle Stripe webhook events"""
     if not stripe_signature:
@@ -52,8 +52,8 @@ async def stripe_webhook(
 
         if user_id and credits_amount:
             credit_service = get_credit_service()
-            credit_service.credit_credits(
-                db,
+            await db.run_sync(
+                credit_service.credit_credits,
                 int(user_id),
                 credits_amount,
                 "purchase",
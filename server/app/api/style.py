@@ -2,13 +2,14 @@
 Style system API endpoints
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional, List
 import re
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
 from app.models.series import Series
 from app.models.track import Track
@@ -89,10 +90,10 @@ def get_default_series_geometry(user_style_seed: int) -> dict:
     }
 
 
-def get_current_user(db: Session = Depends(get_db)) -> User:
+async def get_current_user(db: AsyncSession = Depends(get_async_db)) -> User:
     """Get current user - TODO: Replace with actual auth"""
     # For now, return first user (replace with auth middleware)
-    user = db.query(User).first()
+    user = await db.scalar(select(User).limit(1))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -101,7 +102,7 @@ def get_current_user(db: Session = Depends(get_db)) -> User:
 @router.get("/me", response_model=dict)
 async def get_user_style_info(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get user style seed and unlocks"""
     if not STYLE_SEED_ENABLED:
@@ -111,7 +112,7 @@ async def get_user_style_info(
     style_seed = get_or_create_style_seed(user)
     if user.user_style_seed is None:
         user.user_style_seed = style_seed
-        db.commit()
+        await db.commit()
     
     return {
         "user_style_seed": style_seed,
@@ -133,13 +134,13 @@ async def get_unlocks(
 @router.post("/unlocks/recompute")
 async def recompute_unlocks(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Recompute and update user unlocks (admin/dev endpoint)"""
     if not STYLE_UNLOCKS_ENABLED:
         return UnlocksResponse(unlocks=[])
     
-    updated_unlocks = update_user_unlocks(user.id, db)
+    updated_unlocks = await db.run_sync(lambda session: update_user_unlocks(user.id, session))
     
     # Emit telemetry event
     from app.middleware.observability import emit_event
@@ -155,7 +156,7 @@ async def recompute_unlocks(
 async def create_series(
     series_data: SeriesCreate,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Create a new series"""
     if not STYLE_SERIES_ENABLED:
@@ -165,13 +166,13 @@ async def create_series(
     style_seed = get_or_create_style_seed(user)
     if user.user_style_seed is None:
         user.user_style_seed = style_seed
-        db.commit()
+        await db.commit()
     
     # Generate slug
     base_slug = slugify(series_data.title)
     slug = base_slug
     counter = 1
-    while db.query(Series).filter(Series.slug == slug).first():
+    while await db.scalar(select(Series.id).filter(Series.slug == slug).limit(1)):
         slug = f"{base_slug}-{counter}"
         counter += 1
     
@@ -188,8 +189,8 @@ async def create_series(
     )
     
     db.add(series)
-    db.commit()
-    db.refresh(series)
+    await db.commit()
+    await db.refresh(series)
     
     # Emit telemetry event
     from app.middleware.observability import emit_event
@@ -214,14 +215,16 @@ async def create_series(
 async def list_series(
     user_id: Optional[int] = None,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """List series (defaults to current user's series)"""
     if not STYLE_SERIES_ENABLED:
         return []
     
     target_user_id = user_id if user_id else user.id
-    series_list = db.query(Series).filter(Series.user_id == target_user_id).all()
+    series_list = (
+        await db.scalars(select(Series).filter(Series.user_id == target_user_id))
+    ).all()
     
     return [
         SeriesResponse(
@@ -241,16 +244,18 @@ async def list_series(
 async def get_series(
     series_id: int,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Get a specific series"""
     if not STYLE_SERIES_ENABLED:
         raise HTTPException(status_code=404, detail="Series not found")
     
-    series = db.query(Series).filter(
-        Series.id == series_id,
-        Series.user_id == user.id
-    ).first()
+    series = await db.scalar(
+        select(Series).filter(
+            Series.id == series_id,
+            Series.user_id == user.id
+        ).limit(1)
+    )
     
     if not series:
         raise HTTPException(status_code=404, detail="Series not found")
@@ -271,16 +276,18 @@ async def update_series(
     series_id: int,
     series_data: SeriesUpdate,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Update a series (limited fields)"""
     if not STYLE_SERIES_ENABLED:
         raise HTTPException(status_code=404, detail="Series not found")
     
-    series = db.query(Series).filter(
-        Series.id == series_id,
-        Series.user_id == user.id
-    ).first()
+    series = await db.scalar(
+        select(Series).filter(
+            Series.id == series_id,
+            Series.user_id == user.id
+        ).limit(1)
+    )
     
     if not series:
         raise HTTPException(status_code=404, detail="Series not found")
@@ -292,8 +299,8 @@ async def update_series(
     if series_data.geometry is not None:
         series.geometry = series_data.geometry
     
-    db.commit()
-    db.refresh(series)
+    await db.commit()
+    await db.refresh(series)
     
     return SeriesResponse(
         id=series.id,
@@ -309,11 +316,13 @@ async def update_series(
 @router.get("/health", response_model=dict)
 async def health_check(
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Health check for style system"""
     seed_exists = user.user_style_seed is not None
-    series_count = db.query(Series).filter(Series.user_id == user.id).count()
+    series_count = await db.scalar(
+        select(func.count(Series.id)).filter(Series.user_id == user.id)
+    )
     unlocks_count = len(user.style_unlocks or [])
     
     return {
@@ -1,13 +1,18 @@
 """
 Track API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
-import httpx
-from app.database import get_db
+import os
+from math import ceil
+import uuid
+from app.database import get_async_db
 from app.models.track import Track, TrackStatus
 from app.models.user import User
 from app.models.series import Series
@@ -16,6 +21,7 @@ from app.services.storage import get_storage_service
 from app.services.credit_service import get_credit_service
 from app.services.content_policy import get_content_policy
 from app.services.free_mode_service import get_free_mode_service
+from app.services.http_client import get_http_client
 from app.utils.style_seed import get_or_create_style_seed, update_user_unlocks
 from app.api.style import get_default_series_palette, get_default_series_geometry, slugify
 
@@ -60,12 +66,12 @@ class CostPreviewResponse(BaseModel):
 @router.get("/cost-preview", response_model=CostPreviewResponse)
 async def get_cost_preview(
     duration_s: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # TODO: Add authentication dependency
 ):
     """Get cost preview for a track generation"""
     # TODO: Get current user from auth
-    user = db.query(User).first()
+    user = await db.scalar(select(User).limit(1))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -92,13 +98,19 @@ async def get_cost_preview(
 @router.post("", response_model=dict)
 async def create_track(
     track_data: TrackCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # TODO: Add authentication dependency
 ):
-    """Create a new track generation job"""
+    """
+    Create a new track generation job
+
+    Series, track, credit debit, job and unlock writes are flushed into a
+    single transaction and committed once; any failure before the commit
+    rolls all of them back.
+    """
     # TODO: Get current user from auth
     # For now, create a placeholder user
-    user = db.query(User).first()
+    user = await db.scalar(select(User).limit(1))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -107,24 +119,18 @@ async def create_track(
 
     # Check content policy
     content_policy = get_content_policy()
-    allowed, reason = content_policy.check_prompt(track_data.prompt)
+    allowed, reason = content_policy.check_text(track_data.prompt, track_data.lyrics)
     if not allowed:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=reason,
         )
 
-    if track_data.lyrics:
-        allowed, reason = content_policy.check_lyrics(track_data.lyrics)
-        if not allowed:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=reason,
-            )
-
     # Check quota and credits (includes free mode checks)
     credit_service = get_credit_service()
-    allowed, error_msg = credit_service.check_quota(db, user.id, track_data.duration_s)
+    allowed, error_msg = await db.run_sync(
+        credit_service.check_quota, user.id, track_data.duration_s
+    )
     if not allowed:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -135,17 +141,18 @@ async def create_track(
     series_id = track_data.series_id
     if series_id is None:
         # Get or create default series for user
-        default_series = db.query(Series).filter(
-            Series.user_id == user.id,
-            Series.slug == "default"
-        ).first()
+        default_series = await db.scalar(
+            select(Series).filter(
+                Series.user_id == user.id,
+                Series.slug == "default"
+            ).limit(1)
+        )
         
         if not default_series:
             # Ensure style seed exists
             style_seed = get_or_create_style_seed(user)
             if user.user_style_seed is None:
                 user.user_style_seed = style_seed
-                db.commit()
             
             default_series = Series(
                 user_id=user.id,
@@ -155,16 +162,17 @@ async def create_track(
                 geometry=get_default_series_geometry(style_seed),
             )
             db.add(default_series)
-            db.commit()
-            db.refresh(default_series)
+            await db.flush()
         
         series_id = default_series.id
     else:
         # Validate series belongs to user
-        series = db.query(Series).filter(
-            Series.id == series_id,
-            Series.user_id == user.id
-        ).first()
+        series = await db.scalar(
+            select(Series).filter(
+                Series.id == series_id,
+                Series.user_id == user.id
+            ).limit(1)
+        )
         if not series:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -189,45 +197,80 @@ async def create_track(
         status=TrackStatus.QUEUED,
     )
     db.add(track)
-    db.commit()
-    db.refresh(track)
+    await db.flush()
 
     # Debit credits (handles free mode internally)
-    success = credit_service.debit_credits(
-        db, user.id, track_data.duration_s, track_id=track.id
+    success = await db.run_sync(
+        credit_service.debit_credits,
+        user.id,
+        track_data.duration_s,
+        track_id=track.id,
+        commit=False,
     )
     if not success:
-        # Rollback track creation if credit debit fails
-        db.delete(track)
-        db.commit()
+        # Nothing has been committed yet; discard the track and series
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Failed to debit credits. Please try again.",
         )
 
-    # Queue Celery job for music generation
-    from app.workers.generate_music import generate_music_task
-    celery_job = generate_music_task.delay(track.id)
-
-    # Create job record
+    # Create the render's job record; the Celery task id is chosen up front
+    # so the job row can be written in this transaction and the task queued
+    # after it, and the worker advances this same row
+    task_id = str(uuid.uuid4())
     job = Job(
         track_id=track.id,
-        provider_job_id=str(celery_job.id),
+        task_id=task_id,
         status=JobStatus.QUEUED,
         progress=0.0,
     )
     db.add(job)
-    db.commit()
-    db.refresh(job)
 
-    credits_required = credit_service.get_credits_required_for_duration(track_data.duration_s)
-    
-    # Update unlocks after track creation (async, don't block)
+    # Update unlocks in a savepoint so a failure there can't abort the track
     try:
-        update_user_unlocks(user.id, db)
+        async with db.begin_nested():
+            await db.run_sync(
+                lambda session: update_user_unlocks(user.id, session, commit=False)
+            )
     except Exception:
         # Don't fail track creation if unlock update fails
         pass
+
+    await db.commit()
+
+    # Queue Celery job only once the track is committed and visible to workers
+    from app.workers.generate_music import generate_music_task
+    from app.services.render_scheduler import get_render_scheduler
+    scheduler = get_render_scheduler()
+    # route() counts the render against the user's fairness counter; every
+    # path from here that doesn't enqueue the task must release() it
+    route = await run_in_threadpool(
+        scheduler.route,
+        user.id,
+        user.plan,
+        get_free_mode_service().is_enabled(),
+        track_data.duration_s,
+    )
+    try:
+        generate_music_task.apply_async(
+            args=[track.id], kwargs={"user_id": user.id}, task_id=task_id, **route
+        )
+    except Exception as e:
+        await run_in_threadpool(scheduler.release, user.id)
+        # The broker can't join the DB transaction: fail the track and refund
+        track.status = TrackStatus.FAILED
+        track.error_message = f"Failed to queue generation: {e}"
+        job.status = JobStatus.FAILED
+        job.error = track.error_message
+        await db.run_sync(credit_service.refund_failed_render, user.id, track.id)
+        await db.commit()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not queue generation. Credits have been refunded.",
+        )
+
+    credits_required = credit_service.get_credits_required_for_duration(track_data.duration_s)
     
     # Emit telemetry event
     from app.middleware.observability import emit_event
@@ -248,9 +291,9 @@ async def create_track(
 
 
 @router.get("/{track_id}", response_model=TrackResponse)
-async def get_track(track_id: int, db: Session = Depends(get_db)):
+async def get_track(track_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get track details"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Track not found"
@@ -262,7 +305,7 @@ async def get_track(track_id: int, db: Session = Depends(get_db)):
     # Get series info if exists
     series_info = None
     if track.series_id:
-        series = db.query(Series).filter(Series.id == track.series_id).first()
+        series = await db.get(Series, track.series_id)
         if series:
             series_info = {
                 "id": series.id,
@@ -289,11 +332,11 @@ async def get_track(track_id: int, db: Session = Depends(get_db)):
 @router.post("/{track_id}/increment-visual-version", response_model=dict)
 async def increment_visual_version(
     track_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # TODO: Add authentication dependency
 ):
     """Increment visual version for cover regeneration"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Track not found"
@@ -302,8 +345,8 @@ async def increment_visual_version(
     # TODO: Verify user owns track
     
     track.visual_version += 1
-    db.commit()
-    db.refresh(track)
+    await db.commit()
+    await db.refresh(track)
     
     return {
         "track_id": track.id,
@@ -316,38 +359,28 @@ class CoverSaveRequest(BaseModel):
     dark: Optional[bool] = False
 
 
-# Rate limiting for cover saves (30/min per user)
-from collections import defaultdict
-from time import time
+# Rate limiting for cover saves (30/min per user by default)
+from app.services.rate_limiter import get_rate_limiter
 
-_cover_save_rates: dict[int, list[float]] = defaultdict(list)
-RATE_LIMIT_COVER_SAVES = 30  # per minute
-RATE_LIMIT_WINDOW = 60  # seconds
 
-def check_cover_rate_limit(user_id: int) -> bool:
-    """Check if user has exceeded cover save rate limit"""
-    now = time()
-    # Clean old entries
-    _cover_save_rates[user_id] = [
-        t for t in _cover_save_rates[user_id] if now - t < RATE_LIMIT_WINDOW
-    ]
-    # Check limit
-    if len(_cover_save_rates[user_id]) >= RATE_LIMIT_COVER_SAVES:
-        return False
-    # Record this request
-    _cover_save_rates[user_id].append(now)
-    return True
+async def check_cover_rate_limit(user_id: int) -> tuple[bool, float]:
+    """
+    Check if user has exceeded cover save rate limit
+    Returns (allowed, retry_after_s)
+    """
+    allowed, _, retry_after_s = await get_rate_limiter().hit("cover_save", f"user:{user_id}")
+    return allowed, retry_after_s
 
 
 @router.post("/{track_id}/cover", response_model=dict)
 async def save_cover(
     track_id: int,
     cover_data: CoverSaveRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # TODO: Add authentication dependency
 ):
     """Save cover SVG to S3 and update track.cover_url"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Track not found"
@@ -357,10 +390,13 @@ async def save_cover(
     user_id = track.user_id  # For rate limiting
     
     # Rate limit check
-    if not check_cover_rate_limit(user_id):
+    allowed, retry_after_s = await check_cover_rate_limit(user_id)
+    if not allowed:
+        limit = get_rate_limiter().get_policy("cover_save").limit
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Rate limit exceeded. Maximum 30 cover saves per minute.",
+            detail=f"Rate limit exceeded. Maximum {limit} cover saves per minute.",
+            headers={"Retry-After": str(max(1, ceil(retry_after_s)))},
         )
     
     # Validate SVG size (≤1MB)
@@ -391,7 +427,7 @@ async def save_cover(
         )
         
         track.cover_url = url
-        db.commit()
+        await db.commit()
         
         # Emit telemetry event
         from app.middleware.observability import emit_event
@@ -416,19 +452,19 @@ async def save_cover(
 @router.post("/{track_id}/refund-quality")
 async def refund_quality_issue(
     track_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # TODO: Add authentication dependency
 ):
     """One-click partial refund (50%) for quality issues"""
     # TODO: Get current user from auth and verify ownership
-    user = db.query(User).first()
+    user = await db.scalar(select(User).limit(1))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
     
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -450,7 +486,7 @@ async def refund_quality_issue(
         )
     
     credit_service = get_credit_service()
-    success = credit_service.refund_quality_partial(db, user.id, track_id)
+    success = await db.run_sync(credit_service.refund_quality_partial, user.id, track_id)
     
     if not success:
         raise HTTPException(
@@ -465,10 +501,111 @@ async def refund_quality_issue(
     }
 
 
+# Request headers forwarded to storage so it can serve ranges and revalidation
+STREAM_REQUEST_HEADERS = ("range", "if-range", "if-none-match", "if-modified-since")
+# Storage response headers passed back to the client
+STREAM_RESPONSE_HEADERS = ("content-length", "content-range", "accept-ranges", "etag", "last-modified")
+
+# Delivery modes: "proxy" streams bytes through the API, "redirect" answers
+# with a 302 to a presigned URL, "url" returns the presigned URL as JSON
+DELIVERY_MODES = ("proxy", "redirect", "url")
+STREAM_DELIVERY_MODE = os.getenv("STREAM_DELIVERY_MODE", "proxy")
+COVER_DELIVERY_MODE = os.getenv("COVER_DELIVERY_MODE", "redirect")
+PRESIGNED_URL_TTL_S = int(os.getenv("PRESIGNED_URL_TTL_S", "900"))
+
+
+def resolve_delivery_mode(requested: Optional[str], default: str) -> str:
+    """Pick the delivery mode for a request (query override, else endpoint default)"""
+    mode = requested or default
+    if mode not in DELIVERY_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid delivery mode. Must be one of: {list(DELIVERY_MODES)}",
+        )
+    return mode
+
+
+def presigned_delivery_response(object_key: str, mode: str) -> Response:
+    """Answer with a cached presigned URL as a redirect or JSON body"""
+    storage = get_storage_service()
+    url, expires_in = storage.get_presigned_url(object_key, expiration=PRESIGNED_URL_TTL_S)
+
+    if mode == "url":
+        return JSONResponse({"url": url, "expires_in": expires_in})
+
+    # Let the browser reuse the redirect for a fraction of the URL lifetime
+    return RedirectResponse(
+        url,
+        status_code=status.HTTP_302_FOUND,
+        headers={"Cache-Control": f"private, max-age={max(0, expires_in // 2)}"},
+    )
+
+
+async def proxy_storage_object(
+    request: Request, url: str, media_type: str, filename: str
+) -> Response:
+    """
+    Proxy a storage object through the API
+
+    Range and conditional headers are forwarded to storage, so seeks get
+    206 partial content and revalidations get 304 without re-sending bytes.
+    """
+    client = get_http_client()
+    upstream_headers = {
+        name: request.headers[name]
+        for name in STREAM_REQUEST_HEADERS
+        if name in request.headers
+    }
+    upstream = await client.send(
+        client.build_request("GET", url, headers=upstream_headers), stream=True
+    )
+
+    headers = {
+        name: upstream.headers[name]
+        for name in STREAM_RESPONSE_HEADERS
+        if name in upstream.headers
+    }
+    headers["Cache-Control"] = "public, max-age=3600"
+
+    if upstream.status_code in (304, 416):
+        # Not modified / unsatisfiable range: no body to relay
+        await upstream.aclose()
+        headers.pop("content-length", None)
+        return Response(status_code=upstream.status_code, headers=headers)
+
+    if upstream.status_code not in (200, 206):
+        await upstream.aclose()
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="File unavailable from storage",
+        )
+
+    headers.setdefault("accept-ranges", "bytes")
+    headers["Content-Disposition"] = f'inline; filename="{filename}"'
+
+    return StreamingResponse(
+        upstream.aiter_raw(),
+        status_code=upstream.status_code,
+        media_type=media_type,
+        headers=headers,
+        background=BackgroundTask(upstream.aclose),
+    )
+
+
 @router.get("/{track_id}/stream")
-async def stream_track(track_id: int, db: Session = Depends(get_db)):
-    """Stream track audio file"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+async def stream_track(
+    track_id: int,
+    request: Request,
+    delivery: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Stream track audio file
+
+    Delivery defaults to STREAM_DELIVERY_MODE; pass ?delivery=proxy|redirect|url
+    to override per request.
+    """
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Track not found"
@@ -481,30 +618,59 @@ async def stream_track(track_id: int, db: Session = Depends(get_db)):
         )
 
     url = track.preview_url or track.file_url
+    mode = resolve_delivery_mode(delivery, STREAM_DELIVERY_MODE)
 
-    async def generate():
-        async with httpx.AsyncClient() as client:
-            async with client.stream("GET", url) as response:
-                response.raise_for_status()
-                async for chunk in response.aiter_bytes():
-                    yield chunk
+    if mode != "proxy":
+        object_key = get_storage_service().object_key_from_url(url)
+        # Files outside our bucket can only be proxied
+        if object_key:
+            return presigned_delivery_response(object_key, mode)
 
-    return StreamingResponse(
-        generate(),
-        media_type="audio/mpeg",
-        headers={
-            "Content-Disposition": f'inline; filename="track_{track_id}.mp3"',
-            "Cache-Control": "public, max-age=3600",
-        },
+    return await proxy_storage_object(
+        request, url, media_type="audio/mpeg", filename=f"track_{track_id}.mp3"
+    )
+
+
+@router.get("/{track_id}/cover")
+async def get_cover(
+    track_id: int,
+    request: Request,
+    delivery: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Get track cover SVG
+
+    Delivery defaults to COVER_DELIVERY_MODE; pass ?delivery=proxy|redirect|url
+    to override per request.
+    """
+    track = await db.get(Track, track_id)
+    if not track:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Track not found"
+        )
+
+    if not track.cover_url:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cover not available",
+        )
+
+    mode = resolve_delivery_mode(delivery, COVER_DELIVERY_MODE)
+    if mode != "proxy":
+        return presigned_delivery_response(f"covers/{track_id}.svg", mode)
+
+    return await proxy_storage_object(
+        request, track.cover_url, media_type="image/svg+xml", filename=f"cover_{track_id}.svg"
     )
 
 
 @router.post("/{track_id}/publish")
 async def publish_track(
-    track_id: int, public: bool, db: Session = Depends(get_db)
+    track_id: int, public: bool, db: AsyncSession = Depends(get_async_db)
 ):
     """Toggle track public visibility"""
-    track = db.query(Track).filter(Track.id == track_id).first()
+    track = await db.get(Track, track_id)
     if not track:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Track not found"
@@ -520,5 +686,5 @@ async def publish_track(
         )
     
     track.public = public
-    db.commit()
+    await db.commit()
     return {"public": public}
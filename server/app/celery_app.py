@@ -10,6 +10,7 @@ env_path = Path(__file__).resolve().parents[1] / ".env"
 load_dotenv(dotenv_path=env_path, override=True)
 
 from celery import Celery
+from kombu import Exchange, Queue
 import os
 
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
@@ -21,13 +22,33 @@ celery_app = Celery(
     include=["app.workers.generate_music"],
 )
 
+# Render queues, most important first. Workers consuming several queues drain
+# them in this order; run a separate worker per queue (-Q) to give each its
+# own concurrency so free-mode bursts can't occupy paid capacity.
+RENDER_QUEUES = ("renders.enterprise", "renders.pro", "renders.free")
+# Priority levels within a queue (0 runs first)
+RENDER_PRIORITY_STEPS = 10
+
 celery_app.conf.update(
+    task_queues=[Queue(name, Exchange(name), routing_key=name) for name in RENDER_QUEUES],
+    task_default_queue="renders.free",
+    task_routes={"generate_music": {"queue": "renders.free"}},
+    task_default_priority=0,
+    broker_transport_options={
+        "priority_steps": list(range(RENDER_PRIORITY_STEPS)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    },
+    # Renders are long; reserving many per thread would hold them back from
+    # idle workers and from higher-priority messages that arrive later
+    worker_prefetch_multiplier=int(os.getenv("CELERY_PREFETCH_MULTIPLIER", "1")),
     task_serializer="json",
     accept_content=["json"],
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
+    # Defaults only; renders are queued with limits sized to their duration
     task_time_limit=300,  # 5 minutes
     task_soft_time_limit=240,  # 4 minutes
 )
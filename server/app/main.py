@@ -17,9 +17,12 @@ import os
 
 from app.database import engine, Base
 from app.api import health, tracks, jobs, analyze, credits, style
-from app.api import stripe_webhook
+from app.api import stripe_webhook, providers
 from app.middleware.rate_limit import RateLimitMiddleware
 from app.middleware.observability import ObservabilityMiddleware
+from app.services.http_client import close_http_client
+from app.services.audio_analyzer import get_audio_analyzer
+from app.services.job_progress import get_job_progress_hub
 from fastapi.responses import Response
 from prometheus_client import generate_latest
 from prometheus_client.openmetrics.exposition import CONTENT_TYPE_LATEST
@@ -31,8 +34,11 @@ async def lifespan(app: FastAPI):
     # Startup: Create database tables
     Base.metadata.create_all(bind=engine)
     yield
-    # Shutdown: Cleanup if needed
-    pass
+    # Shutdown: Close pooled HTTP connections, job event subscriptions
+    # and analysis workers
+    await close_http_client()
+    await get_job_progress_hub().close()
+    get_audio_analyzer().shutdown()
 
 
 app = FastAPI(
@@ -72,6 +78,7 @@ app.include_router(analyze.router, prefix="/api/analyze", tags=["analyze"])
 app.include_router(credits.router, prefix="/api/credits", tags=["credits"])
 app.include_router(stripe_webhook.router, prefix="/api/stripe", tags=["stripe"])
 app.include_router(style.router, prefix="/api/style", tags=["style"])
+app.include_router(providers.router, prefix="/api/providers", tags=["providers"])
 
 # Provider health endpoint is included via health.router above
 
@@ -3,9 +3,8 @@ Observability middleware for OpenTelemetry, Sentry, and Prometheus
 """
 import os
 import logging
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+import random
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import time
 from prometheus_client import Counter, Histogram, generate_latest
 from prometheus_client.openmetrics.exposition import CONTENT_TYPE_LATEST
@@ -20,6 +19,10 @@ http_request_duration_seconds = Histogram(
     ["method", "endpoint"],
 )
 
+# Share of requests logged (server errors and slow requests always are)
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "0.01"))
+SLOW_REQUEST_S = float(os.getenv("SLOW_REQUEST_S", "1"))
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -45,41 +48,79 @@ if sentry_dsn:
     )
 
 
-class ObservabilityMiddleware(BaseHTTPMiddleware):
-    """Middleware for observability"""
+def route_label(scope: Scope) -> str:
+    """
+    Metrics label for a request: the matched route template
+
+    /api/tracks/123/stream and /api/tracks/456/stream share one series;
+    paths that match no route share "unmatched" rather than one each.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return "unmatched"
+    return scope.get("root_path", "") + path
+
+
+class ObservabilityMiddleware:
+    """
+    Request metrics and logs as a pure ASGI middleware
+
+    Unlike BaseHTTPMiddleware, the response (including streamed bodies)
+    passes straight through without an extra task and memory stream per
+    request. Durations are measured to the start of the response, so long
+    streams don't swamp the latency histogram.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Log request
-        logger.info(f"{request.method} {request.url.path}")
+        start_time = time.perf_counter()
+        status_code = 500
+        duration = None
+        failed = False
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, duration
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                duration = time.perf_counter() - start_time
+            await send(message)
 
         try:
-            response = await call_next(request)
-            
-            # Record metrics
-            duration = time.time() - start_time
-            http_requests_total.labels(
-                method=request.method,
-                endpoint=request.url.path,
-                status=response.status_code,
-            ).inc()
-            http_request_duration_seconds.labels(
-                method=request.method,
-                endpoint=request.url.path,
-            ).observe(duration)
-
-            return response
+            await self.app(scope, receive, send_wrapper)
         except Exception as e:
-            # Record error metrics
-            http_requests_total.labels(
-                method=request.method,
-                endpoint=request.url.path,
-                status=500,
-            ).inc()
-            
+            failed = True
             logger.error(f"Request failed: {e}", exc_info=True)
             raise
+        finally:
+            if duration is None:
+                duration = time.perf_counter() - start_time
+            self.record(scope, status_code, duration, log=not failed)
+
+    def record(self, scope: Scope, status_code: int, duration: float, log: bool = True):
+        endpoint = route_label(scope)
+        method = scope["method"]
+        http_requests_total.labels(method=method, endpoint=endpoint, status=status_code).inc()
+        http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(duration)
+        if not log:
+            return
+
+        # Log every server error and slow request, and a sample of the rest
+        if status_code >= 500:
+            level = logging.ERROR
+        elif duration >= SLOW_REQUEST_S:
+            level = logging.WARNING
+        elif random.random() < REQUEST_LOG_SAMPLE_RATE:
+            level = logging.INFO
+        else:
+            return
+        logger.log(level, f"{method} {scope['path']} {status_code} {duration * 1000:.0f}ms")
 
 
 # Metrics endpoint is added in main.py
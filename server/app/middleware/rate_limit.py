@@ -1,51 +1,73 @@
 """
 Rate limiting middleware
 """
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-import time
-from collections import defaultdict
-from typing import Dict, Tuple
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from math import ceil
+from app.services.rate_limiter import get_rate_limiter
 
-# Simple in-memory rate limiter (use Redis in production)
-rate_limit_store: Dict[str, Tuple[int, float]] = defaultdict(lambda: (0, time.time()))
+# Paths never rate limited: health checks, and signed callbacks from
+# providers and Stripe that arrive in bursts from a few IPs
+EXEMPT_PATHS = ("/api/health",)
+EXEMPT_PREFIXES = ("/api/providers/webhook/", "/api/stripe/webhook")
 
+# Extra per-route policies checked after the global "api" policy
+ROUTE_POLICIES = {
+    ("POST", "/api/tracks"): "track_create",
+}
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple rate limiting middleware"""
 
-    def __init__(self, app, requests_per_minute: int = 60):
-        super().__init__(app)
-        self.requests_per_minute = requests_per_minute
+def client_identity(request: Request) -> str:
+    """Rate limit identity: the authenticated user if known, else the client IP"""
+    user_id = getattr(request.state, "user_id", None)
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
 
-    async def dispatch(self, request: Request, call_next):
-        # Skip rate limiting for health checks
-        if request.url.path == "/api/health":
-            return await call_next(request)
 
-        # Get client identifier (IP address)
-        client_ip = request.client.host if request.client else "unknown"
+def rate_limited_response(retry_after_s: float) -> JSONResponse:
+    """429 response with a Retry-After hint"""
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Rate limit exceeded. Please try again later."},
+        headers={"Retry-After": str(max(1, ceil(retry_after_s)))},
+    )
 
-        # Check rate limit
-        count, reset_time = rate_limit_store[client_ip]
-        current_time = time.time()
 
-        # Reset counter if minute has passed
-        if current_time > reset_time:
-            count = 0
-            reset_time = current_time + 60
+class RateLimitMiddleware:
+    """
+    Rate limiting middleware backed by the shared rate limiter
 
-        # Check if limit exceeded
-        if count >= self.requests_per_minute:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Rate limit exceeded. Please try again later.",
-            )
+    A pure ASGI middleware: allowed requests get the original send, so
+    responses (including SSE and audio streams) pass straight through.
+    """
 
-        # Increment counter
-        rate_limit_store[client_ip] = (count + 1, reset_time)
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        response = await call_next(request)
-        return response
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
+        path = scope["path"]
+        if path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = get_rate_limiter()
+        identity = client_identity(Request(scope))
+
+        policies = ["api"]
+        route_policy = ROUTE_POLICIES.get((scope["method"], path.rstrip("/")))
+        if route_policy:
+            policies.append(route_policy)
+
+        for policy_name in policies:
+            allowed, _, retry_after_s = await limiter.hit(policy_name, identity)
+            if not allowed:
+                await rate_limited_response(retry_after_s)(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
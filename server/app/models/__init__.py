@@ -1,8 +1,10 @@
 from app.models.user import User
 from app.models.track import Track
 from app.models.job import Job
+from app.models.job_event import JobEvent
 from app.models.file import File
 from app.models.credit_ledger import CreditLedger
+from app.models.credit_balance import CreditBalance
 
-__all__ = ["User", "Track", "Job", "File", "CreditLedger"]
+__all__ = ["User", "Track", "Job", "JobEvent", "File", "CreditLedger", "CreditBalance"]
 
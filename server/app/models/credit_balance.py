@@ -0,0 +1,15 @@
+"""
+Materialized per-user credit ledger totals used for reconciliation
+"""
+from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class CreditBalance(Base):
+    __tablename__ = "credit_balances"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    ledger_total = Column(Integer, default=0, nullable=False)  # Sum of credit_ledger.delta
+    last_ledger_id = Column(Integer, default=0, nullable=False, index=True)  # Highest ledger id folded in
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -1,7 +1,7 @@
 """
 Credit ledger for tracking credit transactions
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -10,6 +10,23 @@ from app.database import Base
 
 class CreditLedger(Base):
     __tablename__ = "credit_ledger"
+    __table_args__ = (
+        # Original render debit for a track (refund lookups)
+        Index(
+            "ix_credit_ledger_debit_lookup",
+            "track_id", "user_id",
+            postgresql_where=text("delta < 0 AND reason = 'track_generate'"),
+        ),
+        # At most one refund per track; also serves refund idempotency checks
+        Index(
+            "ix_credit_ledger_track_refund",
+            "track_id", "user_id",
+            unique=True,
+            postgresql_where=text("delta > 0"),
+            sqlite_where=text("delta > 0"),
+        ),
+        Index("ix_credit_ledger_user_id_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
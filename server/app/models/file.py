@@ -21,7 +21,7 @@ class File(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     kind = Column(Enum(FileKind), nullable=False)
     url = Column(String, nullable=False)
-    sha256 = Column(String, nullable=True)  # For deduplication
+    sha256 = Column(String, nullable=True, index=True)  # For deduplication
     duration_s = Column(Float, nullable=True)
     bpm = Column(Integer, nullable=True)
     key = Column(String, nullable=True)
@@ -1,7 +1,7 @@
 """
 Job model for tracking async music generation tasks
 """
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Float, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Float, Text, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -21,9 +21,12 @@ class Job(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     track_id = Column(Integer, ForeignKey("tracks.id"), nullable=False)
+    task_id = Column(String, nullable=True, unique=True, index=True)  # Celery task rendering this job
     provider_job_id = Column(String, nullable=True)  # External provider's job ID
+    provider_ticket = Column(JSON, nullable=True)  # Checkpoint of the in-flight provider render
     status = Column(Enum(JobStatus), default=JobStatus.QUEUED, nullable=False)
     progress = Column(Float, default=0.0, nullable=False)  # 0.0 to 1.0
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)  # Task runs, incl. retries
     error = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -0,0 +1,28 @@
+"""
+Append-only log of job lifecycle and provider events
+"""
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Index, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class JobEvent(Base):
+    # Range-partitioned by month on created_at in PostgreSQL (see migration
+    # 009); rows are only ever inserted, and old months are dropped whole
+    __tablename__ = "job_events"
+    __table_args__ = (
+        # Keyset pagination over one job's events
+        Index("ix_job_events_job_id_id", "job_id", "id"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    job_id = Column(Integer, nullable=False)  # No FK: partitions outlive pruned jobs
+    attempt = Column(Integer, nullable=False)  # Task run (jobs.attempts) that wrote the event
+    event = Column(String, nullable=False)  # 'started','submitted','provider_failed','fallback',...
+    level = Column(String, nullable=False, default="info")
+    provider = Column(String, nullable=True)
+    provider_attempt = Column(Integer, nullable=True)  # Provider tried within the run (1-based)
+    error_code = Column(String, nullable=True)
+    message = Column(Text, nullable=True)
+    data = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
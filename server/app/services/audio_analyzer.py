@@ -3,36 +3,69 @@ Audio analysis service using librosa
 """
 import librosa
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional, Dict
+import asyncio
+import multiprocessing
 import tempfile
 import os
 
+# Analysis only needs tempo, pitch class and level, so decode well below
+# librosa's 22050 Hz default
+ANALYSIS_SAMPLE_RATE = int(os.getenv("AUDIO_ANALYSIS_SAMPLE_RATE", "11025"))
+# Frames keep the durations of librosa's defaults (2048/512 at 22050 Hz),
+# so beat and chroma resolution don't drop with the sample rate
+N_FFT = 2048 * ANALYSIS_SAMPLE_RATE // 22050
+HOP_LENGTH = 512 * ANALYSIS_SAMPLE_RATE // 22050
+# RMS from the STFT is that of the Hann-windowed frames; dividing by the
+# window's own RMS matches librosa.feature.rms(y=...) on the signal
+WINDOW_RMS = float(np.sqrt(np.mean(librosa.filters.get_window("hann", N_FFT) ** 2)))
+
 
 class AudioAnalyzer:
     """Service for analyzing audio files"""
 
+    def __init__(self):
+        self.sample_rate = ANALYSIS_SAMPLE_RATE
+        self.max_workers = int(os.getenv("AUDIO_ANALYSIS_WORKERS", "2"))
+        self._executor: Optional[ProcessPoolExecutor] = None
+
     def analyze(self, file_path: str) -> Dict[str, Optional[float]]:
         """
         Analyze audio file and extract BPM, key, energy, loudness
         """
         try:
-            # Load audio file
-            y, sr = librosa.load(file_path, duration=60)  # Analyze first 60 seconds
+            # Load audio file once, mono at the analysis rate
+            y, sr = librosa.load(
+                file_path, sr=self.sample_rate, mono=True, duration=60
+            )  # Analyze first 60 seconds
+
+            # One STFT shared by the onset, chroma and RMS features
+            S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+            power = S ** 2
 
             # BPM detection
-            tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-            bpm = int(round(tempo))
+            mel = librosa.feature.melspectrogram(S=power, sr=sr)
+            onset_env = librosa.onset.onset_strength(
+                S=librosa.power_to_db(mel, ref=np.max), sr=sr
+            )
+            tempo, _ = librosa.beat.beat_track(
+                onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH
+            )
+            bpm = int(round(float(np.atleast_1d(tempo)[0])))
 
             # Key detection (simplified - librosa doesn't have built-in key detection)
             # Using chroma features as a proxy
-            chroma = librosa.feature.chroma_stft(y=y, sr=sr)
+            chroma = librosa.feature.chroma_stft(
+                S=power, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH
+            )
             chroma_mean = np.mean(chroma, axis=1)
             key_index = np.argmax(chroma_mean)
             keys = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
             key = keys[key_index]
 
             # Energy (RMS)
-            rms = librosa.feature.rms(y=y)[0]
+            rms = librosa.feature.rms(S=S, frame_length=N_FFT, hop_length=HOP_LENGTH)[0] / WINDOW_RMS
             energy = float(np.mean(rms))
 
             # Loudness (LUFS approximation using RMS)
@@ -44,6 +77,7 @@ class AudioAnalyzer:
                 "key": key,
                 "energy": energy,
                 "loudness": loudness,
+                "duration_s": float(librosa.get_duration(path=file_path)),
             }
         except Exception as e:
             # Return None values on error
@@ -54,6 +88,26 @@ class AudioAnalyzer:
                 "loudness": None,
             }
 
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Process pool for analysis (spawned, so workers don't inherit API threads)"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def analyze_async(self, file_path: str) -> Dict[str, Optional[float]]:
+        """Analyze in the process pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), _analyze_file, file_path)
+
+    def shutdown(self):
+        """Stop analysis worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
     def analyze_from_url(self, url: str) -> Dict[str, Optional[float]]:
         """Download audio from URL and analyze"""
         import httpx
@@ -73,6 +127,11 @@ class AudioAnalyzer:
                 os.unlink(tmp_path)
 
 
+def _analyze_file(file_path: str) -> Dict[str, Optional[float]]:
+    """Process pool entry point"""
+    return get_audio_analyzer().analyze(file_path)
+
+
 # Singleton instance
 _audio_analyzer: Optional[AudioAnalyzer] = None
 
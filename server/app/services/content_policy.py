@@ -1,8 +1,88 @@
 """
 Content policy service for filtering disallowed prompts
 """
-import re
-from typing import List, Tuple
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for matching: NFKC, casefolded, accents stripped and
+    whitespace collapsed, so "Beyoncé", "ＢＥＹＯＮＣＥ" and "beyonce" match
+    """
+    text = unicodedata.normalize("NFKD", unicodedata.normalize("NFKC", text).casefold())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.split())
+
+
+class TermMatcher:
+    """
+    Aho-Corasick automaton over normalized terms
+
+    Built once per blocklist; a scan is a single pass over the text no
+    matter how many terms are loaded. Matches only count on word
+    boundaries, so "drake" doesn't match "mandrake".
+    """
+
+    def __init__(self, terms: Iterable[Tuple[str, str]]):
+        # Trie as parallel lists: goto transitions, failure links, outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str, str]]] = [[]]
+
+        for term, category in terms:
+            normalized = normalize_text(term)
+            if normalized:
+                self._add(normalized, term, category)
+        self._build_failure_links()
+
+    def _add(self, normalized: str, term: str, category: str) -> None:
+        state = 0
+        for ch in normalized:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(normalized), term, category))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> Iterable[Tuple[str, str]]:
+        """Yield (term, category) for each whole-word match in normalized text"""
+        state = 0
+        last = len(text) - 1
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for length, term, category in self._out[state]:
+                start = i - length + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (
+                    i == last or not text[i + 1].isalnum()
+                ):
+                    yield term, category
 
 
 class ContentPolicy:
@@ -26,43 +106,141 @@ class ContentPolicy:
         # Add more as needed
     ]
 
-    def check_prompt(self, prompt: str) -> Tuple[bool, str]:
+    EXPLICIT_KEYWORDS = ["explicit", "nsfw", "adult"]
+
+    # Categories in the order violations are reported
+    CATEGORIES = ("celebrity", "trademark", "explicit")
+
+    def __init__(self):
+        # JSON file of {"celebrity": [...], "trademark": [...], "explicit": [...]}
+        # merged with the built-in lists and reloaded when it changes
+        self.blocklist_path = os.getenv("CONTENT_POLICY_BLOCKLIST_PATH")
+        self.reload_interval_s = float(os.getenv("CONTENT_POLICY_RELOAD_S", "30"))
+
+        self._lock = threading.Lock()
+        self._loaded_mtime: Optional[float] = None
+        self._next_reload_check = 0.0
+        self._matcher = self._build_matcher(self._builtin_blocklist())
+        self._maybe_reload()
+
+    def _builtin_blocklist(self) -> Dict[str, List[str]]:
+        return {
+            "celebrity": list(self.BLOCKED_CELEBRITIES),
+            "trademark": list(self.BLOCKED_TRADEMARKS),
+            "explicit": list(self.EXPLICIT_KEYWORDS),
+        }
+
+    def _load_blocklist(self) -> Dict[str, List[str]]:
         """
-        Check if prompt violates content policy
-        Returns (allowed, reason)
+        Built-in terms plus the terms from the blocklist file
+
+        Raises OSError or ValueError if the file can't be read or isn't a
+        {category: [term, ...]} object.
         """
-        prompt_lower = prompt.lower()
-
-        # Check for celebrity cloning
-        for celebrity in self.BLOCKED_CELEBRITIES:
-            if celebrity in prompt_lower:
-                return (
-                    False,
-                    f"Content policy violation: Cannot use celebrity names like '{celebrity}'",
-                )
+        with open(self.blocklist_path, encoding="utf-8") as f:
+            extra = json.load(f)
+        if not isinstance(extra, dict) or not all(
+            isinstance(terms, list) and all(isinstance(term, str) for term in terms)
+            for terms in extra.values()
+        ):
+            raise ValueError("expected an object mapping categories to lists of terms")
 
-        # Check for trademarked content
-        for trademark in self.BLOCKED_TRADEMARKS:
-            if trademark in prompt_lower:
-                return (
-                    False,
-                    f"Content policy violation: Cannot use trademarked content like '{trademark}'",
-                )
+        blocklist = self._builtin_blocklist()
+        for category, terms in extra.items():
+            if category not in blocklist:
+                logger.warning(f"Ignoring unknown content blocklist category: {category}")
+                continue
+            blocklist[category].extend(terms)
+        return blocklist
+
+    def _build_matcher(self, blocklist: Dict[str, List[str]]) -> TermMatcher:
+        matcher = TermMatcher(
+            (term, category) for category, terms in blocklist.items() for term in terms
+        )
+        logger.info(
+            f"Content policy loaded {sum(len(t) for t in blocklist.values())} blocked terms"
+        )
+        return matcher
+
+    def _maybe_reload(self) -> None:
+        """
+        Rebuild the matcher if the blocklist file changed
 
-        # Check for explicit content keywords
-        explicit_keywords = ["explicit", "nsfw", "adult"]
-        for keyword in explicit_keywords:
-            if keyword in prompt_lower:
-                return (
-                    False,
-                    "Content policy violation: Explicit content not allowed",
+        A file that can't be loaded keeps the current matcher (never just
+        the built-in terms) and is retried at the next check.
+        """
+        if not self.blocklist_path:
+            return
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+
+        with self._lock:
+            if now < self._next_reload_check:
+                return
+            self._next_reload_check = now + self.reload_interval_s
+            try:
+                mtime = os.stat(self.blocklist_path).st_mtime
+                if mtime == self._loaded_mtime:
+                    return
+                # Build off to the side; checks keep using the old matcher meanwhile
+                matcher = self._build_matcher(self._load_blocklist())
+            except (OSError, ValueError) as e:
+                logger.warning(
+                    f"Failed to load content blocklist {self.blocklist_path}, "
+                    f"keeping current terms: {e}"
                 )
+                return
+            self._matcher = matcher
+            self._loaded_mtime = mtime
+
+    def check_text(self, *texts: Optional[str]) -> Tuple[bool, str]:
+        """
+        Check one or more texts (e.g. prompt and lyrics) in a single scan
+        Returns (allowed, reason)
+        """
+        self._maybe_reload()
+        # Newlines can't be part of a normalized term, so no match spans texts
+        text = "\n".join(normalize_text(t) for t in texts if t)
+
+        violation: Optional[Tuple[int, str]] = None
+        for term, category in self._matcher.find(text):
+            rank = self.CATEGORIES.index(category)
+            if violation is None or rank < violation[0]:
+                violation = (rank, term)
+            if rank == 0:
+                break
+
+        if violation is None:
+            return True, ""
 
-        return True, ""
+        rank, term = violation
+        category = self.CATEGORIES[rank]
+        if category == "celebrity":
+            return (
+                False,
+                f"Content policy violation: Cannot use celebrity names like '{term}'",
+            )
+        if category == "trademark":
+            return (
+                False,
+                f"Content policy violation: Cannot use trademarked content like '{term}'",
+            )
+        return (
+            False,
+            "Content policy violation: Explicit content not allowed",
+        )
+
+    def check_prompt(self, prompt: str) -> Tuple[bool, str]:
+        """
+        Check if prompt violates content policy
+        Returns (allowed, reason)
+        """
+        return self.check_text(prompt)
 
     def check_lyrics(self, lyrics: str) -> Tuple[bool, str]:
         """Check if lyrics violate content policy"""
-        return self.check_prompt(lyrics)
+        return self.check_text(lyrics)
 
 
 # Singleton instance
@@ -75,4 +253,3 @@ def get_content_policy() -> ContentPolicy:
     if _content_policy is None:
         _content_policy = ContentPolicy()
     return _content_policy
-
@@ -0,0 +1,41 @@
+"""
+Provider credentials that can be rotated without restarting the process
+"""
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+_lock = threading.Lock()
+# path -> (mtime_ns, value)
+_file_cache: Dict[str, Tuple[int, Optional[str]]] = {}
+
+
+def read_credential(name: str) -> Optional[str]:
+    """
+    Current value of a credential
+
+    If {name}_FILE names a file (e.g. a mounted Kubernetes or Docker
+    secret), the value is read from it and re-read whenever the file
+    changes, so rotating the secret takes effect in running processes.
+    Otherwise the environment variable is used; a process's environment is
+    fixed at start, so those credentials only change on restart.
+    """
+    path = os.getenv(f"{name}_FILE")
+    if not path:
+        return os.getenv(name) or None
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        cached = _file_cache.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+    try:
+        with open(path) as f:
+            value = f.read().strip() or None
+    except OSError:
+        return None
+    with _lock:
+        _file_cache[path] = (mtime_ns, value)
+    return value
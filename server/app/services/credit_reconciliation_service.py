@@ -0,0 +1,218 @@
+"""
+Reconciliation of users.credits against the credit ledger
+"""
+from sqlalchemy import select, update, func, delete, exists
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models.user import User
+from app.models.credit_ledger import CreditLedger
+from app.models.credit_balance import CreditBalance
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class CreditReconciliationService:
+    """
+    Folds credit_ledger into materialized per-user totals and compares them
+    with users.credits.
+
+    The ledger is read in keyset-paginated id ranges and summed per user in
+    SQL, so no ledger rows are loaded into Python.
+    """
+
+    def __init__(self):
+        self.batch_size = int(os.getenv("RECONCILE_BATCH_SIZE", "50000"))
+        # Starting balance granted outside the ledger (users.credits default)
+        self.opening_credits = int(os.getenv("RECONCILE_OPENING_CREDITS", "400"))
+        # Ledger rows younger than this are left for the next run, so ids
+        # still in uncommitted transactions can't fall behind the mark
+        self.safety_lag_s = int(os.getenv("RECONCILE_SAFETY_LAG_S", "60"))
+
+    def get_high_water_mark(self, db: Session) -> int:
+        """Highest ledger id already folded into credit_balances"""
+        return db.scalar(select(func.coalesce(func.max(CreditBalance.last_ledger_id), 0)))
+
+    def refresh_balances(self, db: Session, incremental: bool = True) -> dict:
+        """
+        Fold ledger rows into credit_balances
+
+        Incremental runs only scan rows above the high-water mark; full runs
+        rebuild every total from the start of the ledger.
+        """
+        if incremental:
+            after_id = self.get_high_water_mark(db)
+        else:
+            db.execute(delete(CreditBalance))
+            after_id = 0
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.safety_lag_s)
+        upper_id = db.scalar(
+            select(func.max(CreditLedger.id)).where(
+                CreditLedger.id > after_id,
+                CreditLedger.created_at <= cutoff,
+            )
+        )
+        if upper_id is None:
+            db.commit()
+            return {"batches": 0, "users": 0, "from_id": after_id, "to_id": after_id}
+
+        start_id = after_id
+        batches = 0
+        users_touched = 0
+        while after_id < upper_id:
+            # Keyset pagination: find the id that closes this batch
+            batch_end = db.scalar(
+                select(CreditLedger.id)
+                .where(CreditLedger.id > after_id, CreditLedger.id <= upper_id)
+                .order_by(CreditLedger.id)
+                .offset(self.batch_size - 1)
+                .limit(1)
+            ) or upper_id
+
+            rows = db.execute(
+                select(
+                    CreditLedger.user_id,
+                    func.sum(CreditLedger.delta),
+                    func.max(CreditLedger.id),
+                )
+                .where(CreditLedger.id > after_id, CreditLedger.id <= batch_end)
+                .group_by(CreditLedger.user_id)
+            ).all()
+
+            if rows:
+                self._upsert_totals(db, rows)
+            # One commit per batch keeps the high-water mark consistent
+            db.commit()
+
+            batches += 1
+            users_touched += len(rows)
+            after_id = batch_end
+            logger.info(
+                f"Reconcile batch {batches}: ledger ids <= {batch_end}, {len(rows)} users"
+            )
+
+        return {
+            "batches": batches,
+            "users": users_touched,
+            "from_id": start_id,
+            "to_id": upper_id,
+        }
+
+    def _upsert_totals(self, db: Session, rows) -> None:
+        """Add per-user ledger sums to credit_balances"""
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            insert = postgresql.insert
+        elif dialect == "sqlite":
+            insert = sqlite.insert
+        else:
+            raise RuntimeError(f"Credit reconciliation does not support {dialect}")
+
+        stmt = insert(CreditBalance).values(
+            [
+                {"user_id": user_id, "ledger_total": total, "last_ledger_id": last_id}
+                for user_id, total, last_id in rows
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CreditBalance.user_id],
+            set_={
+                "ledger_total": CreditBalance.ledger_total + stmt.excluded.ledger_total,
+                "last_ledger_id": stmt.excluded.last_ledger_id,
+                "updated_at": func.now(),
+            },
+        )
+        db.execute(stmt)
+
+    def iter_mismatches(self, db: Session) -> Iterator[dict]:
+        """
+        Yield users whose balance differs from opening credits + ledger total
+
+        Users are compared in keyset-paginated batches; users without ledger
+        rows are expected to still hold the opening balance. Users with ledger
+        rows above the high-water mark are skipped until the next refresh.
+        """
+        high_water_mark = self.get_high_water_mark(db)
+        ledger_total = func.coalesce(CreditBalance.ledger_total, 0)
+        expected = self.opening_credits + ledger_total
+        pending = exists().where(
+            CreditLedger.user_id == User.id, CreditLedger.id > high_water_mark
+        )
+        after_id = 0
+        while True:
+            rows = db.execute(
+                select(User.id, User.credits, expected)
+                .outerjoin(CreditBalance, CreditBalance.user_id == User.id)
+                .where(User.id > after_id, User.credits != expected, ~pending)
+                .order_by(User.id)
+                .limit(self.batch_size)
+            ).all()
+            if not rows:
+                return
+            for user_id, credits, expected_credits in rows:
+                yield {
+                    "user_id": user_id,
+                    "credits": credits,
+                    "expected": expected_credits,
+                    "drift": credits - expected_credits,
+                }
+            after_id = rows[-1][0]
+
+    def repair(self, db: Session, user_id: int, expected: int, credits: int) -> bool:
+        """
+        Reset a drifted balance to the ledger-derived value
+
+        Only applies if the balance is unchanged since it was reported.
+        """
+        result = db.execute(
+            update(User)
+            .where(User.id == user_id, User.credits == credits)
+            .values(credits=expected)
+        )
+        db.commit()
+        return result.rowcount == 1
+
+    def reconcile(
+        self, db: Session, incremental: bool = True, repair: bool = False,
+        limit: Optional[int] = None,
+    ) -> dict:
+        """
+        Refresh materialized totals, then report (and optionally repair) drift
+        """
+        refresh = self.refresh_balances(db, incremental=incremental)
+
+        mismatches = []
+        repaired = 0
+        for mismatch in self.iter_mismatches(db):
+            if limit is not None and len(mismatches) >= limit:
+                break
+            mismatches.append(mismatch)
+            if repair and self.repair(
+                db, mismatch["user_id"], mismatch["expected"], mismatch["credits"]
+            ):
+                repaired += 1
+
+        if mismatches:
+            logger.warning(f"Credit reconciliation found {len(mismatches)} drifted balances")
+
+        return {
+            "refresh": refresh,
+            "mismatches": mismatches,
+            "repaired": repaired,
+        }
+
+
+# Singleton instance
+_credit_reconciliation_service: Optional[CreditReconciliationService] = None
+
+
+def get_credit_reconciliation_service() -> CreditReconciliationService:
+    """Get or create credit reconciliation service instance"""
+    global _credit_reconciliation_service
+    if _credit_reconciliation_service is None:
+        _credit_reconciliation_service = CreditReconciliationService()
+    return _credit_reconciliation_service
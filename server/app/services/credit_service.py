@@ -1,7 +1,9 @@
 """
 Credit service for managing user credits and quotas
 """
-from sqlalchemy.orm import Session
+from sqlalchemy import update, select, exists
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
 from app.models.user import User, PlanType
 from app.models.credit_ledger import CreditLedger
 from app.models.track import Track
@@ -18,6 +20,9 @@ class CreditService:
     # 1 credit = 30 seconds of audio
     SECONDS_PER_CREDIT = 30
 
+    # Ledger reasons that refund a track's render debit
+    REFUND_REASONS = ("refund_failure", "quality_partial")
+
     def calculate_credits_required(self, duration_s: int) -> int:
         """
         Calculate credits required for a render
@@ -25,6 +30,119 @@ class CreditService:
         """
         return ceil(duration_s / self.SECONDS_PER_CREDIT)
 
+    def _apply_delta(
+        self,
+        db: Session,
+        user_id: int,
+        delta: int,
+        reason: str,
+        track_id: Optional[int] = None,
+        job_id: Optional[int] = None,
+        meta: Optional[dict] = None,
+        commit: bool = True,
+    ) -> Optional[int]:
+        """
+        Atomically apply a credit delta and write its ledger entry
+        Returns the new balance, or None if the user is missing or a debit
+        would overdraw the account
+
+        The balance check and write are a single conditional UPDATE, so
+        concurrent debits can't overdraw without taking a row lock.
+        """
+        stmt = (
+            update(User)
+            .where(User.id == user_id)
+            .values(credits=User.credits + delta)
+            .returning(User.credits)
+        )
+        if delta < 0:
+            stmt = stmt.where(User.credits >= -delta)
+
+        new_balance = db.execute(stmt).scalar_one_or_none()
+        if new_balance is None:
+            return None
+
+        db.add(
+            CreditLedger(
+                user_id=user_id,
+                track_id=track_id,
+                delta=delta,
+                reason=reason,
+                job_id=job_id,
+                meta=meta,
+            )
+        )
+        if commit:
+            db.commit()
+        else:
+            db.flush()
+
+        return new_balance
+
+    def _find_refundable_debit(
+        self,
+        db: Session,
+        user_id: int,
+        track_id: int,
+        refund_reasons: tuple,
+    ) -> Tuple[Optional[CreditLedger], bool]:
+        """
+        Find a track's render debit and whether it was already refunded
+        Returns (debit_entry, already_refunded) from a single query
+        """
+        refund = aliased(CreditLedger)
+        already_refunded = (
+            exists()
+            .where(
+                refund.track_id == CreditLedger.track_id,
+                refund.user_id == CreditLedger.user_id,
+                refund.reason.in_(refund_reasons),
+                refund.delta > 0,
+            )
+            .label("already_refunded")
+        )
+        row = db.execute(
+            select(CreditLedger, already_refunded)
+            .where(
+                CreditLedger.track_id == track_id,
+                CreditLedger.user_id == user_id,
+                CreditLedger.delta < 0,  # Negative = debit
+                CreditLedger.reason == "track_generate",
+            )
+            .limit(1)
+        ).first()
+
+        if row is None:
+            return None, False
+        return row[0], bool(row[1])
+
+    def _apply_refund(
+        self,
+        db: Session,
+        user_id: int,
+        track_id: int,
+        amount: int,
+        reason: str,
+        meta: dict,
+    ) -> bool:
+        """
+        Credit a track's refund at most once
+
+        The ledger allows one refund per track (a unique partial index), so
+        when concurrent failure paths both get past the already-refunded
+        check, the loser's savepoint rolls back its balance update too.
+        """
+        try:
+            with db.begin_nested():
+                new_balance = self._apply_delta(
+                    db, user_id, amount, reason, track_id=track_id, meta=meta, commit=False
+                )
+        except IntegrityError:
+            # Refunded concurrently
+            return False
+        db.commit()
+        return new_balance is not None
+
     def check_quota(
         self, db: Session, user_id: int, duration_s: int
     ) -> tuple[bool, Optional[str]]:
@@ -72,10 +190,14 @@ class CreditService:
         duration_s: int,
         track_id: Optional[int] = None,
         job_id: Optional[int] = None,
+        commit: bool = True,
     ) -> bool:
         """
         Debit credits from user account for a track generation
         Returns True if successful, False otherwise
+
+        With commit=False the debit is only flushed, so the caller can
+        commit it together with the rest of its unit of work.
         """
         free_mode = get_free_mode_service()
         
@@ -84,33 +206,22 @@ class CreditService:
             free_mode.increment_daily_count(user_id)
             return True
         
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return False
-
         credits_required = self.calculate_credits_required(duration_s)
-        
-        if user.credits < credits_required:
-            return False
-
-        user.credits -= credits_required
 
-        # Create ledger entry
-        ledger_entry = CreditLedger(
-            user_id=user_id,
+        new_balance = self._apply_delta(
+            db,
+            user_id,
+            -credits_required,
+            "track_generate",
             track_id=track_id,
-            delta=-credits_required,
-            reason="track_generate",
             job_id=job_id,
             meta={
                 "duration_s": duration_s,
                 "credits_required": credits_required,
             },
+            commit=commit,
         )
-        db.add(ledger_entry)
-        db.commit()
-
-        return True
+        return new_balance is not None
 
     def refund_failed_render(
         self,
@@ -121,47 +232,29 @@ class CreditService:
     ) -> bool:
         """
         Refund credits for a failed or timed-out render
-        Finds the original debit entry and refunds the full amount
+        Finds the original debit entry and refunds the full amount once
         """
-        # Find the original debit entry for this track
-        original_entry = (
-            db.query(CreditLedger)
-            .filter(
-                CreditLedger.user_id == user_id,
-                CreditLedger.track_id == track_id,
-                CreditLedger.delta < 0,  # Negative = debit
-                CreditLedger.reason == "track_generate",
-            )
-            .first()
+        original_entry, already_refunded = self._find_refundable_debit(
+            db, user_id, track_id, self.REFUND_REASONS + (reason,)
         )
 
-        if not original_entry:
-            # No debit found, nothing to refund
+        if not original_entry or already_refunded:
+            # No debit found or already refunded, nothing to refund
             return False
 
         refund_amount = abs(original_entry.delta)
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return False
-
-        user.credits += refund_amount
-
-        # Create refund ledger entry
-        refund_entry = CreditLedger(
-            user_id=user_id,
-            track_id=track_id,
-            delta=refund_amount,
-            reason=reason,
+        return self._apply_refund(
+            db,
+            user_id,
+            track_id,
+            refund_amount,
+            reason,
             meta={
                 "refunded_entry_id": original_entry.id,
                 "original_delta": original_entry.delta,
                 "refund_reason": reason,
             },
         )
-        db.add(refund_entry)
-        db.commit()
-
-        return True
 
     def refund_quality_partial(
         self,
@@ -173,51 +266,23 @@ class CreditService:
         Refund 50% of credits for quality issues
         One-click refund button on track page
         """
-        # Find the original debit entry for this track
-        original_entry = (
-            db.query(CreditLedger)
-            .filter(
-                CreditLedger.user_id == user_id,
-                CreditLedger.track_id == track_id,
-                CreditLedger.delta < 0,  # Negative = debit
-                CreditLedger.reason == "track_generate",
-            )
-            .first()
+        original_entry, already_refunded = self._find_refundable_debit(
+            db, user_id, track_id, self.REFUND_REASONS
         )
 
-        if not original_entry:
-            return False
-
-        # Check if already refunded
-        existing_refund = (
-            db.query(CreditLedger)
-            .filter(
-                CreditLedger.user_id == user_id,
-                CreditLedger.track_id == track_id,
-                CreditLedger.reason == "quality_partial",
-            )
-            .first()
-        )
-        
-        if existing_refund:
-            # Already refunded
+        if not original_entry or already_refunded:
+            # No debit found or already refunded
             return False
 
         original_amount = abs(original_entry.delta)
         refund_amount = ceil(original_amount * 0.5)  # 50% refund
         
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return False
-
-        user.credits += refund_amount
-
-        # Create partial refund ledger entry
-        refund_entry = CreditLedger(
-            user_id=user_id,
-            track_id=track_id,
-            delta=refund_amount,
-            reason="quality_partial",
+        return self._apply_refund(
+            db,
+            user_id,
+            track_id,
+            refund_amount,
+            "quality_partial",
             meta={
                 "refunded_entry_id": original_entry.id,
                 "original_amount": original_amount,
@@ -225,10 +290,6 @@ class CreditService:
                 "refund_percentage": 50,
             },
         )
-        db.add(refund_entry)
-        db.commit()
-
-        return True
 
     def credit_credits(
         self,
@@ -239,23 +300,8 @@ class CreditService:
         meta: Optional[dict] = None,
     ) -> bool:
         """Add credits to user account"""
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return False
-
-        user.credits += amount
-
-        # Create ledger entry
-        ledger_entry = CreditLedger(
-            user_id=user_id,
-            delta=amount,
-            reason=reason,
-            meta=meta,
-        )
-        db.add(ledger_entry)
-        db.commit()
-
-        return True
+        new_balance = self._apply_delta(db, user_id, amount, reason, meta=meta)
+        return new_balance is not None
 
     def get_user_credits(self, db: Session, user_id: int) -> int:
         """Get current credit balance"""
@@ -1,10 +1,17 @@
 """
 FAL.ai MiniMax Music v2 provider implementation using fal-client
 """
-import os
 import logging
-from typing import Optional
+import hashlib
+import base64
+import time
+import httpx
+from typing import List, Mapping, Optional, Tuple
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from app.services.credentials import read_credential
 from app.services.model_provider import ModelProvider
+from app.services.http_client import get_http_client
 
 try:
     import fal_client
@@ -15,11 +22,40 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 FAL_MODEL = "fal-ai/minimax-music/v2"
+FAL_QUEUE_URL = "https://queue.fal.run"
+# Public keys fal signs webhooks with
+FAL_JWKS_URL = "https://rest.alpha.fal.ai/.well-known/jwks.json"
+FAL_JWKS_TTL_S = 24 * 3600
+# Oldest webhook timestamp accepted, against replays
+WEBHOOK_TOLERANCE_S = 300
+
+# (fetched at, public keys)
+_jwks_cache: Tuple[float, List[Ed25519PublicKey]] = (0.0, [])
+
+
+async def fal_webhook_keys() -> List[Ed25519PublicKey]:
+    """fal's webhook signing keys, cached for a day"""
+    global _jwks_cache
+    fetched_at, keys = _jwks_cache
+    if keys and time.monotonic() - fetched_at < FAL_JWKS_TTL_S:
+        return keys
+    response = await get_http_client().get(FAL_JWKS_URL, timeout=10.0)
+    response.raise_for_status()
+    keys = [
+        Ed25519PublicKey.from_public_bytes(base64.urlsafe_b64decode(jwk["x"] + "=" * (-len(jwk["x"]) % 4)))
+        for jwk in response.json().get("keys", [])
+        if jwk.get("kty") == "OKP" and jwk.get("crv") == "Ed25519"
+    ]
+    _jwks_cache = (time.monotonic(), keys)
+    return keys
 
 
 class FALProvider(ModelProvider):
     """FAL.ai MiniMax Music v2 provider using fal-client library"""
 
+    name = "fal"
+    credential_env = ("FAL_KEY", "FAL_API_KEY")
+
     def __init__(self):
         if not FAL_CLIENT_AVAILABLE:
             raise ValueError("fal-client library not installed. Run: pip install fal-client")
@@ -28,28 +64,25 @@ class FALProvider(ModelProvider):
         self.api_key = self._get_fal_key()
         if not self.api_key:
             raise ValueError("FAL_KEY or FAL_API_KEY environment variable not set")
-        
-        # Set API key in environment for fal-client (it reads from FAL_KEY env var)
-        os.environ["FAL_KEY"] = self.api_key
+
+        # Created lazily on the event loop that first submits or polls
+        self._http: Optional[httpx.AsyncClient] = None
     
     @staticmethod
     def _get_fal_key():
         """Get FAL API key, preferring FAL_KEY over FAL_API_KEY"""
-        return os.getenv("FAL_KEY") or os.getenv("FAL_API_KEY")
+        return read_credential("FAL_KEY") or read_credential("FAL_API_KEY")
 
-    def generate(
-        self,
+    @staticmethod
+    def _build_inputs(
         prompt: str,
         duration_s: int,
-        lyrics: Optional[str] = None,
-        style_strength: float = 0.5,
-        seed: Optional[int] = None,
-        reference_url: Optional[str] = None,
+        lyrics: Optional[str],
+        style_strength: float,
+        seed: Optional[int],
+        reference_url: Optional[str],
     ) -> dict:
-        """
-        Generate music using FAL.ai MiniMax Music v2 via fal-client
-        """
-        # Normalize inputs
+        """Normalize generation parameters into FAL model inputs"""
         inputs = {
             "prompt": prompt,
             "duration": max(5, min(240, int(duration_s))),
@@ -65,20 +98,64 @@ class FALProvider(ModelProvider):
         if reference_url:
             inputs["reference_audio_url"] = reference_url
 
+        return inputs
+
+    @staticmethod
+    def _extract_file_url(result) -> Optional[str]:
+        """Extract audio URL from a FAL result (structure varies by model version)"""
+        file_url = None
+        if isinstance(result, dict):
+            file_url = result.get("audio_url") or result.get("audio") or result.get("url")
+            if isinstance(file_url, dict):
+                file_url = file_url.get("url")
+        elif isinstance(result, list) and len(result) > 0:
+            file_url = result[0] if isinstance(result[0], str) else result[0].get("url")
+        return file_url
+
+    def _async_client(self) -> httpx.AsyncClient:
+        """Get the HTTP client used for the FAL queue API"""
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                headers={"Authorization": f"Key {self.api_key}"},
+                timeout=httpx.Timeout(30.0, connect=10.0),
+            )
+        return self._http
+
+    @staticmethod
+    def _raise_for_status(response: httpx.Response):
+        """Raise with a clear message for FAL queue API errors"""
+        if response.status_code in (401, 403):
+            raise Exception(
+                f"FAL API authentication failed. Check FAL_KEY/FAL_API_KEY environment variable. "
+                f"Error: {response.status_code} {response.text[:200]}"
+            )
+        response.raise_for_status()
+
+    def generate(
+        self,
+        prompt: str,
+        duration_s: int,
+        lyrics: Optional[str] = None,
+        style_strength: float = 0.5,
+        seed: Optional[int] = None,
+        reference_url: Optional[str] = None,
+    ) -> dict:
+        """
+        Generate music using FAL.ai MiniMax Music v2 via fal-client
+        """
+        inputs = self._build_inputs(
+            prompt, duration_s, lyrics, style_strength, seed, reference_url
+        )
+
         try:
             # Use fal-client's run method (synchronous)
             # Mask API key in logs (show only prefix)
             key_prefix = self.api_key[:8] + "..." if self.api_key and len(self.api_key) > 8 else "***"
             logger.info(f"Calling FAL model {FAL_MODEL} with inputs: {list(inputs.keys())} (key: {key_prefix})")
-            result = fal_client.run(FAL_MODEL, arguments=inputs)
+            result = fal_client.SyncClient(key=self.api_key).run(FAL_MODEL, arguments=inputs)
             
             # Extract audio URL from result
-            # Result structure may vary; check for common fields
-            file_url = None
-            if isinstance(result, dict):
-                file_url = result.get("audio_url") or result.get("audio") or result.get("url")
-            elif isinstance(result, list) and len(result) > 0:
-                file_url = result[0] if isinstance(result[0], str) else result[0].get("url")
+            file_url = self._extract_file_url(result)
             
             if not file_url:
                 raise Exception(f"FAL API returned unexpected result format: {type(result)}")
@@ -98,3 +175,119 @@ class FALProvider(ModelProvider):
                 )
             raise
 
+    async def submit(
+        self,
+        prompt: str,
+        duration_s: int,
+        lyrics: Optional[str] = None,
+        style_strength: float = 0.5,
+        seed: Optional[int] = None,
+        reference_url: Optional[str] = None,
+        webhook_url: Optional[str] = None,
+    ) -> dict:
+        """
+        Enqueue a render on the FAL queue API and return its ticket
+        """
+        inputs = self._build_inputs(
+            prompt, duration_s, lyrics, style_strength, seed, reference_url
+        )
+        params = {"fal_webhook": webhook_url} if webhook_url else None
+
+        logger.info(f"Submitting to FAL queue {FAL_MODEL} with inputs: {list(inputs.keys())}")
+        response = await self._async_client().post(
+            f"{FAL_QUEUE_URL}/{FAL_MODEL}", json=inputs, params=params
+        )
+        self._raise_for_status(response)
+        data = response.json()
+
+        return {
+            "provider": "fal",
+            "request_id": data["request_id"],
+            "status_url": data["status_url"],
+            "response_url": data["response_url"],
+        }
+
+    async def poll(self, ticket: dict) -> Optional[dict]:
+        """
+        Check a queued FAL render; returns None while it is still running
+        """
+        client = self._async_client()
+        response = await client.get(ticket["status_url"])
+        self._raise_for_status(response)
+        status = response.json().get("status")
+
+        if status in ("IN_QUEUE", "IN_PROGRESS"):
+            return None
+        if status != "COMPLETED":
+            raise Exception(f"FAL request {ticket['request_id']} returned status {status}")
+
+        response = await client.get(ticket["response_url"])
+        self._raise_for_status(response)
+        file_url = self._extract_file_url(response.json())
+        if not file_url:
+            raise Exception(f"FAL request {ticket['request_id']} completed without an audio URL")
+
+        return {
+            "file_url": file_url,
+            "provider": "fal",
+        }
+
+    async def aclose(self):
+        """Close the FAL queue API client"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    @classmethod
+    def webhooks_configured(cls) -> bool:
+        # Signatures are checked against fal's published keys; no secret needed
+        return True
+
+    @classmethod
+    async def verify_webhook(cls, headers: Mapping[str, str], body: bytes) -> bool:
+        """
+        Verify fal's ED25519 webhook signature
+
+        The signed message is the request id, user id, timestamp and the
+        body's SHA-256 hex digest, newline-separated.
+        """
+        request_id = headers.get("x-fal-webhook-request-id")
+        user_id = headers.get("x-fal-webhook-user-id")
+        timestamp = headers.get("x-fal-webhook-timestamp")
+        signature = headers.get("x-fal-webhook-signature")
+        if not (request_id and user_id and timestamp and signature):
+            return False
+        try:
+            if abs(time.time() - int(timestamp)) > WEBHOOK_TOLERANCE_S:
+                return False
+            signature_bytes = bytes.fromhex(signature)
+        except ValueError:
+            return False
+
+        message = "\n".join(
+            [request_id, user_id, timestamp, hashlib.sha256(body).hexdigest()]
+        ).encode()
+        try:
+            keys = await fal_webhook_keys()
+        except Exception as e:
+            logger.warning(f"FAL webhook keys unavailable: {e}")
+            return False
+        for key in keys:
+            try:
+                key.verify(signature_bytes, message)
+                return True
+            except InvalidSignature:
+                continue
+        return False
+
+    @staticmethod
+    def parse_webhook(payload: dict) -> Tuple[Optional[str], dict]:
+        """Parse a FAL queue webhook ({"request_id", "status", "payload", "error"})"""
+        request_id = payload.get("request_id")
+        if payload.get("status") != "OK":
+            return request_id, {"error": str(payload.get("error") or payload.get("status"))}
+
+        file_url = FALProvider._extract_file_url(payload.get("payload"))
+        if not file_url:
+            return request_id, {"error": "FAL webhook payload has no audio URL"}
+        return request_id, {"file_url": file_url}
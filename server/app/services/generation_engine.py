@@ -0,0 +1,195 @@
+"""
+Asyncio generation engine for submitting and awaiting provider renders
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from app.services.model_provider import ModelProvider
+
+logger = logging.getLogger(__name__)
+
+# How long webhook outcomes are kept for the worker to pick up
+WEBHOOK_RESULT_TTL_S = 3600
+
+
+def webhook_result_key(provider_name: str, request_id: str) -> str:
+    """Redis key under which a provider webhook outcome is stored"""
+    return f"provider_webhook:{provider_name}:{request_id}"
+
+
+def webhook_pending_key(provider_name: str, request_id: str) -> str:
+    """Redis key marking a submitted render whose webhook is expected"""
+    return f"provider_webhook_pending:{provider_name}:{request_id}"
+
+
+class GenerationEngine:
+    """
+    Runs provider submit/poll calls on one background event loop per process.
+
+    Celery tasks only block on a future while the HTTP waiting happens on the
+    shared loop, so a thread-pool worker can keep many renders in flight
+    without a process (and its memory) per render.
+    """
+
+    def __init__(self):
+        self.poll_interval_s = float(os.getenv("PROVIDER_POLL_INTERVAL_S", "2"))
+        self.max_poll_interval_s = float(os.getenv("PROVIDER_MAX_POLL_INTERVAL_S", "15"))
+        # Public URL of /api/providers/webhook; polling only when unset
+        self.webhook_base_url = os.getenv("PROVIDER_WEBHOOK_URL")
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        # Longer than any single provider HTTP request
+        self.client_close_grace_s = float(os.getenv("PROVIDER_CLIENT_CLOSE_GRACE_S", "60"))
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._redis = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the engine loop thread on first use (one per worker process)"""
+        with self._lock:
+            if self._loop is None or not self._loop.is_running():
+                if self._loop is not None:
+                    # Cached providers hold HTTP clients bound to the old loop
+                    from app.services.provider_registry import get_provider_registry
+                    get_provider_registry().clear()
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=loop.run_forever, name="generation-engine", daemon=True
+                )
+                thread.start()
+                self._loop = loop
+                self._redis = None
+        return self._loop
+
+    def _run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the engine loop and block for its result"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Timeouts and task revocation must not leave a poller behind
+            future.cancel()
+            raise
+
+    def close(self, provider: ModelProvider):
+        """Close a provider's HTTP connections on the engine loop (e.g. on shutdown)"""
+        if self._loop is not None and self._loop.is_running():
+            self._run(provider.aclose())
+
+    def uses_webhooks(self, provider: ModelProvider) -> bool:
+        """Webhooks need a public URL and a way to authenticate the provider's calls"""
+        return self.webhook_base_url is not None and provider.webhooks_configured()
+
+    def close_later(self, provider: ModelProvider):
+        """
+        Close a replaced provider's HTTP connections after a grace period
+
+        Requests already in flight on them get to finish; later calls on
+        the old instance open fresh connections.
+        """
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return  # Nothing was opened on the engine loop
+
+        def close():
+            loop.create_task(provider.aclose())
+
+        loop.call_soon_threadsafe(loop.call_later, self.client_close_grace_s, close)
+
+    def webhook_url(self, provider: ModelProvider) -> Optional[str]:
+        """Webhook URL passed to the provider on submit, if webhooks are in use"""
+        if not self.uses_webhooks(provider):
+            return None
+        return f"{self.webhook_base_url.rstrip('/')}/{provider.name}"
+
+    def submit(self, provider: ModelProvider, params: dict) -> dict:
+        """Submit a render and return its ticket"""
+        return self._run(self._submit(provider, params))
+
+    async def _submit(self, provider: ModelProvider, params: dict) -> dict:
+        webhook_url = self.webhook_url(provider)
+        ticket = await provider.submit(webhook_url=webhook_url, **params)
+        if webhook_url:
+            # Only webhooks for renders we submitted are accepted
+            try:
+                await self._redis_client().set(
+                    webhook_pending_key(provider.name, ticket["request_id"]),
+                    "1",
+                    ex=WEBHOOK_RESULT_TTL_S,
+                )
+            except Exception as e:
+                logger.warning(f"Could not register webhook, relying on polling: {e}")
+        return ticket
+
+    def _redis_client(self):
+        if self._redis is None:
+            self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    def wait(
+        self, provider: ModelProvider, ticket: dict, timeout: Optional[float] = None
+    ) -> dict:
+        """
+        Block until a submitted render finishes and return its result
+
+        Raises concurrent.futures.TimeoutError if timeout elapses first.
+        """
+        return self._run(self.wait_async(provider, ticket), timeout)
+
+    async def wait_async(self, provider: ModelProvider, ticket: dict) -> dict:
+        """Wait for a webhook outcome, polling the provider as a fallback"""
+        loop = asyncio.get_running_loop()
+        use_webhook = self.uses_webhooks(provider)
+        # With webhooks, provider polling is only a safety net
+        provider_interval = self.max_poll_interval_s if use_webhook else self.poll_interval_s
+        next_provider_poll = loop.time()
+
+        while True:
+            if use_webhook:
+                outcome = await self._get_webhook_outcome(provider.name, ticket["request_id"])
+                if outcome is not None:
+                    if "error" in outcome:
+                        raise Exception(
+                            f"{provider.name} request {ticket['request_id']} failed: {outcome['error']}"
+                        )
+                    return {"file_url": outcome["file_url"], "provider": provider.name}
+
+            if loop.time() >= next_provider_poll:
+                result = await provider.poll(ticket)
+                if result is not None:
+                    return result
+                next_provider_poll = loop.time() + provider_interval
+                if not use_webhook:
+                    provider_interval = min(provider_interval * 1.5, self.max_poll_interval_s)
+
+            if use_webhook:
+                await asyncio.sleep(self.poll_interval_s)
+            else:
+                await asyncio.sleep(max(0.0, next_provider_poll - loop.time()))
+
+    async def _get_webhook_outcome(self, provider_name: str, request_id: str) -> Optional[dict]:
+        """Read a stored webhook outcome; None if absent or Redis is unavailable"""
+        try:
+            raw = await self._redis_client().get(webhook_result_key(provider_name, request_id))
+        except Exception as e:
+            logger.debug(f"Webhook outcome lookup failed, relying on polling: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+
+# Singleton instance
+_generation_engine: Optional[GenerationEngine] = None
+
+
+def get_generation_engine() -> GenerationEngine:
+    """Get or create generation engine instance"""
+    global _generation_engine
+    if _generation_engine is None:
+        _generation_engine = GenerationEngine()
+    return _generation_engine
@@ -0,0 +1,30 @@
+"""
+Shared pooled HTTP client for proxying storage objects
+"""
+import os
+import httpx
+from typing import Optional
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the process-wide async HTTP client"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20")),
+            ),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared client (called on application shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
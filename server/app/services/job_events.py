@@ -0,0 +1,133 @@
+"""
+Structured job event log, buffered in workers and written in batches
+"""
+import logging
+import re
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from app.models.job import Job
+from app.models.job_event import JobEvent
+
+logger = logging.getLogger(__name__)
+
+_STATUS_CODE = re.compile(r"\b([45]\d\d)\b")
+
+
+def error_code(error: str) -> str:
+    """Short classification of a provider error message"""
+    match = _STATUS_CODE.search(error)
+    if match:
+        return match.group(1)
+    lowered = error.lower()
+    if "forbidden" in lowered:
+        return "403"
+    if "timeout" in lowered or "timed out" in lowered:
+        return "timeout"
+    if "unavailable" in lowered:
+        return "unavailable"
+    return "unknown"
+
+
+class JobEventBuffer:
+    """
+    Events of one task run, held until the run's next commit
+
+    The worker already commits at each lifecycle step; flushing the buffer
+    just before those commits writes all pending events as one multi-row
+    INSERT in the same transaction, rather than a round trip per event.
+    """
+
+    def __init__(self, job: Job):
+        self.job = job
+        self.pending: List[dict] = []
+
+    def record(
+        self,
+        event: str,
+        message: Optional[str] = None,
+        level: str = "info",
+        provider: Optional[str] = None,
+        provider_attempt: Optional[int] = None,
+        error: Optional[str] = None,
+        data: Optional[dict] = None,
+    ):
+        """Queue an event for the next flush"""
+        if error is not None:
+            level = "error"
+            message = message or error
+        self.pending.append({
+            "job_id": self.job.id,
+            "attempt": self.job.attempts,
+            "event": event,
+            "level": level,
+            "provider": provider,
+            "provider_attempt": provider_attempt,
+            "error_code": error_code(error) if error is not None else None,
+            "message": message,
+            "data": data,
+            "created_at": datetime.now(timezone.utc),
+        })
+
+    def flush(self, db: Session):
+        """Add pending events to the current transaction (the caller commits)"""
+        if not self.pending:
+            return
+        db.execute(insert(JobEvent), self.pending)
+        self.pending = []
+
+
+def _month_start(year: int, month: int) -> datetime:
+    """First instant of a month, normalizing month overflow"""
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return datetime(year, month, 1, tzinfo=timezone.utc)
+
+
+def ensure_partitions(db: Session, months_ahead: int = 3) -> List[str]:
+    """
+    Create monthly job_events partitions through months_ahead from now
+
+    Partitions must exist before their month starts: rows that land in the
+    default partition block creating their month's partition later.
+    """
+    now = datetime.now(timezone.utc)
+    created = []
+    for offset in range(months_ahead + 1):
+        start = _month_start(now.year, now.month + offset)
+        end = _month_start(start.year, start.month + 1)
+        name = f"job_events_y{start.year}m{start.month:02d}"
+        exists = db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+        if exists is None:
+            db.execute(text(
+                f"CREATE TABLE {name} PARTITION OF job_events "
+                f"FOR VALUES FROM ('{start.date()}') TO ('{end.date()}')"
+            ))
+            created.append(name)
+    db.commit()
+    return created
+
+
+def drop_partitions(db: Session, retain_months: int) -> List[str]:
+    """Drop monthly partitions before the most recent retain_months months"""
+    now = datetime.now(timezone.utc)
+    cutoff = _month_start(now.year, now.month - retain_months)
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'job_events' ORDER BY c.relname"
+    )).scalars().all()
+
+    dropped = []
+    for name in names:
+        match = re.fullmatch(r"job_events_y(\d{4})m(\d{2})", name)
+        if match and _month_start(int(match.group(1)), int(match.group(2))) < cutoff:
+            db.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    db.commit()
+    if dropped:
+        logger.info(f"Dropped job event partitions: {', '.join(dropped)}")
+    return dropped
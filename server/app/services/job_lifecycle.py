@@ -0,0 +1,112 @@
+"""
+Job lifecycle: one Job row per render, advanced by conditional updates
+"""
+import logging
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models.job import Job, JobStatus
+from app.models.track import Track
+
+logger = logging.getLogger(__name__)
+
+# Statuses a job can still move on from
+ACTIVE_STATUSES = (JobStatus.QUEUED, JobStatus.PROCESSING)
+
+
+class JobLifecycle:
+    """
+    Owns the single Job row of each render attempt
+
+    create_track writes the job keyed by its Celery task id and the worker
+    picks that same row up, so clients poll the row that actually moves.
+    Every transition is a conditional UPDATE that only applies from the
+    statuses it is valid in, so redelivered or retried tasks can't move a
+    finished job backwards, and each one reports whether it applied.
+    """
+
+    def _transition(self, db: Session, job: Job, criteria, values: dict, commit: bool) -> bool:
+        result = db.execute(
+            update(Job)
+            .where(Job.id == job.id, *criteria)
+            .values(**values)
+            .execution_options(synchronize_session="fetch")
+        )
+        if commit:
+            db.commit()
+        return result.rowcount == 1
+
+    def for_task(self, db: Session, track: Track, task_id: str) -> Job:
+        """
+        The job queued for a task, created if the task predates it
+
+        Retries keep their task id, so every run of a task shares one job.
+        """
+        job = db.query(Job).filter(Job.task_id == task_id).first()
+        if job is None:
+            job = Job(track_id=track.id, task_id=task_id, status=JobStatus.QUEUED, progress=0.0)
+            db.add(job)
+            db.flush()
+        return job
+
+    def start(self, db: Session, job: Job, commit: bool = True) -> bool:
+        """
+        Mark a task run as started and count the attempt
+
+        Returns False if the job already finished (e.g. a redelivered task),
+        in which case the run should do nothing.
+        """
+        started = self._transition(
+            db,
+            job,
+            [Job.status.in_(ACTIVE_STATUSES)],
+            {"status": JobStatus.PROCESSING, "attempts": Job.attempts + 1},
+            commit,
+        )
+        if not started:
+            logger.info(f"Job {job.id}: Already {job.status.value}, skipping run")
+        return started
+
+    def advance(self, db: Session, job: Job, progress: float, commit: bool = True) -> bool:
+        """Raise a running job's progress; never moves it backwards"""
+        return self._transition(
+            db,
+            job,
+            [Job.status == JobStatus.PROCESSING, Job.progress < progress],
+            {"progress": progress},
+            commit,
+        )
+
+    def complete(self, db: Session, job: Job, commit: bool = True) -> bool:
+        """Mark a running job complete"""
+        return self._transition(
+            db,
+            job,
+            [Job.status == JobStatus.PROCESSING],
+            {"status": JobStatus.COMPLETE, "progress": 1.0, "error": None},
+            commit,
+        )
+
+    def fail(self, db: Session, job: Job, error: str, commit: bool = True) -> bool:
+        """Mark an unfinished job failed; False if it had already finished"""
+        return self._transition(
+            db,
+            job,
+            [Job.status.in_(ACTIVE_STATUSES)],
+            {"status": JobStatus.FAILED, "error": error},
+            commit,
+        )
+
+
+# Singleton instance
+_job_lifecycle: Optional[JobLifecycle] = None
+
+
+def get_job_lifecycle() -> JobLifecycle:
+    """Get or create job lifecycle instance"""
+    global _job_lifecycle
+    if _job_lifecycle is None:
+        _job_lifecycle = JobLifecycle()
+    return _job_lifecycle
@@ -0,0 +1,164 @@
+"""
+Job progress fan-out over Redis pub/sub
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Dict, Optional, Set
+
+import redis
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "job_progress:"
+# Updates buffered per subscriber; a slow client only loses intermediate ones
+SUBSCRIBER_QUEUE_SIZE = 16
+# Queued to every subscriber once the subscription is (re)established:
+# updates published before that were missed, so re-read the job
+RESYNC = None
+
+
+def job_payload(job) -> dict:
+    """Job status in the shape of the job status API"""
+    return {
+        "id": job.id,
+        "track_id": job.track_id,
+        "status": job.status.value,
+        "progress": job.progress,
+        "attempts": job.attempts,
+        "error": job.error,
+    }
+
+
+class JobProgressPublisher:
+    """Publishes job updates from workers (best effort; the DB stays authoritative)"""
+
+    def __init__(self):
+        self.redis_client = redis.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+        )
+
+    def publish(self, job):
+        """Announce a job's current status to listening API processes"""
+        try:
+            self.redis_client.publish(f"{CHANNEL_PREFIX}{job.id}", json.dumps(job_payload(job)))
+        except Exception as e:
+            logger.warning(f"Job {job.id}: Progress publish failed: {e}")
+
+
+class JobProgressHub:
+    """
+    Delivers job updates to subscribers in this API process
+
+    One pattern subscription per process feeds every open event stream,
+    rather than a Redis connection (or a DB poll) per browser tab.
+    """
+
+    def __init__(self):
+        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.retry_s = float(os.getenv("JOB_EVENTS_REDIS_RETRY_S", "5"))
+        self.connected = False
+        self._redis = None
+        self._task: Optional[asyncio.Task] = None
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    def subscribe(self, job_id: int) -> asyncio.Queue:
+        """Queue that receives this job's update payloads"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: int, queue: asyncio.Queue):
+        """Stop delivering updates to a queue"""
+        queues = self._subscribers.get(job_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[job_id]
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, item):
+        if queue.full():
+            queue.get_nowait()  # Keep the newest status
+        queue.put_nowait(item)
+
+    def _dispatch(self, data: str):
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            return
+        for queue in self._subscribers.get(payload.get("id"), ()):
+            self._offer(queue, payload)
+
+    def _resync(self):
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._offer(queue, RESYNC)
+
+    async def _listen(self):
+        """Relay published updates to subscribers, reconnecting on errors"""
+        while True:
+            pubsub = None
+            try:
+                if self._redis is None:
+                    self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+                pubsub = self._redis.pubsub()
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                # Wait for the confirmation so the subscription is live
+                # before subscribers re-read their jobs
+                await pubsub.get_message(timeout=self.retry_s)
+                self.connected = True
+                self._resync()
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Job progress subscription lost: {e}")
+            finally:
+                self.connected = False
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            await asyncio.sleep(self.retry_s)
+
+    async def close(self):
+        """Stop listening and release the Redis connection"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+
+# Singleton instances
+_job_progress_publisher: Optional[JobProgressPublisher] = None
+_job_progress_hub: Optional[JobProgressHub] = None
+
+
+def get_job_progress_publisher() -> JobProgressPublisher:
+    """Get or create job progress publisher instance"""
+    global _job_progress_publisher
+    if _job_progress_publisher is None:
+        _job_progress_publisher = JobProgressPublisher()
+    return _job_progress_publisher
+
+
+def get_job_progress_hub() -> JobProgressHub:
+    """Get or create job progress hub instance"""
+    global _job_progress_hub
+    if _job_progress_hub is None:
+        _job_progress_hub = JobProgressHub()
+    return _job_progress_hub
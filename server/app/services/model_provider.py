@@ -2,16 +2,29 @@
 Abstract model provider interface with auto-fallback
 """
 from abc import ABC, abstractmethod
-from typing import Optional
+from importlib import import_module
+from typing import Mapping, Optional, Tuple
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
+# The one provider name -> implementation table ("module:Class", imported lazily)
+PROVIDER_CLASSES = {
+    "fal": "app.services.fal_provider:FALProvider",
+    "replicate": "app.services.replicate_provider:ReplicateProvider",
+}
+
 
 class ModelProvider(ABC):
     """Abstract base class for music generation providers"""
 
+    # Short provider name stored on tracks ("fal", "replicate")
+    name: str = ""
+
+    # Environment variables holding the provider's credentials
+    credential_env: Tuple[str, ...] = ()
+
     @abstractmethod
     def generate(
         self,
@@ -27,10 +40,78 @@ class ModelProvider(ABC):
         """
         pass
 
+    @abstractmethod
+    async def submit(
+        self,
+        prompt: str,
+        duration_s: int,
+        lyrics: Optional[str] = None,
+        style_strength: float = 0.5,
+        seed: Optional[int] = None,
+        reference_url: Optional[str] = None,
+        webhook_url: Optional[str] = None,
+    ) -> dict:
+        """
+        Submit a render without waiting for it to finish.
+
+        Returns a JSON-serialisable ticket ({"provider", "request_id", ...})
+        that poll() accepts, so it can be stored and resumed later.
+        """
+        pass
+
+    @abstractmethod
+    async def poll(self, ticket: dict) -> Optional[dict]:
+        """
+        Check a submitted render.
+
+        Returns None while the render is pending, the result dict (with
+        file_url) once complete, and raises if the provider reports failure.
+        """
+        pass
+
+    async def aclose(self):
+        """Release HTTP connections held for submit/poll"""
+        pass
+
+    @classmethod
+    def webhooks_configured(cls) -> bool:
+        """Whether this provider's webhooks can be authenticated (else renders are polled)"""
+        return False
+
+    @classmethod
+    async def verify_webhook(cls, headers: Mapping[str, str], body: bytes) -> bool:
+        """
+        Check a webhook's signature against the raw request body
+
+        The default rejects everything, so a provider only gets webhooks
+        once it implements verification.
+        """
+        return False
+
+    @staticmethod
+    @abstractmethod
+    def parse_webhook(payload: dict) -> Tuple[Optional[str], dict]:
+        """
+        Parse a provider completion webhook.
+
+        Returns (request_id, outcome) where outcome is {"file_url": ...}
+        on success or {"error": ...} on failure.
+        """
+        pass
+
+
+def get_provider_class(provider_name: str):
+    """Get provider class by name without instantiating it"""
+    path = PROVIDER_CLASSES.get(provider_name)
+    if path is None:
+        raise ValueError(f"Unknown provider: {provider_name}")
+    module_name, class_name = path.split(":")
+    return getattr(import_module(module_name), class_name)
+
 
 def get_provider(provider_name: Optional[str] = None) -> ModelProvider:
     """
-    Factory function to get the appropriate provider with auto-fallback
+    Factory function to get the healthiest available provider with auto-fallback
     
     Args:
         provider_name: "fal", "replicate", or None (uses env var MUSIC_PROVIDER)
@@ -39,43 +120,43 @@ def get_provider(provider_name: Optional[str] = None) -> ModelProvider:
         ModelProvider instance
         
     Raises:
-        ValueError if provider not found and fallback fails
+        ValueError if provider not found; Exception if no provider can be built
     """
+    from app.services.provider_router import get_provider_router
+    from app.services.provider_registry import get_provider_registry
+
     if provider_name is None:
         provider_name = os.getenv("MUSIC_PROVIDER", "fal").lower()
     
     prefer = provider_name
+    get_provider_class(prefer)  # Validate the name before routing
     
-    try:
-        if prefer == "fal":
-            from app.services.fal_provider import FALProvider
-            logger.info("Using FAL provider")
-            return FALProvider()
-        elif prefer == "replicate":
-            from app.services.replicate_provider import ReplicateProvider
-            logger.info("Using Replicate provider")
-            return ReplicateProvider()
-        else:
-            raise ValueError(f"Unknown provider: {prefer}")
-    except Exception as e:
-        # Mask any API keys in error messages
-        error_msg = str(e)
-        # Replace full keys with masked versions
-        import re
-        error_msg = re.sub(r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}:[a-f0-9]+)', r'\1[:8]...', error_msg)
-        logger.error(f"Provider {prefer} failed: {error_msg}", exc_info=True)
-        
-        # Auto-fallback to Replicate if FAL fails
-        if prefer == "fal":
-            logger.warning("FAL provider failed, falling back to Replicate")
-            try:
-                from app.services.replicate_provider import ReplicateProvider
-                return ReplicateProvider()
-            except Exception as fallback_error:
-                logger.error(f"Fallback to Replicate also failed: {fallback_error}")
-                raise Exception(
-                    f"Primary provider ({prefer}) failed: {e}. "
-                    f"Fallback provider (replicate) also failed: {fallback_error}"
-                )
-        raise
+    router = get_provider_router()
+    registry = get_provider_registry()
+    errors = []
+    for name in router.candidates(prefer):
+        try:
+            provider = registry.get(name)
+        except Exception as e:
+            error_msg = mask_provider_error(str(e))
+            logger.error(f"Provider {name} failed: {error_msg}", exc_info=True)
+            router.record_failure(name, error_msg)
+            errors.append(f"{name}: {error_msg}")
+            continue
+        if name != prefer:
+            logger.warning(f"Provider {prefer} unavailable, falling back to {name}")
+        logger.info(f"Using {name} provider")
+        return provider
+
+    raise Exception(f"No music provider available. {'; '.join(errors)}")
+
+
+def mask_provider_error(error_msg: str) -> str:
+    """Mask any API keys in provider error messages"""
+    import re
+    return re.sub(
+        r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12}):[a-f0-9]+',
+        r'\1:...',
+        error_msg,
+    )
 
@@ -0,0 +1,71 @@
+"""
+Per-process registry of reusable provider clients
+"""
+import hashlib
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from app.services.credentials import read_credential
+from app.services.model_provider import ModelProvider, get_provider_class
+
+logger = logging.getLogger(__name__)
+
+
+def credential_fingerprint(provider_class) -> str:
+    """Hash of a provider's current credentials, to notice rotation"""
+    values = "\0".join(read_credential(var) or "" for var in provider_class.credential_env)
+    return hashlib.sha256(values.encode()).hexdigest()
+
+
+class ProviderRegistry:
+    """
+    Creates each provider once per process and hands out the same instance
+
+    Reusing instances keeps their HTTP connection pools (and TLS sessions)
+    warm across renders and health probes. A provider is rebuilt when its
+    credentials change (see read_credential); the old instance's
+    connections are closed after a grace period, and renders still
+    holding it reconnect on their next call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (credential fingerprint, provider)
+        self._providers: Dict[str, Tuple[str, ModelProvider]] = {}
+
+    def get(self, name: str) -> ModelProvider:
+        """Get the cached provider, creating or refreshing it as needed"""
+        provider_class = get_provider_class(name)
+        fingerprint = credential_fingerprint(provider_class)
+
+        with self._lock:
+            cached = self._providers.get(name)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+
+            provider = provider_class()
+            self._providers[name] = (fingerprint, provider)
+
+        if cached is not None:
+            logger.info(f"Provider {name} credentials changed, client refreshed")
+            from app.services.generation_engine import get_generation_engine
+            get_generation_engine().close_later(cached[1])
+        return provider
+
+    def clear(self):
+        """Drop all cached providers (e.g. when their event loop is gone)"""
+        with self._lock:
+            self._providers.clear()
+
+
+# Singleton instance
+_provider_registry: Optional[ProviderRegistry] = None
+
+
+def get_provider_registry() -> ProviderRegistry:
+    """Get or create provider registry instance"""
+    global _provider_registry
+    if _provider_registry is None:
+        _provider_registry = ProviderRegistry()
+    return _provider_registry
@@ -0,0 +1,232 @@
+"""
+Health-scored provider routing with per-provider circuit breakers
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from app.services.model_provider import PROVIDER_CLASSES
+from app.services.render_scheduler import RENDER_STORE_MARGIN_S, RENDER_TIMEOUT_S
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_NAMES = tuple(PROVIDER_CLASSES)
+
+
+class ProviderUnavailableError(Exception):
+    """Raised when every provider's circuit breaker is open"""
+
+
+class ProviderHealth:
+    """Rolling outcomes, latency and circuit breaker state for one provider"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, window: int, max_age_s: float):
+        self.name = name
+        self.max_age_s = max_age_s
+        self.outcomes: deque = deque(maxlen=window)  # (monotonic time, success)
+        self.latency_ewma_s: Optional[float] = None
+        # Render seconds per second of audio, for duration-aware time limits
+        self.s_per_audio_s_ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        # When the running half-open trial's slot lapses if it never reports
+        self.trial_expires_at: Optional[float] = None
+
+    def record(self, success: bool):
+        """Add a render outcome to the rolling window"""
+        self.outcomes.append((time.monotonic(), success))
+
+    @property
+    def success_rate(self) -> float:
+        """
+        Share of recent successes (optimistic with no data)
+
+        Old outcomes age out, so a provider sidelined by a brownout is
+        routed to again once it has had time to recover.
+        """
+        cutoff = time.monotonic() - self.max_age_s
+        while self.outcomes and self.outcomes[0][0] < cutoff:
+            self.outcomes.popleft()
+        if not self.outcomes:
+            return 1.0
+        return sum(ok for _, ok in self.outcomes) / len(self.outcomes)
+
+
+class ProviderRouter:
+    """
+    Routes renders to the healthiest provider
+
+    Each worker process tracks a rolling success rate and latency per
+    provider. A breaker opens after sustained failure so new renders skip
+    a browned-out provider immediately; after a cooldown one trial render
+    is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self):
+        self.window = int(os.getenv("PROVIDER_HEALTH_WINDOW", "20"))
+        self.max_age_s = float(os.getenv("PROVIDER_HEALTH_MAX_AGE_S", "300"))
+        self.failure_threshold = int(os.getenv("PROVIDER_BREAKER_FAILURES", "5"))
+        # Open on a low success rate too, once the window has enough samples
+        self.min_success_rate = float(os.getenv("PROVIDER_BREAKER_MIN_SUCCESS_RATE", "0.5"))
+        self.min_samples = int(os.getenv("PROVIDER_BREAKER_MIN_SAMPLES", "10"))
+        self.cooldown_s = float(os.getenv("PROVIDER_BREAKER_COOLDOWN_S", "60"))
+        # Latency at which a provider's score is halved
+        self.latency_ref_s = float(os.getenv("PROVIDER_LATENCY_REF_S", "60"))
+        # Score bonus for the provider the track asked for
+        self.preference_bonus = float(os.getenv("PROVIDER_PREFERENCE_BONUS", "0.1"))
+
+        self._lock = threading.Lock()
+        self._health: Dict[str, ProviderHealth] = {
+            name: ProviderHealth(name, self.window, self.max_age_s) for name in PROVIDER_NAMES
+        }
+
+    def _get(self, name: str) -> ProviderHealth:
+        health = self._health.get(name)
+        if health is None:
+            health = self._health[name] = ProviderHealth(name, self.window, self.max_age_s)
+        return health
+
+    def score(self, name: str) -> float:
+        """Health score in [0, 1]: success rate discounted by latency"""
+        health = self._get(name)
+        latency_factor = 1.0
+        if health.latency_ewma_s is not None:
+            latency_factor = self.latency_ref_s / (self.latency_ref_s + health.latency_ewma_s)
+        return health.success_rate * latency_factor
+
+    def _available(self, health: ProviderHealth, now: float) -> bool:
+        """Whether a render may go to this provider right now"""
+        if health.state == ProviderHealth.CLOSED:
+            return True
+        if health.state == ProviderHealth.OPEN:
+            return now - health.opened_at >= self.cooldown_s
+        # Half-open: one trial at a time (a lost trial's slot lapses)
+        return health.trial_expires_at is None or now >= health.trial_expires_at
+
+    def acquire(self, name: str, trial_ttl_s: Optional[float] = None) -> bool:
+        """
+        Claim a provider for one render attempt
+
+        Always succeeds while the breaker is closed; after the cooldown it
+        grants the single half-open trial. The trial holds its slot for
+        trial_ttl_s (the render's time budget; by default the longest one
+        plus storing the result), so no second trial starts while a long
+        render is still running.
+        """
+        if trial_ttl_s is None:
+            trial_ttl_s = RENDER_TIMEOUT_S + RENDER_STORE_MARGIN_S
+        now = time.monotonic()
+        with self._lock:
+            health = self._get(name)
+            if not self._available(health, now):
+                return False
+            if health.state != ProviderHealth.CLOSED:
+                health.state = ProviderHealth.HALF_OPEN
+                health.trial_expires_at = now + trial_ttl_s
+            return True
+
+    def candidates(self, preferred: Optional[str] = None) -> List[str]:
+        """
+        Providers to try for a new render, best first
+
+        Raises ProviderUnavailableError if every breaker is open.
+        """
+        now = time.monotonic()
+        with self._lock:
+            available = [
+                name for name in self._health if self._available(self._health[name], now)
+            ]
+            if not available:
+                raise ProviderUnavailableError(
+                    "All music providers are unavailable. Please try again shortly."
+                )
+            return sorted(
+                available,
+                key=lambda name: self.score(name)
+                + (self.preference_bonus if name == preferred else 0.0),
+                reverse=True,
+            )
+
+    def expected_latency_s(self, name: str, duration_s: int) -> Optional[float]:
+        """Observed render time for this much audio, if there is any data"""
+        with self._lock:
+            health = self._get(name)
+            if health.s_per_audio_s_ewma is None:
+                return None
+            return health.s_per_audio_s_ewma * duration_s
+
+    def record_success(self, name: str, latency_s: float, duration_s: Optional[int] = None):
+        """Record a completed render (duration_s of audio, if known)"""
+        with self._lock:
+            health = self._get(name)
+            health.record(True)
+            health.consecutive_failures = 0
+            if health.latency_ewma_s is None:
+                health.latency_ewma_s = latency_s
+            else:
+                health.latency_ewma_s = 0.8 * health.latency_ewma_s + 0.2 * latency_s
+            if duration_s:
+                rate = latency_s / duration_s
+                if health.s_per_audio_s_ewma is None:
+                    health.s_per_audio_s_ewma = rate
+                else:
+                    health.s_per_audio_s_ewma = 0.8 * health.s_per_audio_s_ewma + 0.2 * rate
+            if health.state != ProviderHealth.CLOSED:
+                logger.info(f"Provider {name} circuit closed")
+            health.state = ProviderHealth.CLOSED
+            health.trial_expires_at = None
+
+    def record_failure(self, name: str, error: Optional[str] = None):
+        """Record a failed render and open the breaker on sustained failure"""
+        with self._lock:
+            health = self._get(name)
+            health.record(False)
+            health.consecutive_failures += 1
+            health.trial_expires_at = None
+
+            sustained = health.consecutive_failures >= self.failure_threshold or (
+                len(health.outcomes) >= self.min_samples
+                and health.success_rate < self.min_success_rate
+            )
+            if health.state == ProviderHealth.HALF_OPEN or (
+                health.state == ProviderHealth.CLOSED and sustained
+            ):
+                health.state = ProviderHealth.OPEN
+                health.opened_at = time.monotonic()
+                logger.warning(
+                    f"Provider {name} circuit opened: success_rate={health.success_rate:.2f}, "
+                    f"consecutive_failures={health.consecutive_failures}, error={error}"
+                )
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Current health per provider (for health checks and logging)"""
+        with self._lock:
+            return {
+                name: {
+                    "state": health.state,
+                    "score": round(self.score(name), 3),
+                    "success_rate": round(health.success_rate, 3),
+                    "latency_s": health.latency_ewma_s,
+                }
+                for name, health in self._health.items()
+            }
+
+
+# Singleton instance
+_provider_router: Optional[ProviderRouter] = None
+
+
+def get_provider_router() -> ProviderRouter:
+    """Get or create provider router instance"""
+    global _provider_router
+    if _provider_router is None:
+        _provider_router = ProviderRouter()
+    return _provider_router
@@ -0,0 +1,157 @@
+"""
+Rate limiting engine shared across API workers
+"""
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+
+# GCRA (generic cell rate algorithm): one "theoretical arrival time" per key,
+# so each limited identity costs a single short-lived Redis string. Uses
+# Redis server time so API pods with skewed clocks agree on the window.
+GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - burst * interval
+if allow_at > now then
+    return {0, 0, allow_at - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, math.floor((now - allow_at) / interval), 0}
+"""
+
+
+class RateLimitPolicy:
+    """Allow `limit` requests per `period_s` seconds for each identity"""
+
+    def __init__(self, name: str, limit: int, period_s: float = 60):
+        self.name = name
+        self.limit = limit
+        self.period_s = period_s
+
+    @property
+    def interval_ms(self) -> int:
+        """Milliseconds between requests at the sustained rate"""
+        return max(1, int(self.period_s * 1000 / self.limit))
+
+
+def _default_policies() -> Dict[str, RateLimitPolicy]:
+    """Built-in policies, overridable through the environment"""
+    return {
+        # Every API request, per client
+        "api": RateLimitPolicy("api", int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))),
+        # Track submissions, per client
+        "track_create": RateLimitPolicy(
+            "track_create", int(os.getenv("RATE_LIMIT_TRACK_CREATE_PER_MINUTE", "10"))
+        ),
+        # Cover SVG saves, per user
+        "cover_save": RateLimitPolicy(
+            "cover_save", int(os.getenv("RATE_LIMIT_COVER_SAVES_PER_MINUTE", "30"))
+        ),
+    }
+
+
+class RateLimiter:
+    """
+    GCRA rate limiter backed by Redis with an in-process fallback
+
+    Redis keeps limits consistent across Uvicorn workers and pods. If Redis
+    is unreachable, each process enforces the same policy locally in a
+    bounded LRU map so memory can't grow with the number of clients.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        self.backend = os.getenv("RATE_LIMIT_BACKEND", "redis").lower()  # redis|memory
+        self.max_local_keys = int(os.getenv("RATE_LIMIT_MAX_LOCAL_KEYS", "10000"))
+        # Seconds to skip Redis after a failure before trying it again
+        self.redis_retry_s = float(os.getenv("RATE_LIMIT_REDIS_RETRY_S", "5"))
+        self.policies = _default_policies()
+
+        self._redis = None
+        self._script = None
+        self._redis_down_until = 0.0
+        # key -> theoretical arrival time (seconds), oldest first
+        self._local: "OrderedDict[str, float]" = OrderedDict()
+
+        if self.backend == "redis":
+            # Short timeouts so a hung Redis fails open instead of stalling requests
+            timeout_s = float(os.getenv("RATE_LIMIT_REDIS_TIMEOUT_S", "0.25"))
+            self._redis = aioredis.from_url(
+                os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                socket_timeout=timeout_s,
+                socket_connect_timeout=timeout_s,
+            )
+            self._script = self._redis.register_script(GCRA_SCRIPT)
+
+    def get_policy(self, name: str) -> RateLimitPolicy:
+        """Look up a named policy"""
+        policy = self.policies.get(name)
+        if policy is None:
+            raise ValueError(f"Unknown rate limit policy: {name}")
+        return policy
+
+    async def hit(self, policy_name: str, identity: str) -> Tuple[bool, int, float]:
+        """
+        Record a request against a policy for an identity
+        Returns (allowed, remaining, retry_after_s)
+        """
+        if not self.enabled:
+            return True, 0, 0.0
+
+        policy = self.get_policy(policy_name)
+        key = f"ratelimit:{policy.name}:{identity}"
+
+        if self._script is not None and time.monotonic() >= self._redis_down_until:
+            try:
+                allowed, remaining, retry_after_ms = await self._script(
+                    keys=[key], args=[policy.interval_ms, policy.limit]
+                )
+                return bool(allowed), int(remaining), int(retry_after_ms) / 1000
+            except Exception as e:
+                self._redis_down_until = time.monotonic() + self.redis_retry_s
+                logger.warning(f"Rate limiter falling back to in-process limits: {e}")
+
+        return self._hit_local(policy, key, time.monotonic())
+
+    def _hit_local(
+        self, policy: RateLimitPolicy, key: str, now: float
+    ) -> Tuple[bool, int, float]:
+        """GCRA against the in-process LRU map"""
+        interval = policy.interval_ms / 1000
+        tat = max(self._local.get(key, now), now)
+        new_tat = tat + interval
+        allow_at = new_tat - policy.limit * interval
+        if allow_at > now:
+            return False, 0, allow_at - now
+
+        self._local[key] = new_tat
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_local_keys:
+            self._local.popitem(last=False)
+        return True, int((now - allow_at) / interval), 0.0
+
+
+# Singleton instance
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get or create rate limiter instance"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -0,0 +1,219 @@
+"""
+Cache of stored renders keyed by deterministic generation parameters,
+with single-flight coalescing of identical in-flight renders
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+import redis
+
+from app.services.render_scheduler import (
+    RENDER_HARD_LIMIT_GRACE_S, RENDER_STORE_MARGIN_S, RENDER_TIMEOUT_S,
+)
+
+logger = logging.getLogger(__name__)
+
+# Parameters that fully determine a seeded render
+CACHE_KEY_PARAMS = ("prompt", "lyrics", "duration_s", "style_strength", "seed", "reference_url")
+
+
+def render_cache_key(params: dict, provider_name: str) -> Optional[str]:
+    """
+    Canonical hash of a render's parameters, or None if it isn't cacheable
+
+    Only seeded renders are deterministic, so unseeded ones never hit.
+    """
+    if params.get("seed") is None:
+        return None
+    canonical = {name: params.get(name) for name in CACHE_KEY_PARAMS}
+    canonical["style_strength"] = round(float(canonical["style_strength"] or 0.0), 4)
+    canonical["provider"] = provider_name
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class RenderCache:
+    """
+    Maps render parameter hashes to stored S3 object keys
+
+    Entries are Redis strings with a TTL; a sorted set of last-use times
+    evicts the least recently used entries beyond RENDER_CACHE_MAX_ENTRIES.
+    The cache is best effort: Redis errors count as misses.
+    """
+
+    LRU_KEY = "render_cache:lru"
+
+    # Take the in-flight claim, or renew it if this owner already holds it
+    # (a resumed task keeps its task id)
+    CLAIM_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current == ARGV[1] then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+if current then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+    # Delete the in-flight claim only if this render still owns it
+    RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+    def __init__(self):
+        self.enabled = os.getenv("RENDER_CACHE_ENABLED", "true").lower() == "true"
+        self.ttl_s = int(os.getenv("RENDER_CACHE_TTL_S", str(7 * 24 * 3600)))
+        self.max_entries = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "10000"))
+        # Claims outlive the longest render budget plus storing the result
+        # (the task's hard limit), yet a crashed leader's claim still expires
+        default_inflight_ttl_s = RENDER_TIMEOUT_S + RENDER_STORE_MARGIN_S + RENDER_HARD_LIMIT_GRACE_S
+        self.inflight_ttl_s = int(os.getenv("RENDER_INFLIGHT_TTL_S", str(int(default_inflight_ttl_s))))
+        self.result_ttl_s = int(os.getenv("RENDER_INFLIGHT_RESULT_TTL_S", "600"))
+        self.poll_interval_s = float(os.getenv("RENDER_COALESCE_POLL_S", "1"))
+        self.redis_client = redis.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+        )
+        self._claim_script = self.redis_client.register_script(self.CLAIM_SCRIPT)
+        self._release_script = self.redis_client.register_script(self.RELEASE_SCRIPT)
+
+    @staticmethod
+    def _entry_key(digest: str) -> str:
+        return f"render_cache:{digest}"
+
+    def get(self, params: dict, provider_name: str) -> Optional[str]:
+        """Stored object key for an identical earlier render, if any"""
+        digest = render_cache_key(params, provider_name)
+        if not self.enabled or digest is None:
+            return None
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.get(self._entry_key(digest))
+            pipe.expire(self._entry_key(digest), self.ttl_s)
+            pipe.zadd(self.LRU_KEY, {digest: time.time()}, xx=True)
+            object_key, _, _ = pipe.execute()
+            return object_key
+        except Exception as e:
+            logger.warning(f"Render cache lookup failed: {e}")
+            return None
+
+    def put(self, params: dict, provider_name: str, object_key: str):
+        """Remember where a render was stored and evict beyond the size cap"""
+        digest = render_cache_key(params, provider_name)
+        if not self.enabled or digest is None:
+            return
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.set(self._entry_key(digest), object_key, ex=self.ttl_s)
+            pipe.zadd(self.LRU_KEY, {digest: time.time()})
+            # Entries that expired by TTL leave stale members; trim those too
+            pipe.zremrangebyscore(self.LRU_KEY, "-inf", time.time() - self.ttl_s)
+            pipe.zcard(self.LRU_KEY)
+            size = pipe.execute()[-1]
+
+            overflow = size - self.max_entries
+            if overflow > 0:
+                evicted = self.redis_client.zpopmin(self.LRU_KEY, overflow)
+                if evicted:
+                    self.redis_client.delete(*(self._entry_key(d) for d, _ in evicted))
+        except Exception as e:
+            logger.warning(f"Render cache store failed: {e}")
+
+    def invalidate(self, params: dict, provider_name: str):
+        """Forget a cached render (e.g. its object is gone)"""
+        digest = render_cache_key(params, provider_name)
+        if digest is None:
+            return
+        try:
+            self.redis_client.delete(self._entry_key(digest))
+            self.redis_client.zrem(self.LRU_KEY, digest)
+        except Exception as e:
+            logger.warning(f"Render cache invalidate failed: {e}")
+
+    def claim(self, params: dict, provider_name: str, owner: str) -> bool:
+        """
+        Become the single in-flight render for these parameters
+
+        Returns False if an identical render is already in flight elsewhere.
+        Claiming again as the same owner succeeds and renews the claim.
+        Unseeded renders and Redis errors always claim, so renders are never
+        blocked on coordination.
+        """
+        digest = render_cache_key(params, provider_name)
+        if not self.enabled or digest is None:
+            return True
+        try:
+            claimed = self._claim_script(
+                keys=[f"render_inflight:{digest}"], args=[owner, self.inflight_ttl_s]
+            )
+            return bool(claimed)
+        except Exception as e:
+            logger.warning(f"Render claim failed, rendering uncoordinated: {e}")
+            return True
+
+    def release(
+        self, params: dict, provider_name: str, owner: str, object_key: Optional[str] = None
+    ):
+        """
+        Give up an in-flight claim, publishing the stored object key on success
+
+        Renders waiting on the claim pick up the object key; without one they
+        stop waiting and take over the render.
+        """
+        digest = render_cache_key(params, provider_name)
+        if not self.enabled or digest is None:
+            return
+        try:
+            if object_key:
+                self.redis_client.set(
+                    f"render_inflight_result:{digest}", object_key, ex=self.result_ttl_s
+                )
+            self._release_script(keys=[f"render_inflight:{digest}"], args=[owner])
+        except Exception as e:
+            logger.warning(f"Render claim release failed: {e}")
+
+    def wait(self, params: dict, provider_name: str, timeout: float) -> Optional[str]:
+        """
+        Wait for the in-flight identical render to finish
+
+        Returns its object key, or None if it failed, vanished or timed out.
+        """
+        digest = render_cache_key(params, provider_name)
+        if digest is None:
+            return None
+        deadline = time.monotonic() + timeout
+        try:
+            while time.monotonic() < deadline:
+                pipe = self.redis_client.pipeline()
+                pipe.get(f"render_inflight_result:{digest}")
+                pipe.exists(f"render_inflight:{digest}")
+                object_key, inflight = pipe.execute()
+                if object_key:
+                    return object_key
+                if not inflight:
+                    return None
+                time.sleep(self.poll_interval_s)
+        except redis.RedisError as e:
+            logger.warning(f"Waiting on in-flight render failed: {e}")
+        return None
+
+
+# Singleton instance
+_render_cache: Optional[RenderCache] = None
+
+
+def get_render_cache() -> RenderCache:
+    """Get or create render cache instance"""
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = RenderCache()
+    return _render_cache
@@ -0,0 +1,141 @@
+"""
+Prometheus instrumentation for the render pipeline
+"""
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+import redis
+from prometheus_client import (
+    REGISTRY, CollectorRegistry, Gauge, Histogram, multiprocess, start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from app.celery_app import RENDER_PRIORITY_STEPS, RENDER_QUEUES
+
+logger = logging.getLogger(__name__)
+
+# Requested track lengths (s) that bound the duration_bucket label
+DURATION_BUCKETS = (30, 60, 120, 300)
+# Stages range from millisecond commits to multi-minute provider renders
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, float("inf"))
+
+render_stage_duration_seconds = Histogram(
+    "render_stage_duration_seconds",
+    "Render pipeline stage duration in seconds",
+    ["stage", "provider", "duration_bucket"],
+    buckets=STAGE_BUCKETS,
+)
+render_in_flight = Gauge(
+    "render_in_flight",
+    "Provider renders being awaited",
+    ["provider"],
+    multiprocess_mode="livesum",
+)
+
+
+def duration_bucket(duration_s: Optional[int]) -> str:
+    """Low-cardinality label for a requested track length"""
+    if duration_s is None:
+        return "unknown"
+    for bound in DURATION_BUCKETS:
+        if duration_s <= bound:
+            return f"le{bound}"
+    return f"gt{DURATION_BUCKETS[-1]}"
+
+
+def observe_stage(stage: str, provider: Optional[str], duration_s: Optional[int], seconds: float):
+    """Record one stage timing"""
+    render_stage_duration_seconds.labels(
+        stage=stage, provider=provider or "unknown", duration_bucket=duration_bucket(duration_s)
+    ).observe(seconds)
+
+
+@contextmanager
+def stage_timer(
+    stage: str, provider: Optional[str], duration_s: Optional[int], in_flight: bool = False
+) -> Iterator[None]:
+    """
+    Time the enclosed block as a render stage (failures included)
+
+    With in_flight, the block also counts as an outstanding provider render.
+    """
+    gauge = render_in_flight.labels(provider=provider or "unknown") if in_flight else None
+    if gauge is not None:
+        gauge.inc()
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe_stage(stage, provider, duration_s, time.monotonic() - started)
+        if gauge is not None:
+            gauge.dec()
+
+
+def observe_queue_wait(queued_at: Optional[datetime], provider: Optional[str], duration_s: Optional[int]):
+    """Record the time a render spent queued before a worker picked it up"""
+    if queued_at is None:
+        return
+    if queued_at.tzinfo is None:
+        queued_at = queued_at.replace(tzinfo=timezone.utc)
+    wait_s = (datetime.now(timezone.utc) - queued_at).total_seconds()
+    observe_stage("queue_wait", provider, duration_s, max(wait_s, 0.0))
+
+
+class RenderQueueDepthCollector:
+    """
+    Reports pending messages per render queue at scrape time
+
+    Reads the broker lists directly (one pipelined LLEN per priority
+    level), so depth is exact without workers having to push it.
+    """
+
+    def __init__(self):
+        self.redis_client = redis.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+        )
+
+    def collect(self):
+        depth = GaugeMetricFamily(
+            "render_queue_depth", "Render tasks waiting in the broker", labels=["queue"]
+        )
+        try:
+            pipe = self.redis_client.pipeline()
+            for queue in RENDER_QUEUES:
+                # Kombu keeps priority 0 under the queue name, others as queue:N
+                pipe.llen(queue)
+                for priority in range(1, RENDER_PRIORITY_STEPS):
+                    pipe.llen(f"{queue}:{priority}")
+            lengths = pipe.execute()
+        except Exception as e:
+            logger.warning(f"Render queue depth unavailable: {e}")
+            return
+        for i, queue in enumerate(RENDER_QUEUES):
+            chunk = lengths[i * RENDER_PRIORITY_STEPS:(i + 1) * RENDER_PRIORITY_STEPS]
+            depth.add_metric([queue], sum(chunk))
+        yield depth
+
+
+def start_worker_metrics_server(port: int):
+    """
+    Serve render metrics from a Celery worker on its own port
+
+    With a thread pool every render runs in this process. A prefork pool
+    needs PROMETHEUS_MULTIPROC_DIR set so children's samples are merged.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    registry.register(RenderQueueDepthCollector())
+    start_http_server(port, registry=registry)
+    logger.info(f"Render metrics served on :{port}")
+
+
+def mark_worker_process_dead(pid: int):
+    """Drop a prefork child's live gauges from the merged metrics"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
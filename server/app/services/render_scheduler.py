@@ -0,0 +1,130 @@
+"""
+Render queue routing by plan with per-user fair priorities and
+duration-aware time limits
+"""
+import logging
+import os
+from math import ceil
+from typing import Optional, Tuple
+
+import redis
+
+from app.celery_app import RENDER_PRIORITY_STEPS
+from app.models.user import PlanType
+
+logger = logging.getLogger(__name__)
+
+PLAN_QUEUES = {
+    PlanType.ENTERPRISE: "renders.enterprise",
+    PlanType.PRO: "renders.pro",
+    PlanType.FREE: "renders.free",
+}
+
+# Render time model: fixed overhead plus generation time per second of audio
+RENDER_BASE_S = float(os.getenv("RENDER_BASE_S", "30"))
+RENDER_S_PER_AUDIO_S = float(os.getenv("RENDER_S_PER_AUDIO_S", "1.5"))
+# Multiple of observed provider latency a render is allowed
+RENDER_LATENCY_HEADROOM = float(os.getenv("RENDER_LATENCY_HEADROOM", "2"))
+RENDER_MIN_TIMEOUT_S = float(os.getenv("RENDER_MIN_TIMEOUT_S", "60"))
+RENDER_TIMEOUT_S = float(os.getenv("RENDER_TIMEOUT_S", "600"))
+# Time after the render for download, S3 upload and DB writes
+RENDER_STORE_MARGIN_S = float(os.getenv("RENDER_STORE_MARGIN_S", "60"))
+# Grace between the soft limit (checkpoint) and the hard kill
+RENDER_HARD_LIMIT_GRACE_S = float(os.getenv("RENDER_HARD_LIMIT_GRACE_S", "30"))
+
+
+def render_time_budget_s(duration_s: int, observed_latency_s: Optional[float] = None) -> float:
+    """
+    Seconds to wait on a provider render before checkpointing it
+
+    Scales with the requested audio length, widened to the provider's
+    observed latency when it is running slower than the model.
+    """
+    budget = RENDER_BASE_S + RENDER_S_PER_AUDIO_S * duration_s
+    if observed_latency_s is not None:
+        budget = max(budget, observed_latency_s * RENDER_LATENCY_HEADROOM)
+    return min(max(budget, RENDER_MIN_TIMEOUT_S), RENDER_TIMEOUT_S)
+
+
+def render_time_limits(
+    duration_s: int, observed_latency_s: Optional[float] = None
+) -> Tuple[int, int]:
+    """Celery (soft_time_limit, time_limit) for a render task"""
+    soft = ceil(render_time_budget_s(duration_s, observed_latency_s) + RENDER_STORE_MARGIN_S)
+    return soft, soft + ceil(RENDER_HARD_LIMIT_GRACE_S)
+
+
+class RenderScheduler:
+    """
+    Chooses the queue and priority for each render
+
+    Paid plans get their own queues; free-mode renders always go to the
+    free queue. Within a queue, a user's renders drop in priority with
+    each render they already have queued or running, so one user's burst
+    queues behind everyone else's next render instead of starving them.
+    """
+
+    def __init__(self):
+        # Counters expire so a lost task can't penalize a user for long
+        self.counter_ttl_s = int(os.getenv("RENDER_FAIRNESS_TTL_S", "3600"))
+        self.redis_client = redis.from_url(
+            os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+        )
+
+    @staticmethod
+    def _counter_key(user_id: int) -> str:
+        return f"render_pending:{user_id}"
+
+    def queue_for(self, plan: Optional[PlanType], free_mode: bool) -> str:
+        """Queue for a user's plan (free mode renders are never paid)"""
+        if free_mode:
+            return PLAN_QUEUES[PlanType.FREE]
+        return PLAN_QUEUES.get(plan, PLAN_QUEUES[PlanType.FREE])
+
+    def route(
+        self,
+        user_id: int,
+        plan: Optional[PlanType],
+        free_mode: bool,
+        duration_s: Optional[int] = None,
+    ) -> dict:
+        """
+        Options for apply_async: {"queue": ..., "priority": ...}, plus
+        soft_time_limit and time_limit when duration_s is given
+
+        Counts the render as pending for the user until release().
+        """
+        queue = self.queue_for(plan, free_mode)
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.incr(self._counter_key(user_id))
+            pipe.expire(self._counter_key(user_id), self.counter_ttl_s)
+            pending = pipe.execute()[0]
+        except Exception as e:
+            logger.warning(f"Render fairness counter unavailable: {e}")
+            pending = 1
+        priority = min(pending - 1, RENDER_PRIORITY_STEPS - 1)
+        options = {"queue": queue, "priority": priority}
+        if duration_s is not None:
+            options["soft_time_limit"], options["time_limit"] = render_time_limits(duration_s)
+        return options
+
+    def release(self, user_id: int):
+        """Mark one of the user's renders as finished"""
+        try:
+            if self.redis_client.decr(self._counter_key(user_id)) <= 0:
+                self.redis_client.delete(self._counter_key(user_id))
+        except Exception as e:
+            logger.warning(f"Render fairness counter release failed: {e}")
+
+
+# Singleton instance
+_render_scheduler: Optional[RenderScheduler] = None
+
+
+def get_render_scheduler() -> RenderScheduler:
+    """Get or create render scheduler instance"""
+    global _render_scheduler
+    if _render_scheduler is None:
+        _render_scheduler = RenderScheduler()
+    return _render_scheduler
@@ -1,17 +1,27 @@
 """
 Replicate MiniMax Music provider implementation (fallback)
 """
-import os
+import base64
+import hashlib
+import hmac
+import time
 import replicate
-from typing import Optional
+from typing import Mapping, Optional, Tuple
+from app.services.credentials import read_credential
 from app.services.model_provider import ModelProvider
 
+# Oldest webhook timestamp accepted, against replays
+WEBHOOK_TOLERANCE_S = 300
+
 
 class ReplicateProvider(ModelProvider):
     """Replicate MiniMax Music provider (fallback)"""
 
+    name = "replicate"
+    credential_env = ("REPLICATE_API_TOKEN",)
+
     def __init__(self):
-        api_token = os.getenv("REPLICATE_API_TOKEN")
+        api_token = read_credential("REPLICATE_API_TOKEN")
         if not api_token:
             raise ValueError("REPLICATE_API_TOKEN environment variable not set")
         self.client = replicate.Client(api_token=api_token)
@@ -29,6 +39,137 @@ class ReplicateProvider(ModelProvider):
         """
         Generate music using Replicate MiniMax Music model
         """
+        input_params = self._build_input(
+            prompt, duration_s, lyrics, style_strength, seed, reference_url
+        )
+
+        # Run prediction
+        output = self.client.run(
+            self.model,
+            input=input_params,
+        )
+
+        return {
+            "file_url": self._extract_file_url(output),
+            "provider": "replicate",
+        }
+
+    async def submit(
+        self,
+        prompt: str,
+        duration_s: int,
+        lyrics: Optional[str] = None,
+        style_strength: float = 0.5,
+        seed: Optional[int] = None,
+        reference_url: Optional[str] = None,
+        webhook_url: Optional[str] = None,
+    ) -> dict:
+        """
+        Create a Replicate prediction without waiting and return its ticket
+        """
+        input_params = self._build_input(
+            prompt, duration_s, lyrics, style_strength, seed, reference_url
+        )
+        webhook_params = {}
+        if webhook_url:
+            webhook_params = {
+                "webhook": webhook_url,
+                "webhook_events_filter": ["completed"],
+            }
+
+        prediction = await self.client.predictions.async_create(
+            model=self.model,
+            input=input_params,
+            **webhook_params,
+        )
+
+        return {
+            "provider": "replicate",
+            "request_id": prediction.id,
+        }
+
+    async def poll(self, ticket: dict) -> Optional[dict]:
+        """
+        Check a Replicate prediction; returns None while it is still running
+        """
+        prediction = await self.client.predictions.async_get(ticket["request_id"])
+
+        if prediction.status in ("starting", "processing"):
+            return None
+        if prediction.status != "succeeded":
+            raise Exception(
+                f"Replicate prediction {prediction.id} {prediction.status}: {prediction.error}"
+            )
+
+        return {
+            "file_url": self._extract_file_url(prediction.output),
+            "provider": "replicate",
+        }
+
+    async def aclose(self):
+        """Close the client's async connection pool (reopened on next use)"""
+        # replicate.Client keeps it in a private, lazily created attribute
+        http = getattr(self.client, "_Client__async_client", None)
+        if http is not None:
+            self.client._Client__async_client = None
+            await http.aclose()
+
+    @classmethod
+    def webhooks_configured(cls) -> bool:
+        return bool(read_credential("REPLICATE_WEBHOOK_SECRET"))
+
+    @classmethod
+    async def verify_webhook(cls, headers: Mapping[str, str], body: bytes) -> bool:
+        """
+        Verify Replicate's webhook-id/-timestamp/-signature headers
+
+        The signature is an HMAC-SHA256 of "id.timestamp.body" keyed with
+        the account's webhook signing secret (REPLICATE_WEBHOOK_SECRET,
+        "whsec_..." from GET /v1/webhooks/default/secret).
+        """
+        secret = read_credential("REPLICATE_WEBHOOK_SECRET")
+        webhook_id = headers.get("webhook-id")
+        timestamp = headers.get("webhook-timestamp")
+        signatures = headers.get("webhook-signature")
+        if not (secret and webhook_id and timestamp and signatures):
+            return False
+        try:
+            if abs(time.time() - int(timestamp)) > WEBHOOK_TOLERANCE_S:
+                return False
+            key = base64.b64decode(secret.split("_", 1)[-1])
+        except ValueError:
+            return False
+
+        signed = f"{webhook_id}.{timestamp}.".encode() + body
+        expected = base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode()
+        # Space-separated "v1,<signature>" entries (several during key rotation)
+        return any(
+            hmac.compare_digest(entry.split(",", 1)[-1], expected)
+            for entry in signatures.split()
+        )
+
+    @staticmethod
+    def parse_webhook(payload: dict) -> Tuple[Optional[str], dict]:
+        """Parse a Replicate prediction webhook (the prediction object itself)"""
+        request_id = payload.get("id")
+        if payload.get("status") != "succeeded":
+            return request_id, {"error": str(payload.get("error") or payload.get("status"))}
+
+        try:
+            return request_id, {"file_url": ReplicateProvider._extract_file_url(payload.get("output"))}
+        except Exception as e:
+            return request_id, {"error": str(e)}
+
+    @staticmethod
+    def _build_input(
+        prompt: str,
+        duration_s: int,
+        lyrics: Optional[str],
+        style_strength: float,
+        seed: Optional[int],
+        reference_url: Optional[str],
+    ) -> dict:
+        """Build Replicate model input"""
         # Replicate has max 240s duration
         duration_s = min(duration_s, 240)
 
@@ -48,22 +189,14 @@ class ReplicateProvider(ModelProvider):
         if reference_url:
             input_params["reference_audio"] = reference_url
 
-        # Run prediction
-        output = self.client.run(
-            self.model,
-            input=input_params,
-        )
+        return input_params
 
-        # Replicate returns a list of URLs
+    @staticmethod
+    def _extract_file_url(output) -> str:
+        """Replicate returns a list of URLs or a single URL"""
         if isinstance(output, list) and len(output) > 0:
-            file_url = output[0]
+            return output[0]
         elif isinstance(output, str):
-            file_url = output
-        else:
-            raise Exception(f"Unexpected output format from Replicate: {output}")
-
-        return {
-            "file_url": file_url,
-            "provider": "replicate",
-        }
+            return output
+        raise Exception(f"Unexpected output format from Replicate: {output}")
 
@@ -2,11 +2,15 @@
 Storage service for S3/MinIO file operations
 """
 import os
+import time
+import threading
 import boto3
 from botocore.client import Config
 from botocore.exceptions import ClientError
-from typing import Optional
+from collections import OrderedDict
+from typing import Optional, Iterable, Tuple
 from datetime import timedelta
+from urllib.parse import urlparse, unquote
 
 
 class StorageService:
@@ -18,6 +22,11 @@ class StorageService:
         self.secret_key = os.getenv("S3_SECRET_KEY", "minioadmin")
         self.bucket_name = os.getenv("S3_BUCKET", "soundfoundry")
         self.use_ssl = not self.endpoint.startswith("http://")
+        # Multipart part size; S3 requires >= 5 MiB for all but the last part
+        self.multipart_chunk_size = max(
+            5 * 1024 * 1024,
+            int(os.getenv("S3_MULTIPART_CHUNK_BYTES", str(8 * 1024 * 1024))),
+        )
 
         self.s3_client = boto3.client(
             "s3",
@@ -29,6 +38,11 @@ class StorageService:
             verify=False if not self.use_ssl else True,
         )
 
+        # Signed URL cache: (object_key, expiration) -> (url, expires_at)
+        self._presigned_cache: "OrderedDict[Tuple[str, int], Tuple[str, float]]" = OrderedDict()
+        self._presigned_cache_lock = threading.Lock()
+        self.presigned_cache_size = int(os.getenv("PRESIGNED_CACHE_SIZE", "10000"))
+
         # Ensure bucket exists
         self._ensure_bucket()
 
@@ -73,23 +87,114 @@ class StorageService:
         else:
             return self.generate_presigned_url(key, expiration=31536000)  # 1 year
 
-    def upload_from_url(self, url: str, object_key: str) -> str:
-        """Download from URL and upload to S3/MinIO"""
+    def upload_from_url(
+        self, url: str, object_key: str, content_type: Optional[str] = None
+    ) -> str:
+        """
+        Stream a file from URL into S3/MinIO
+
+        Bytes are piped from the HTTP response into a multipart upload, so at
+        most one part is buffered in memory and nothing touches local disk.
+        """
         import httpx
-        import tempfile
 
         with httpx.Client() as client:
-            response = client.get(url)
-            response.raise_for_status()
+            with client.stream("GET", url) as response:
+                response.raise_for_status()
+                if content_type is None:
+                    content_type = response.headers.get("content-type")
+                return self.upload_stream(
+                    response.iter_bytes(chunk_size=64 * 1024),
+                    object_key,
+                    content_type=content_type,
+                )
 
-            with tempfile.NamedTemporaryFile(delete=False) as tmp_file:
-                tmp_file.write(response.content)
-                tmp_path = tmp_file.name
+    def upload_stream(
+        self,
+        chunks: Iterable[bytes],
+        object_key: str,
+        content_type: Optional[str] = None,
+    ) -> str:
+        """Upload an iterable of byte chunks using a bounded-buffer multipart upload"""
+        extra_args = {}
+        if content_type:
+            extra_args["ContentType"] = content_type
 
-            try:
-                return self.upload_file(tmp_path, object_key)
-            finally:
-                os.unlink(tmp_path)
+        part_size = self.multipart_chunk_size
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+
+        try:
+            for chunk in chunks:
+                buffer.extend(chunk)
+                while len(buffer) >= part_size:
+                    if upload_id is None:
+                        upload_id = self.s3_client.create_multipart_upload(
+                            Bucket=self.bucket_name, Key=object_key, **extra_args
+                        )["UploadId"]
+                    # One copy per part: slicing a memoryview doesn't copy,
+                    # and the view is released before the buffer shrinks
+                    with memoryview(buffer) as view:
+                        part = bytes(view[:part_size])
+                    del buffer[:part_size]
+                    parts.append(self._upload_part(object_key, upload_id, len(parts) + 1, part))
+
+            if upload_id is None:
+                # Smaller than one part: a single PUT avoids multipart overhead
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name, Key=object_key, Body=bytes(buffer), **extra_args
+                )
+            else:
+                if buffer:
+                    parts.append(
+                        self._upload_part(object_key, upload_id, len(parts) + 1, bytes(buffer))
+                    )
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=object_key,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": parts},
+                )
+        except BaseException:
+            # Don't leave orphaned parts accruing storage charges
+            if upload_id is not None:
+                self.s3_client.abort_multipart_upload(
+                    Bucket=self.bucket_name, Key=object_key, UploadId=upload_id
+                )
+            raise
+
+        return f"{self.endpoint}/{self.bucket_name}/{object_key}"
+
+    def _upload_part(self, object_key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        """Upload one multipart part and return its completion record"""
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket_name,
+            Key=object_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    def object_exists(self, object_key: str) -> bool:
+        """Whether an object is present in the bucket"""
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=object_key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def copy_object(self, source_key: str, object_key: str) -> str:
+        """Server-side copy of an object within the bucket"""
+        self.s3_client.copy_object(
+            Bucket=self.bucket_name,
+            Key=object_key,
+            CopySource={"Bucket": self.bucket_name, "Key": source_key},
+        )
+        return f"{self.endpoint}/{self.bucket_name}/{object_key}"
 
     def generate_presigned_url(
         self, object_key: str, expiration: int = 3600
@@ -101,6 +206,45 @@ class StorageService:
             ExpiresIn=expiration,
         )
 
+    def get_presigned_url(self, object_key: str, expiration: int = 900) -> Tuple[str, int]:
+        """
+        Get a presigned GET URL from the in-process cache, signing on a miss
+
+        A cached URL is reused while at least half of its lifetime remains,
+        so callers always get a URL valid for >= expiration / 2 seconds.
+        Returns (url, seconds_until_expiry).
+        """
+        cache_key = (object_key, expiration)
+        now = time.time()
+
+        with self._presigned_cache_lock:
+            cached = self._presigned_cache.get(cache_key)
+            if cached is not None and cached[1] - now >= expiration / 2:
+                self._presigned_cache.move_to_end(cache_key)
+                return cached[0], int(cached[1] - now)
+
+        url = self.generate_presigned_url(object_key, expiration=expiration)
+
+        with self._presigned_cache_lock:
+            self._presigned_cache[cache_key] = (url, now + expiration)
+            self._presigned_cache.move_to_end(cache_key)
+            while len(self._presigned_cache) > self.presigned_cache_size:
+                self._presigned_cache.popitem(last=False)
+
+        return url, expiration
+
+    def object_key_from_url(self, url: Optional[str]) -> Optional[str]:
+        """Extract the object key from a URL in our bucket (plain or presigned)"""
+        if not url:
+            return None
+        parsed = urlparse(url)
+        if parsed.netloc != urlparse(self.endpoint).netloc:
+            return None
+        prefix = f"/{self.bucket_name}/"
+        if not parsed.path.startswith(prefix):
+            return None
+        return unquote(parsed.path[len(prefix):]) or None
+
     def delete_file(self, object_key: str):
         """Delete a file from S3/MinIO"""
         self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_key)
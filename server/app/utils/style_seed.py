@@ -99,13 +99,14 @@ def compute_style_unlocks(user_id: int, db) -> list[str]:
     return unlocks
 
 
-def update_user_unlocks(user_id: int, db) -> list[str]:
+def update_user_unlocks(user_id: int, db, commit: bool = True) -> list[str]:
     """
     Compute and update user's style unlocks (set-union with existing).
     
     Args:
         user_id: User ID
         db: Database session
+        commit: Commit immediately; False leaves it to the caller's transaction
         
     Returns:
         Updated list of unlock IDs
@@ -125,7 +126,8 @@ def update_user_unlocks(user_id: int, db) -> list[str]:
     
     # Update user
     user.style_unlocks = updated_unlocks
-    db.commit()
+    if commit:
+        db.commit()
     
     return updated_unlocks
 
@@ -4,14 +4,33 @@ Celery task for generating music
 from app.celery_app import celery_app
 from app.database import SessionLocal
 from app.models.track import Track, TrackStatus
-from app.models.job import Job, JobStatus
-from app.services.model_provider import ModelProvider, get_provider
+from app.models.job import Job
+from app.services.model_provider import ModelProvider, mask_provider_error
+from app.services.generation_engine import get_generation_engine
+from app.services.provider_router import get_provider_router, ProviderUnavailableError
+from app.services.provider_registry import get_provider_registry
 from app.services.storage import get_storage_service
+from app.services.render_cache import get_render_cache
+from app.services.render_scheduler import (
+    get_render_scheduler, render_time_budget_s, RENDER_STORE_MARGIN_S,
+)
 from app.services.credit_service import get_credit_service
 from app.services.free_mode_service import get_free_mode_service
+from app.services.job_progress import get_job_progress_publisher
+from app.services.job_lifecycle import get_job_lifecycle
+from app.services.job_events import JobEventBuffer
+from app.services.render_metrics import (
+    stage_timer, observe_stage, observe_queue_wait,
+    start_worker_metrics_server, mark_worker_process_dead,
+)
+from celery.signals import worker_init, worker_process_shutdown
+from celery.exceptions import SoftTimeLimitExceeded
 import os
+import time
 import logging
 from datetime import datetime
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
@@ -26,76 +45,351 @@ except ImportError:
 music_provider = os.getenv("MUSIC_PROVIDER", "fal")
 logger.info(f"Default MUSIC_PROVIDER: {music_provider}")
 
+# Upper bound per provider attempt, so a stalled provider leaves time to fall back
+PROVIDER_ATTEMPT_TIMEOUT_S = int(os.getenv("PROVIDER_ATTEMPT_TIMEOUT_S", "180"))
+# Times a render still pending at its time limit is checkpointed and resumed
+RENDER_MAX_RESUMES = int(os.getenv("RENDER_MAX_RESUMES", "2"))
+RENDER_RESUME_DELAY_S = int(os.getenv("RENDER_RESUME_DELAY_S", "5"))
+# Times a render is requeued while every provider's breaker is open
+# (shares the task's retry count with resumes)
+RENDER_UNAVAILABLE_RETRIES = int(os.getenv("RENDER_UNAVAILABLE_RETRIES", "3"))
+# Times a render waiting on an identical in-flight render is requeued; the
+# leader runs for at most RENDER_MAX_RESUMES + 1 budgets, and the waiter
+# started after it, so this many waits cover it
+RENDER_COALESCE_RETRIES = RENDER_MAX_RESUMES + 1
 
-@celery_app.task(bind=True, name="generate_music")
-def generate_music_task(self, track_id: int):
+
+class RenderDeadlineExceeded(Exception):
+    """The render budget ran out while the provider was still working"""
+
+
+class RenderCoalescePending(Exception):
+    """An identical render is still in flight elsewhere (e.g. resuming)"""
+
+
+def resume_render(
+    engine, job: Job, track: Track, deadline: float, events: JobEventBuffer
+) -> Optional[dict]:
     """
-    Generate music for a track
+    Continue waiting on the render checkpointed in job.provider_ticket
+
+    Returns the result, or None if the provider failed it (the checkpoint
+    is cleared and the caller renders afresh).
     """
-    db = SessionLocal()
+    router = get_provider_router()
+    ticket = job.provider_ticket
+    provider_name = ticket["provider"]
+    logger.info(
+        f"Job {job.id}: Resuming {provider_name} request {ticket['request_id']}, track_id={track.id}"
+    )
+    events.record("resumed", provider=provider_name, data={"request_id": ticket["request_id"]})
     try:
-        track = db.query(Track).filter(Track.id == track_id).first()
-        if not track:
-            return {"error": "Track not found"}
+        provider: ModelProvider = get_provider_registry().get(provider_name)
+        with stage_timer("provider_render", provider_name, track.duration_s, in_flight=True):
+            result = engine.wait(provider, ticket, timeout=max(deadline - time.monotonic(), 0))
+    except FutureTimeoutError:
+        raise RenderDeadlineExceeded(f"Render timed out with {provider_name} request still pending")
+    except SoftTimeLimitExceeded:
+        raise
+    except Exception as e:
+        error_msg = mask_provider_error(str(e))
+        router.record_failure(provider_name, error_msg)
+        logger.error(f"Job {job.id}: Resumed {provider_name} render failed: {error_msg}")
+        events.record("provider_failed", provider=provider_name, error=error_msg)
+        job.provider_ticket = None
+        return None
 
-        # Create job record
-        job = Job(
-            track_id=track.id,
-            status=JobStatus.PROCESSING,
-            progress=0.0,
-        )
-        db.add(job)
-        db.commit()
+    track.provider = provider_name
+    return result
 
-        # Update track status
-        track.status = TrackStatus.RENDERING
-        db.commit()
 
-        # Get model provider (with auto-fallback)
-        provider_attempt = 1
-        provider_name = track.provider
-        provider_error = None
-        
+def render_with_fallback(
+    db, engine, job: Job, track: Track, params: dict, events: JobEventBuffer
+) -> dict:
+    """
+    Render on the healthiest provider, falling back on runtime failures
+
+    The budget scales with the track's duration and the provider's observed
+    latency. Each submission is checkpointed on the job, and a render still
+    pending when the budget runs out raises RenderDeadlineExceeded so the
+    task can resume it rather than pay for it twice. Returns the provider
+    result (with file_url); raises ProviderUnavailableError if no breaker
+    admits the render, otherwise raises if every candidate fails.
+    """
+    router = get_provider_router()
+    budget_s = render_time_budget_s(
+        track.duration_s, router.expected_latency_s(track.provider, track.duration_s)
+    )
+    deadline = time.monotonic() + budget_s
+
+    if job.provider_ticket:
+        result = resume_render(engine, job, track, deadline, events)
+        if result is not None:
+            return result
+
+    # Try providers in health-score order; runtime failures fall back too
+    provider_attempt = 0
+    provider_errors = []
+    denied = []
+    result = None
+    for provider_name in router.candidates(track.provider):
+        remaining_s = deadline - time.monotonic()
+        if remaining_s <= 0:
+            break
+        # A half-open trial holds its slot for the rest of this render's budget
+        if not router.acquire(provider_name, trial_ttl_s=remaining_s + RENDER_STORE_MARGIN_S):
+            denied.append(provider_name)
+            continue
+        provider_attempt += 1
+        started = time.monotonic()
         try:
-            provider: ModelProvider = get_provider(track.provider)
+            provider: ModelProvider = get_provider_registry().get(provider_name)
+
+            # Submit to provider and checkpoint the ticket
+            with stage_timer("provider_submit", provider_name, track.duration_s):
+                ticket = engine.submit(provider, params)
+            job.provider_job_id = ticket["request_id"]
+            job.provider_ticket = ticket
+            get_job_lifecycle().advance(db, job, 0.1, commit=False)
+            events.record(
+                "submitted",
+                provider=provider_name,
+                provider_attempt=provider_attempt,
+                data={"request_id": ticket["request_id"]},
+            )
+            events.flush(db)
+            with stage_timer("db_commit", provider_name, track.duration_s):
+                db.commit()
+            get_job_progress_publisher().publish(job)
             logger.info(
-                f"Job {job.id}: Using provider: {track.provider}, "
+                f"Job {job.id}: Submitted to {provider_name}, request_id={ticket['request_id']}, "
                 f"track_id={track.id}, attempt={provider_attempt}"
             )
+
+            # Wait for completion (webhook or polling)
+            attempt_timeout_s = min(remaining_s, PROVIDER_ATTEMPT_TIMEOUT_S)
+            try:
+                with stage_timer(
+                    "provider_render", provider_name, track.duration_s, in_flight=True
+                ):
+                    result = engine.wait(provider, ticket, timeout=attempt_timeout_s)
+            except FutureTimeoutError:
+                if attempt_timeout_s >= PROVIDER_ATTEMPT_TIMEOUT_S:
+                    raise Exception(f"Render timed out after {attempt_timeout_s:.0f}s")
+                # The budget ran out, not the provider: keep the checkpoint
+                raise RenderDeadlineExceeded(f"Render timed out with {provider_name} request still pending")
+        except (RenderDeadlineExceeded, SoftTimeLimitExceeded):
+            raise
         except Exception as e:
-            provider_error = str(e)
-            error_code = "403" if "403" in provider_error or "Forbidden" in provider_error else "unknown"
+            error_msg = mask_provider_error(str(e))
+            router.record_failure(provider_name, error_msg)
+            provider_errors.append(f"{provider_name}: {error_msg}")
             logger.error(
-                f"Job {job.id}: Provider {track.provider} failed: {provider_error}, "
-                f"track_id={track.id}, attempt={provider_attempt}, error_code={error_code}"
+                f"Job {job.id}: Provider {provider_name} failed: {error_msg}, "
+                f"track_id={track.id}, attempt={provider_attempt}"
             )
-            
-            # Try fallback
-            fallback_provider = "replicate" if track.provider == "fal" else "fal"
-            provider_attempt = 2
+            events.record(
+                "provider_failed",
+                provider=provider_name,
+                provider_attempt=provider_attempt,
+                error=error_msg,
+            )
+            continue
+
+        router.record_success(provider_name, time.monotonic() - started, track.duration_s)
+        if provider_name != track.provider:
             logger.warning(
-                f"Job {job.id}: Falling back to {fallback_provider}, "
-                f"track_id={track.id}, attempt={provider_attempt}"
+                f"Job {job.id}: Fell back from {track.provider} to {provider_name}, "
+                f"track_id={track.id}"
+            )
+            events.record(
+                "fallback",
+                message=f"Fell back from {track.provider} to {provider_name}",
+                provider=provider_name,
+                provider_attempt=provider_attempt,
+            )
+            track.provider = provider_name  # Update track to reflect fallback
+        break
+
+    if result is None:
+        if provider_errors:
+            raise Exception(f"All providers failed: {'; '.join(provider_errors)}")
+        if denied:
+            # Nothing was attempted: the breakers turned every provider away
+            raise ProviderUnavailableError(
+                f"All music providers are unavailable ({', '.join(denied)}). "
+                "Please try again shortly."
+            )
+        raise Exception(f"Render timed out after {budget_s:.0f}s")
+
+    return result
+
+
+def obtain_render(
+    db,
+    engine,
+    job: Job,
+    track: Track,
+    params: dict,
+    object_key: str,
+    owner: str,
+    events: JobEventBuffer,
+) -> str:
+    """
+    Store the track's audio at object_key, rendering only when necessary
+
+    Seeded renders are deterministic, so an identical stored render is
+    copied instead, and an identical render already in flight is waited on
+    rather than sent to a provider a second time. Each track keeps its own
+    job, object and credits either way. Returns the stored file URL.
+    """
+    storage = get_storage_service()
+    render_cache = get_render_cache()
+    requested_provider = track.provider
+
+    def copy_render(source_key: str, source: str) -> Optional[str]:
+        try:
+            with stage_timer("cache_copy", requested_provider, track.duration_s):
+                file_url = storage.copy_object(source_key, object_key)
+        except Exception as e:
+            logger.warning(f"Job {job.id}: {source} render {source_key} unusable: {e}")
+            return None
+        logger.info(f"Job {job.id}: Reused {source} render {source_key}, track_id={track.id}")
+        events.record("reused", message=f"Reused {source} render", data={"object_key": source_key})
+        return file_url
+
+    cached_key = render_cache.get(params, requested_provider)
+    if cached_key:
+        file_url = copy_render(cached_key, "cached")
+        if file_url:
+            return file_url
+        render_cache.invalidate(params, requested_provider)
+
+    # Single flight: attach to an identical render already in flight
+    leader = render_cache.claim(params, requested_provider, owner)
+    if not leader:
+        logger.info(f"Job {job.id}: Waiting on identical in-flight render, track_id={track.id}")
+        # Wait one render budget per task run, leaving this run's store
+        # margin for the copy; a leader that is resuming takes several
+        wait_s = render_time_budget_s(track.duration_s)
+        with stage_timer("coalesce_wait", requested_provider, track.duration_s):
+            shared_key = render_cache.wait(params, requested_provider, timeout=wait_s)
+        if shared_key:
+            file_url = copy_render(shared_key, "coalesced")
+            if file_url:
+                return file_url
+        # Take over only once the other render has given up its claim;
+        # rendering alongside it would pay for the same render twice
+        leader = render_cache.claim(params, requested_provider, owner)
+        if not leader:
+            raise RenderCoalescePending(
+                f"Identical render still in flight after waiting {wait_s:.0f}s"
             )
-            try:
-                provider = get_provider(fallback_provider)
-                track.provider = fallback_provider  # Update track to reflect fallback
-                provider_name = fallback_provider
-                db.commit()
-                logger.info(
-                    f"Job {job.id}: Fallback successful, using {fallback_provider}, "
-                    f"track_id={track.id}"
-                )
-            except Exception as fallback_error:
-                fallback_error_code = "403" if "403" in str(fallback_error) or "Forbidden" in str(fallback_error) else "unknown"
-                logger.error(
-                    f"Job {job.id}: Fallback provider ({fallback_provider}) also failed: {fallback_error}, "
-                    f"track_id={track.id}, error_code={fallback_error_code}"
-                )
-                raise Exception(
-                    f"Primary provider ({track.provider}) failed: {str(e)}. "
-                    f"Fallback provider ({fallback_provider}) also failed: {str(fallback_error)}"
-                )
+
+    stored_key = None
+    try:
+        result = render_with_fallback(db, engine, job, track, params, events)
+
+        get_job_lifecycle().advance(db, job, 0.8, commit=False)
+        events.record("rendered", provider=track.provider)
+        events.flush(db)
+        with stage_timer("db_commit", track.provider, track.duration_s):
+            db.commit()
+        get_job_progress_publisher().publish(job)
+
+        # Download the generated file and upload it to our storage (one
+        # stage: the download is streamed straight into a multipart upload)
+        with stage_timer("store", track.provider, track.duration_s):
+            file_url = storage.upload_from_url(result["file_url"], object_key)
+        stored_key = object_key
+        render_cache.put(params, track.provider, object_key)
+        return file_url
+    except (RenderDeadlineExceeded, SoftTimeLimitExceeded):
+        if leader and job.provider_ticket:
+            # The provider is still rendering: keep (and renew) the claim so
+            # waiters don't submit a second render; the resumed run re-takes
+            # it as the same owner, and a run that gives up releases it
+            render_cache.claim(params, requested_provider, owner)
+            leader = False
+        raise
+    finally:
+        if leader:
+            render_cache.release(params, requested_provider, owner, stored_key)
+
+
+def fail_render(db, job: Job, track: Track, error: str, events: JobEventBuffer):
+    """Mark the job and track failed and refund the render, once"""
+    if not get_job_lifecycle().fail(db, job, error, commit=False):
+        db.rollback()
+        return
+    track.status = TrackStatus.FAILED
+    track.error_message = error
+    events.record("failed", provider=track.provider, error=error)
+    events.flush(db)
+    db.commit()
+    get_job_progress_publisher().publish(job)
+
+    # Refund credits for failed render (only if not in free mode)
+    free_mode = get_free_mode_service()
+    if not free_mode.is_enabled():
+        credit_service = get_credit_service()
+        # Determine refund reason based on error
+        error_str = error.lower()
+        if "timeout" in error_str or "timed out" in error_str:
+            reason = "refund_failure"
+        else:
+            reason = "refund_failure"
+
+        credit_service.refund_failed_render(
+            db, track.user_id, track.id, reason=reason
+        )
+
+
+@celery_app.task(bind=True, name="generate_music")
+def generate_music_task(self, track_id: int, user_id: Optional[int] = None):
+    """
+    Generate music for a track
+
+    The render is submitted to the provider and awaited on the shared
+    generation engine loop, so with a thread pool (--pool threads) one worker
+    process keeps many renders in flight instead of one per process.
+    user_id is the track's owner, whose render slot the run releases even
+    if the track is gone (tasks queued before it was passed omit it).
+    """
+    db = SessionLocal()
+    engine = get_generation_engine()
+    lifecycle = get_job_lifecycle()
+    started = time.monotonic()
+    # Whether this run holds the user's render slot until it finishes
+    holds_slot = True
+    try:
+        track = db.query(Track).filter(Track.id == track_id).first()
+        if not track:
+            return {"error": "Track not found"}
+
+        # The job create_track queued for this task; retries and resumes
+        # continue the same row (and its checkpoint)
+        job = lifecycle.for_task(db, track, self.request.id)
+        events = JobEventBuffer(job)
+        if not lifecycle.start(db, job, commit=False):
+            # Redelivered after it finished: its run already released the slot
+            db.rollback()
+            holds_slot = False
+            return {"status": job.status.value, "track_id": track_id}
+
+        # Update track status with the job in one commit
+        track.status = TrackStatus.RENDERING
+        events.record(
+            "started",
+            message="Resumed after time limit" if job.provider_ticket else None,
+            provider=track.provider,
+        )
+        events.flush(db)
+        with stage_timer("db_commit", track.provider, track.duration_s):
+            db.commit()
+        get_job_progress_publisher().publish(job)
+        if not self.request.retries:
+            observe_queue_wait(job.created_at, track.provider, track.duration_s)
 
         # Get reference URL if available
         reference_url = None
@@ -105,63 +399,113 @@ def generate_music_task(self, track_id: int):
             if ref_file:
                 reference_url = ref_file.url
 
-        # Update progress
-        job.progress = 0.1
-        db.commit()
-
-        # Generate music
-        result = provider.generate(
-            prompt=track.prompt,
-            duration_s=track.duration_s,
-            lyrics=track.lyrics if track.has_vocals else None,
-            style_strength=track.style_strength,
-            seed=track.seed,
-            reference_url=reference_url,
-        )
-
-        job.progress = 0.8
-        db.commit()
+        # Read generation parameters before committing so no DB connection
+        # is checked out while the render is in flight
+        params = {
+            "prompt": track.prompt,
+            "duration_s": track.duration_s,
+            "lyrics": track.lyrics if track.has_vocals else None,
+            "style_strength": track.style_strength,
+            "seed": track.seed,
+            "reference_url": reference_url,
+        }
 
-        # Download and store the generated file
-        storage = get_storage_service()
+        # The in-flight claim is keyed by the provider asked for, even if
+        # the render falls back to another one
+        requested_provider = track.provider
         object_key = f"tracks/{track.user_id}/{track.id}/{datetime.now().isoformat()}.mp3"
-        
-        # Upload from provider URL to our storage
-        file_url = storage.upload_from_url(result["file_url"], object_key)
+        file_url = obtain_render(
+            db, engine, job, track, params, object_key, owner=self.request.id, events=events
+        )
 
         # Update job and track
-        job.progress = 1.0
-        job.status = JobStatus.COMPLETE
+        lifecycle.complete(db, job, commit=False)
         track.status = TrackStatus.COMPLETE
         track.file_url = file_url
         track.preview_url = file_url  # Use same URL for preview initially
-        db.commit()
+        events.record("completed", provider=track.provider)
+        events.flush(db)
+        with stage_timer("db_commit", track.provider, track.duration_s):
+            db.commit()
+        get_job_progress_publisher().publish(job)
+        observe_stage("total", track.provider, track.duration_s, time.monotonic() - started)
 
         return {"status": "complete", "track_id": track_id}
+    except (SoftTimeLimitExceeded, RenderDeadlineExceeded) as e:
+        if "job" in locals() and job.provider_ticket and self.request.retries < RENDER_MAX_RESUMES:
+            # The provider is still working on a paid render: keep the
+            # checkpoint and resume waiting in a fresh task run
+            logger.warning(
+                f"Job {job.id}: Render pending at its time limit, resuming "
+                f"{job.provider_ticket['provider']} request {job.provider_ticket['request_id']}, "
+                f"track_id={track_id}, resume={self.request.retries + 1}"
+            )
+            events.record(
+                "deadline",
+                message="Render pending at its time limit, resuming",
+                provider=job.provider_ticket["provider"],
+                data={"request_id": job.provider_ticket["request_id"]},
+            )
+            events.flush(db)
+            db.commit()
+            holds_slot = False
+            raise self.retry(countdown=RENDER_RESUME_DELAY_S, max_retries=RENDER_MAX_RESUMES)
+        error = "Render timed out" if isinstance(e, SoftTimeLimitExceeded) else str(e)
+        if "requested_provider" in locals():
+            # Not resuming: let renders waiting on this one take over
+            get_render_cache().release(params, requested_provider, self.request.id)
+        if "job" in locals():
+            fail_render(db, job, track, error, events)
+        return {"error": error}
+    except RenderCoalescePending as e:
+        if self.request.retries < RENDER_COALESCE_RETRIES:
+            # Keep waiting on the leader in a fresh task run
+            logger.info(f"Job {job.id}: {e}, waiting again, track_id={track_id}")
+            events.record("coalesce_pending", message=str(e))
+            events.flush(db)
+            db.commit()
+            holds_slot = False
+            raise self.retry(countdown=RENDER_RESUME_DELAY_S, max_retries=RENDER_COALESCE_RETRIES)
+        fail_render(db, job, track, str(e), events)
+        return {"error": str(e)}
+    except ProviderUnavailableError as e:
+        if "job" in locals() and self.request.retries < RENDER_UNAVAILABLE_RETRIES:
+            # Not a provider failure: requeue once the breakers may admit it
+            cooldown_s = get_provider_router().cooldown_s
+            logger.warning(
+                f"Job {job.id}: {e} Retrying in {cooldown_s:.0f}s, track_id={track_id}, "
+                f"retry={self.request.retries + 1}"
+            )
+            events.record("provider_unavailable", message=str(e), level="warning")
+            events.flush(db)
+            db.commit()
+            holds_slot = False
+            raise self.retry(countdown=cooldown_s, max_retries=RENDER_UNAVAILABLE_RETRIES)
+        if "job" in locals():
+            fail_render(db, job, track, str(e), events)
+        return {"error": str(e)}
     except Exception as e:
         # Update job with error
         if "job" in locals() and "track" in locals():
-            job.status = JobStatus.FAILED
-            job.error = str(e)
-            track.status = TrackStatus.FAILED
-            track.error_message = str(e)
-            db.commit()
-            
-            # Refund credits for failed render (only if not in free mode)
-            free_mode = get_free_mode_service()
-            if not free_mode.is_enabled():
-                credit_service = get_credit_service()
-                # Determine refund reason based on error
-                error_str = str(e).lower()
-                if "timeout" in error_str or "timed out" in error_str:
-                    reason = "refund_failure"
-                else:
-                    reason = "refund_failure"
-                
-                credit_service.refund_failed_render(
-                    db, track.user_id, track.id, reason=reason
-                )
+            fail_render(db, job, track, str(e), events)
         return {"error": str(e)}
     finally:
+        if holds_slot:
+            if "track" in locals() and track is not None:
+                user_id = track.user_id
+            if user_id is not None:
+                get_render_scheduler().release(user_id)
         db.close()
 
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """Expose render metrics when WORKER_METRICS_PORT is set"""
+    port = os.getenv("WORKER_METRICS_PORT")
+    if port:
+        start_worker_metrics_server(int(port))
+
+
+@worker_process_shutdown.connect
+def release_process_metrics(pid=None, **kwargs):
+    mark_worker_process_dead(pid or os.getpid())
@@ -0,0 +1,32 @@
+"""
+Create upcoming monthly job_events partitions and drop expired ones
+Run daily (or at least monthly, well before each month starts)
+"""
+import argparse
+from app.database import SessionLocal
+from app.services.job_events import ensure_partitions, drop_partitions
+
+
+def manage_job_event_partitions(months_ahead: int = 3, retain_months: int = None):
+    """Keep job_events partitions ahead of time and prune past retention"""
+    db = SessionLocal()
+    try:
+        created = ensure_partitions(db, months_ahead=months_ahead)
+        print(f"Created {len(created)} partitions: {', '.join(created) or '-'}")
+        if retain_months is not None:
+            dropped = drop_partitions(db, retain_months)
+            print(f"Dropped {len(dropped)} partitions: {', '.join(dropped) or '-'}")
+    except Exception as e:
+        db.rollback()
+        print(f"Error managing job event partitions: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--months-ahead", type=int, default=3, help="Months of partitions to create ahead")
+    parser.add_argument("--retain-months", type=int, default=None, help="Drop partitions older than this many months")
+    args = parser.parse_args()
+    manage_job_event_partitions(months_ahead=args.months_ahead, retain_months=args.retain_months)
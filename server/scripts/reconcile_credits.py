@@ -0,0 +1,41 @@
+"""
+Reconcile users.credits against credit_ledger
+Incremental by default; pass --full to rebuild totals and --repair to fix drift
+"""
+import argparse
+from app.database import SessionLocal
+from app.services.credit_reconciliation_service import get_credit_reconciliation_service
+
+
+def reconcile_credits(full: bool = False, repair: bool = False, limit: int = None):
+    """Refresh ledger totals and report drifted balances"""
+    service = get_credit_reconciliation_service()
+    db = SessionLocal()
+    try:
+        report = service.reconcile(db, incremental=not full, repair=repair, limit=limit)
+        refresh = report["refresh"]
+        print(
+            f"Folded ledger ids {refresh['from_id']}..{refresh['to_id']} "
+            f"in {refresh['batches']} batches ({refresh['users']} user totals)"
+        )
+        for mismatch in report["mismatches"]:
+            print(
+                f"user={mismatch['user_id']} credits={mismatch['credits']} "
+                f"expected={mismatch['expected']} drift={mismatch['drift']:+d}"
+            )
+        print(f"Found {len(report['mismatches'])} mismatches, repaired {report['repaired']}")
+    except Exception as e:
+        db.rollback()
+        print(f"Error reconciling credits: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--full", action="store_true", help="Rebuild totals from the whole ledger")
+    parser.add_argument("--repair", action="store_true", help="Reset drifted balances to ledger values")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many mismatches")
+    args = parser.parse_args()
+    reconcile_credits(full=args.full, repair=args.repair, limit=args.limit)
@@ -3,8 +3,18 @@ Pytest configuration and fixtures
 """
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import sessionmaker
 from app.database import Base
+import app.models  # noqa: F401  Register every table (and relationship target)
+from app.models.series import Series  # noqa: F401  Not exported by app.models
+
+
+@compiles(JSONB, "sqlite")
+def compile_jsonb_sqlite(element, compiler, **kw):
+    """Store PostgreSQL JSONB columns as JSON in the SQLite test database"""
+    return "JSON"
 
 
 @pytest.fixture
@@ -0,0 +1,172 @@
+"""
+Unit tests for reference upload handling
+"""
+import hashlib
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from botocore.exceptions import ClientError
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.api import analyze
+from app.database import get_async_db
+from app.models.file import File as FileModel
+from app.models.user import User
+from app.services.storage import StorageService
+
+BOUNDARY = "upload-boundary"
+
+
+def multipart_body(content: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="ref.mp3"\r\n'
+        "Content-Type: audio/mpeg\r\n\r\n"
+    ).encode() + content + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+class TestUploadLimit:
+    """Test that oversized reference uploads are rejected with 413"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        monkeypatch.setattr(analyze, "MAX_REFERENCE_UPLOAD_BYTES", 1024)
+        app = FastAPI()
+        app.include_router(analyze.router, prefix="/api/analyze")
+
+        async def no_db():
+            pytest.fail("An oversized upload reached the endpoint")
+            yield
+
+        app.dependency_overrides[get_async_db] = no_db
+        return TestClient(app)
+
+    def post(self, client, content, **headers):
+        return client.post(
+            "/api/analyze/reference",
+            content=content,
+            headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}", **headers},
+        )
+
+    def test_rejects_oversized_content_length(self, client):
+        """Test that a declared size over the cap is refused before reading"""
+        response = self.post(client, multipart_body(b"x" * 4096))
+
+        assert response.status_code == 413
+
+    def test_rejects_chunked_body_over_cap(self, client):
+        """Test that a body without Content-Length is cut off while streaming"""
+        body = multipart_body(b"x" * 4096)
+
+        def chunks():
+            for i in range(0, len(body), 512):
+                yield body[i:i + 512]
+
+        response = self.post(client, chunks())
+
+        assert response.status_code == 413
+
+    def test_rejects_body_larger_than_declared(self, client):
+        """Test that an understated Content-Length doesn't bypass the cap"""
+        body = multipart_body(b"x" * 4096)
+
+        def chunks():
+            for i in range(0, len(body), 512):
+                yield body[i:i + 512]
+
+        response = self.post(client, chunks(), **{"Content-Length": "100"})
+
+        assert response.status_code == 413
+
+
+class FakeSession:
+    """Just the AsyncSession calls analyze_reference makes, over a list of files"""
+
+    def __init__(self):
+        self.user = User(id=1, email="test@example.com")
+        self.files = []
+
+    async def scalar(self, stmt):
+        entity = stmt.column_descriptions[0]["entity"]
+        if entity is User:
+            return self.user
+        sha256 = stmt.whereclause.clauses[0].right.value
+        return next((f for f in self.files if f.sha256 == sha256), None)
+
+    def add(self, record):
+        record.id = len(self.files) + 1
+        self.files.append(record)
+
+    async def commit(self):
+        pass
+
+
+class TestReferenceDedup:
+    """Test content-addressed storage of reference uploads"""
+
+    @pytest.fixture
+    def session(self):
+        return FakeSession()
+
+    @pytest.fixture
+    def storage(self):
+        with patch("boto3.client"):
+            storage = StorageService()
+        storage.s3_client = MagicMock()
+        return storage
+
+    @pytest.fixture
+    def client(self, session, storage):
+        app = FastAPI()
+        app.include_router(analyze.router, prefix="/api/analyze")
+
+        async def fake_db():
+            yield session
+
+        app.dependency_overrides[get_async_db] = fake_db
+        analyzer = MagicMock()
+        analyzer.analyze_async = AsyncMock(
+            return_value={"bpm": 120, "key": "A", "energy": 0.2, "loudness": 4.0}
+        )
+        with patch.object(analyze, "get_storage_service", return_value=storage), \
+                patch.object(analyze, "get_audio_analyzer", return_value=analyzer):
+            yield TestClient(app)
+
+    def upload(self, client, content):
+        response = client.post(
+            "/api/analyze/reference", files={"file": ("ref.mp3", content, "audio/mpeg")}
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    def uploaded_keys(self, storage):
+        return [c.args[2] for c in storage.s3_client.upload_file.call_args_list]
+
+    def test_identical_bytes_reuse_stored_object(self, client, session, storage):
+        """Test that re-uploading the same bytes stores them once"""
+        first = self.upload(client, b"riff")
+        second = self.upload(client, b"riff")
+
+        digest = hashlib.sha256(b"riff").hexdigest()
+        assert self.uploaded_keys(storage) == [f"references/sha256/{digest[:2]}/{digest}.mp3"]
+        assert second["file_id"] == first["file_id"]
+        assert second["bpm"] == 120
+
+    def test_different_bytes_get_different_keys(self, client, storage):
+        """Test that the object key is the content's digest"""
+        self.upload(client, b"riff")
+        self.upload(client, b"other riff")
+
+        first, second = self.uploaded_keys(storage)
+        assert first != second
+        assert hashlib.sha256(b"other riff").hexdigest() in second
+
+    def test_missing_object_is_uploaded_again(self, client, session, storage):
+        """Test that a record whose object is gone doesn't hand out a dangling URL"""
+        self.upload(client, b"riff")
+        storage.s3_client.head_object.side_effect = ClientError(
+            {"Error": {"Code": "404"}}, "HeadObject"
+        )
+        self.upload(client, b"riff")
+
+        assert len(self.uploaded_keys(storage)) == 2
+        assert session.files[0].url.endswith(self.uploaded_keys(storage)[1])
@@ -0,0 +1,49 @@
+"""
+Unit tests for audio analysis
+"""
+import librosa
+import numpy as np
+import pytest
+import soundfile as sf
+from app.services.audio_analyzer import AudioAnalyzer
+
+
+class TestAudioAnalyzer:
+    """Test that reduced-rate analysis matches librosa's 22050 Hz defaults"""
+
+    @pytest.fixture
+    def track_path(self, tmp_path):
+        # An A3 + E4 dyad with a noise burst every half second (120 BPM)
+        sr = 22050
+        t = np.arange(sr * 20) / sr
+        y = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 330 * t)
+        burst = np.random.default_rng(0).standard_normal(400) * np.exp(-np.arange(400) / 80)
+        for beat_s in np.arange(0, 20, 0.5):
+            start = int(beat_s * sr)
+            y[start:start + 400] += 0.8 * burst
+        path = tmp_path / "track.wav"
+        sf.write(path, y, sr)
+        return str(path)
+
+    def baseline(self, path):
+        """The analysis as it ran at librosa's defaults"""
+        y, sr = librosa.load(path, duration=60)
+        tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+        return {
+            "bpm": int(round(float(np.atleast_1d(tempo)[0]))),
+            "energy": float(np.mean(librosa.feature.rms(y=y)[0])),
+        }
+
+    def test_tempo_matches_baseline(self, track_path):
+        """Test that the lower sample rate keeps beat resolution"""
+        assert AudioAnalyzer().analyze(track_path)["bpm"] == self.baseline(track_path)["bpm"]
+
+    def test_energy_matches_baseline(self, track_path):
+        """Test that stored energy stays comparable with earlier analyses"""
+        result = AudioAnalyzer().analyze(track_path)
+        assert result["energy"] == pytest.approx(self.baseline(track_path)["energy"], rel=0.03)
+        assert result["loudness"] == pytest.approx(result["energy"] * 20)
+
+    def test_key(self, track_path):
+        """Test that the dominant pitch class is detected"""
+        assert AudioAnalyzer().analyze(track_path)["key"] == "A"
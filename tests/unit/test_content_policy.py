@@ -0,0 +1,96 @@
+"""
+Unit tests for content policy
+"""
+import json
+import os
+import pytest
+from app.services.content_policy import ContentPolicy, TermMatcher, normalize_text
+
+
+class TestTermMatcher:
+    """Test the multi-pattern matcher"""
+
+    def test_finds_overlapping_terms(self):
+        """Test that terms sharing prefixes and suffixes are all found"""
+        matcher = TermMatcher([("he", "a"), ("she", "a"), ("hers", "a"), ("his", "a")])
+
+        assert sorted(t for t, _ in matcher.find("she hers his")) == ["hers", "his", "she"]
+
+    def test_matches_whole_words_only(self):
+        """Test word-boundary matching"""
+        matcher = TermMatcher([("drake", "celebrity")])
+
+        assert list(matcher.find("mandrake root")) == []
+        assert list(matcher.find("like drake, but softer")) == [("drake", "celebrity")]
+
+    def test_normalizes_unicode(self):
+        """Test accent, width and case folding"""
+        assert normalize_text("Beyoncé") == "beyonce"
+        assert normalize_text("ＴＡＹＬＯＲ   Swift") == "taylor swift"
+
+
+class TestContentPolicy:
+    """Test content policy checks"""
+
+    @pytest.fixture
+    def policy(self, monkeypatch):
+        monkeypatch.delenv("CONTENT_POLICY_BLOCKLIST_PATH", raising=False)
+        return ContentPolicy()
+
+    def test_allows_clean_prompt(self, policy):
+        """Test that ordinary prompts pass"""
+        assert policy.check_prompt("lofi beat with warm rhodes") == (True, "")
+
+    def test_blocks_celebrity(self, policy):
+        """Test celebrity names are blocked regardless of accents"""
+        allowed, reason = policy.check_prompt("a song in the style of BEYONCÉ")
+
+        assert not allowed
+        assert "celebrity" in reason
+
+    def test_checks_prompt_and_lyrics_together(self, policy):
+        """Test that the most severe violation across texts is reported"""
+        allowed, reason = policy.check_text("nsfw synthwave", "dancing with taylor swift")
+
+        assert not allowed
+        assert "taylor swift" in reason
+
+    def test_reloads_blocklist_file(self, tmp_path, monkeypatch):
+        """Test hot reload of the blocklist file"""
+        path = tmp_path / "blocklist.json"
+        path.write_text(json.dumps({"trademark": ["pokemon"]}))
+        monkeypatch.setenv("CONTENT_POLICY_BLOCKLIST_PATH", str(path))
+        monkeypatch.setenv("CONTENT_POLICY_RELOAD_S", "0")
+        policy = ContentPolicy()
+
+        assert not policy.check_prompt("pokemon battle theme")[0]
+        assert policy.check_prompt("zelda overworld theme")[0]
+
+        path.write_text(json.dumps({"trademark": ["zelda"]}))
+        os.utime(path, (1, 1))
+
+        assert not policy.check_prompt("zelda overworld theme")[0]
+        assert policy.check_prompt("pokemon battle theme")[0]
+
+    @pytest.mark.parametrize(
+        "broken", ["{not json", json.dumps(["zelda"]), json.dumps({"trademark": "zelda"})]
+    )
+    def test_bad_reload_keeps_current_terms(self, tmp_path, monkeypatch, broken):
+        """Test that a malformed or mis-shaped blocklist doesn't drop loaded terms"""
+        path = tmp_path / "blocklist.json"
+        path.write_text(json.dumps({"trademark": ["pokemon"]}))
+        monkeypatch.setenv("CONTENT_POLICY_BLOCKLIST_PATH", str(path))
+        monkeypatch.setenv("CONTENT_POLICY_RELOAD_S", "0")
+        policy = ContentPolicy()
+
+        path.write_text(broken)
+        os.utime(path, (1, 1))
+
+        assert not policy.check_prompt("pokemon battle theme")[0]
+        assert policy.check_prompt("zelda overworld theme")[0]
+
+        # Retried until the file is fixed
+        path.write_text(json.dumps({"trademark": ["zelda"]}))
+        os.utime(path, (2, 2))
+
+        assert not policy.check_prompt("zelda overworld theme")[0]
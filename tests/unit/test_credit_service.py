@@ -3,7 +3,9 @@ Unit tests for credit service
 """
 import pytest
 from datetime import datetime, timedelta
+from unittest.mock import patch
 from app.services.credit_service import CreditService
+from app.models.credit_ledger import CreditLedger
 from app.models.user import User, PlanType
 
 
@@ -39,3 +41,37 @@ class TestCreditService:
         assert not allowed
         assert "credits" in error.lower()
 
+
+    @pytest.fixture
+    def debited(self, service, db_session):
+        """A user whose 60s render of a track was debited (10 -> 8 credits)"""
+        user = User(email="test@example.com", plan=PlanType.PRO, credits=10)
+        db_session.add(user)
+        db_session.commit()
+        with patch("app.services.credit_service.get_free_mode_service") as free_mode:
+            free_mode.return_value.is_enabled.return_value = False
+            assert service.debit_credits(db_session, user.id, 60, track_id=7)
+        return user
+
+    def refunds(self, db_session, user):
+        return db_session.query(CreditLedger).filter(
+            CreditLedger.user_id == user.id, CreditLedger.delta > 0
+        ).count()
+
+    def test_refund_is_applied_once(self, service, db_session, debited):
+        """Test that refunding the same track twice credits it once"""
+        assert service.refund_failed_render(db_session, debited.id, 7)
+        assert not service.refund_failed_render(db_session, debited.id, 7)
+
+        assert service.get_user_credits(db_session, debited.id) == 10
+        assert self.refunds(db_session, debited) == 1
+
+    def test_concurrent_refund_loses_on_unique_index(self, service, db_session, debited):
+        """Test that a refund racing past the already-refunded check still credits once"""
+        debit = db_session.query(CreditLedger).filter(CreditLedger.delta < 0).one()
+        with patch.object(service, "_find_refundable_debit", return_value=(debit, False)):
+            assert service.refund_failed_render(db_session, debited.id, 7)
+            assert not service.refund_failed_render(db_session, debited.id, 7)
+
+        assert service.get_user_credits(db_session, debited.id) == 10
+        assert self.refunds(db_session, debited) == 1
@@ -0,0 +1,50 @@
+"""
+Unit tests for the job event log
+"""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from app.services.job_events import JobEventBuffer, error_code
+
+
+class TestErrorCode:
+    """Test provider error classification"""
+
+    def test_http_status_extracted(self):
+        """Test that HTTP status codes are picked out of messages"""
+        assert error_code("Client error '429 Too Many Requests'") == "429"
+        assert error_code("Forbidden: invalid key") == "403"
+
+    def test_timeouts_and_unknown(self):
+        """Test fallbacks when no status code is present"""
+        assert error_code("Render timed out after 180s") == "timeout"
+        assert error_code("All music providers are unavailable (fal)") == "unavailable"
+        assert error_code("Something broke") == "unknown"
+
+
+class TestJobEventBuffer:
+    """Test batching of job events"""
+
+    @pytest.fixture
+    def events(self):
+        return JobEventBuffer(SimpleNamespace(id=7, attempts=2))
+
+    def test_events_carry_job_and_attempt(self, events):
+        """Test that events are stamped with the job's current run"""
+        events.record("provider_failed", provider="fal", provider_attempt=1, error="HTTP 500")
+        event = events.pending[0]
+        assert (event["job_id"], event["attempt"]) == (7, 2)
+        assert event["level"] == "error"
+        assert event["error_code"] == "500"
+        assert event["message"] == "HTTP 500"
+
+    def test_flush_writes_one_batch(self, events):
+        """Test that pending events are inserted in a single statement"""
+        db = MagicMock()
+        events.record("started")
+        events.record("submitted", provider="fal")
+        events.flush(db)
+        events.flush(db)
+        assert db.execute.call_count == 1
+        assert len(db.execute.call_args[0][1]) == 2
+        assert events.pending == []
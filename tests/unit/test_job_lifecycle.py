@@ -0,0 +1,57 @@
+"""
+Unit tests for job lifecycle transitions
+"""
+import pytest
+from app.services.job_lifecycle import JobLifecycle
+from app.models.job import Job, JobStatus
+from app.models.track import Track
+
+
+class TestJobLifecycle:
+    """Test single-row job state transitions"""
+
+    @pytest.fixture
+    def lifecycle(self):
+        return JobLifecycle()
+
+    @pytest.fixture
+    def track(self, db_session):
+        track = Track(user_id=1, prompt="lofi beat", duration_s=30, provider="fal")
+        db_session.add(track)
+        db_session.commit()
+        return track
+
+    @pytest.fixture
+    def job(self, db_session, track):
+        job = Job(track_id=track.id, task_id="task-1", status=JobStatus.QUEUED, progress=0.0)
+        db_session.add(job)
+        db_session.commit()
+        return job
+
+    def test_worker_reuses_queued_job(self, lifecycle, db_session, track, job):
+        """Test that the task picks up the job create_track wrote"""
+        assert lifecycle.for_task(db_session, track, "task-1").id == job.id
+        assert db_session.query(Job).count() == 1
+
+    def test_start_counts_attempts(self, lifecycle, db_session, job):
+        """Test that each run of a task is counted on the same row"""
+        assert lifecycle.start(db_session, job)
+        assert lifecycle.start(db_session, job)
+        assert job.status == JobStatus.PROCESSING
+        assert job.attempts == 2
+
+    def test_finished_job_is_not_restarted(self, lifecycle, db_session, job):
+        """Test that a redelivered task can't reopen a complete job"""
+        lifecycle.start(db_session, job)
+        assert lifecycle.complete(db_session, job)
+        assert not lifecycle.start(db_session, job)
+        assert not lifecycle.fail(db_session, job, "late failure")
+        assert job.status == JobStatus.COMPLETE
+        assert job.error is None
+
+    def test_progress_never_moves_backwards(self, lifecycle, db_session, job):
+        """Test that progress updates only raise progress"""
+        lifecycle.start(db_session, job)
+        assert lifecycle.advance(db_session, job, 0.8)
+        assert not lifecycle.advance(db_session, job, 0.1)
+        assert job.progress == 0.8
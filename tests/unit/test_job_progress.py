@@ -0,0 +1,58 @@
+"""
+Unit tests for job progress fan-out
+"""
+import asyncio
+import json
+import pytest
+from app.services.job_progress import JobProgressHub, RESYNC, SUBSCRIBER_QUEUE_SIZE
+
+
+class TestJobProgressHub:
+    """Test delivery of published updates to subscribers"""
+
+    @pytest.fixture
+    def hub(self, monkeypatch):
+        monkeypatch.setenv("REDIS_URL", "redis://127.0.0.1:1/0")
+        return JobProgressHub()
+
+    def subscribe(self, hub, job_id):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        hub._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def test_dispatch_routes_by_job_id(self, hub):
+        """Test that updates only reach the job's subscribers"""
+        first = self.subscribe(hub, 1)
+        second = self.subscribe(hub, 2)
+        hub._dispatch(json.dumps({"id": 1, "status": "processing", "progress": 0.1}))
+        assert first.get_nowait()["progress"] == 0.1
+        assert second.empty()
+
+    def test_full_queue_keeps_newest_update(self, hub):
+        """Test that a slow subscriber drops old updates, not new ones"""
+        queue = self.subscribe(hub, 1)
+        for i in range(SUBSCRIBER_QUEUE_SIZE + 3):
+            hub._dispatch(json.dumps({"id": 1, "progress": i}))
+        assert queue.qsize() == SUBSCRIBER_QUEUE_SIZE
+        updates = [queue.get_nowait()["progress"] for _ in range(SUBSCRIBER_QUEUE_SIZE)]
+        assert updates[-1] == SUBSCRIBER_QUEUE_SIZE + 2
+
+    def test_unsubscribe_removes_empty_job(self, hub):
+        """Test that the last unsubscribe forgets the job"""
+        queue = self.subscribe(hub, 1)
+        hub.unsubscribe(1, queue)
+        assert 1 not in hub._subscribers
+
+    def test_malformed_message_ignored(self, hub):
+        """Test that non-JSON messages are dropped"""
+        queue = self.subscribe(hub, 1)
+        hub._dispatch("not json")
+        assert queue.empty()
+
+    def test_resubscribe_asks_every_stream_to_resync(self, hub):
+        """Test that (re)subscribing tells streams to re-read their jobs"""
+        first = self.subscribe(hub, 1)
+        second = self.subscribe(hub, 2)
+        hub._resync()
+        assert first.get_nowait() is RESYNC
+        assert second.get_nowait() is RESYNC
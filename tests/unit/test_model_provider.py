@@ -1,8 +1,16 @@
 """
 Unit tests for model providers
 """
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import time
 import pytest
 from unittest.mock import Mock, patch
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from app.services import fal_provider
 from app.services.model_provider import ModelProvider
 from app.services.fal_provider import FALProvider
 from app.services.replicate_provider import ReplicateProvider
@@ -47,3 +55,129 @@ class TestReplicateProvider:
             with pytest.raises(ValueError):
                 ReplicateProvider()
 
+
+
+class TestProviderWebhooks:
+    """Test provider webhook parsing"""
+
+    def test_providers_implement_async_interface(self):
+        """Test that providers implement submit() and poll()"""
+        assert hasattr(FALProvider, "submit") and hasattr(FALProvider, "poll")
+        assert hasattr(ReplicateProvider, "submit") and hasattr(ReplicateProvider, "poll")
+
+    def test_fal_webhook_success(self):
+        """Test FAL webhook with nested audio object"""
+        request_id, outcome = FALProvider.parse_webhook({
+            "request_id": "req-1",
+            "status": "OK",
+            "payload": {"audio": {"url": "https://fal.media/a.mp3"}},
+        })
+        assert request_id == "req-1"
+        assert outcome == {"file_url": "https://fal.media/a.mp3"}
+
+    def test_fal_webhook_error(self):
+        """Test FAL webhook reporting failure"""
+        request_id, outcome = FALProvider.parse_webhook({
+            "request_id": "req-2",
+            "status": "ERROR",
+            "error": "boom",
+        })
+        assert request_id == "req-2"
+        assert outcome == {"error": "boom"}
+
+    def test_replicate_webhook(self):
+        """Test Replicate webhook success and failure"""
+        request_id, outcome = ReplicateProvider.parse_webhook({
+            "id": "pred-1",
+            "status": "succeeded",
+            "output": ["https://replicate.delivery/a.mp3"],
+        })
+        assert request_id == "pred-1"
+        assert outcome == {"file_url": "https://replicate.delivery/a.mp3"}
+
+        _, outcome = ReplicateProvider.parse_webhook({"id": "pred-2", "status": "failed", "error": "oom"})
+        assert outcome == {"error": "oom"}
+
+
+class TestWebhookSignatures:
+    """Test provider webhook authentication"""
+
+    def replicate_headers(self, key: bytes, body: bytes, timestamp=None):
+        timestamp = str(int(timestamp or time.time()))
+        signed = f"msg_1.{timestamp}.".encode() + body
+        signature = base64.b64encode(hmac.new(key, signed, hashlib.sha256).digest()).decode()
+        return {"webhook-id": "msg_1", "webhook-timestamp": timestamp, "webhook-signature": f"v1,{signature}"}
+
+    def test_replicate_rejects_without_secret(self):
+        """Test that Replicate webhooks are refused until a signing secret is set"""
+        with patch.dict(os.environ, {}, clear=True):
+            assert not ReplicateProvider.webhooks_configured()
+            headers = self.replicate_headers(b"key", b"{}")
+            assert not asyncio.run(ReplicateProvider.verify_webhook(headers, b"{}"))
+
+    def test_replicate_signature(self):
+        """Test that only correctly signed, fresh Replicate webhooks verify"""
+        key = b"0123456789abcdef"
+        secret = "whsec_" + base64.b64encode(key).decode()
+        body = b'{"id": "pred-1"}'
+        with patch.dict(os.environ, {"REPLICATE_WEBHOOK_SECRET": secret}):
+            assert asyncio.run(ReplicateProvider.verify_webhook(self.replicate_headers(key, body), body))
+            assert not asyncio.run(
+                ReplicateProvider.verify_webhook(self.replicate_headers(key, body), b'{"id": "pred-2"}')
+            )
+            stale = self.replicate_headers(key, body, timestamp=time.time() - 3600)
+            assert not asyncio.run(ReplicateProvider.verify_webhook(stale, body))
+
+    def test_fal_signature(self, monkeypatch):
+        """Test that FAL webhooks verify against fal's published keys"""
+        private_key = Ed25519PrivateKey.generate()
+        monkeypatch.setattr(
+            fal_provider, "_jwks_cache", (time.monotonic(), [private_key.public_key()])
+        )
+        body = b'{"request_id": "req-1"}'
+        timestamp = str(int(time.time()))
+        message = "\n".join(["req-1", "user-1", timestamp, hashlib.sha256(body).hexdigest()])
+        headers = {
+            "x-fal-webhook-request-id": "req-1",
+            "x-fal-webhook-user-id": "user-1",
+            "x-fal-webhook-timestamp": timestamp,
+            "x-fal-webhook-signature": private_key.sign(message.encode()).hex(),
+        }
+        assert asyncio.run(FALProvider.verify_webhook(headers, body))
+        assert not asyncio.run(FALProvider.verify_webhook(headers, body + b" "))
+
+
+class TestProviderRegistry:
+    """Test cached provider instances"""
+
+    def test_reuses_provider_instance(self):
+        """Test that the same client is returned while credentials are unchanged"""
+        from app.services.provider_registry import ProviderRegistry
+        registry = ProviderRegistry()
+        with patch.dict("os.environ", {"REPLICATE_API_TOKEN": "token-1"}):
+            assert registry.get("replicate") is registry.get("replicate")
+
+    def test_refreshes_on_credential_rotation(self, tmp_path):
+        """Test that rotating a secrets file builds a new client and closes the old one"""
+        from app.services.provider_registry import ProviderRegistry
+        registry = ProviderRegistry()
+        secret = tmp_path / "replicate_token"
+        secret.write_text("token-1\n")
+        with patch.dict("os.environ", {"REPLICATE_API_TOKEN_FILE": str(secret)}), \
+                patch("app.services.generation_engine.GenerationEngine.close_later") as close_later:
+            first = registry.get("replicate")
+            assert first.client._api_token == "token-1"
+            secret.write_text("token-2\n")
+            os.utime(secret, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+            second = registry.get("replicate")
+            assert second is not first
+            assert second.client._api_token == "token-2"
+            assert registry.get("replicate") is second
+            close_later.assert_called_once_with(first)
+
+    def test_fal_leaves_environment_alone(self):
+        """Test that the FAL provider doesn't copy FAL_API_KEY into FAL_KEY"""
+        with patch.dict("os.environ", {"FAL_API_KEY": "key-1"}, clear=True):
+            provider = FALProvider()
+            assert provider.api_key == "key-1"
+            assert "FAL_KEY" not in os.environ
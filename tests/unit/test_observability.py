@@ -0,0 +1,46 @@
+"""
+Unit tests for observability middleware
+"""
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from app.middleware.observability import ObservabilityMiddleware
+
+
+def request_count(endpoint, status):
+    return REGISTRY.get_sample_value(
+        "http_requests_total", {"method": "GET", "endpoint": endpoint, "status": status}
+    ) or 0
+
+
+class TestObservabilityMiddleware:
+    """Test request metric labelling"""
+
+    @pytest.fixture
+    def client(self):
+        app = FastAPI()
+        router = APIRouter()
+
+        @router.get("/{item_id}/preview")
+        def preview(item_id: int):
+            return {"id": item_id}
+
+        app.include_router(router, prefix="/test/items")
+        app.add_middleware(ObservabilityMiddleware)
+        return TestClient(app)
+
+    def test_labels_by_route_template(self, client):
+        """Test that path parameters don't create new series"""
+        before = request_count("/test/items/{item_id}/preview", "200")
+        for item_id in (1, 2, 3):
+            client.get(f"/test/items/{item_id}/preview")
+        assert request_count("/test/items/{item_id}/preview", "200") == before + 3
+        assert request_count("/test/items/1/preview", "200") == 0
+
+    def test_unmatched_paths_share_a_label(self, client):
+        """Test that unknown paths collapse into one series"""
+        before = request_count("unmatched", "404")
+        client.get("/no/such/path")
+        client.get("/another/missing/path")
+        assert request_count("unmatched", "404") == before + 2
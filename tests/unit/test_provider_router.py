@@ -0,0 +1,115 @@
+"""
+Unit tests for provider router
+"""
+import pytest
+from unittest.mock import patch
+from app.services.provider_router import ProviderRouter, ProviderUnavailableError
+
+
+class TestProviderRouter:
+    """Test health-scored routing and circuit breakers"""
+
+    @pytest.fixture
+    def router(self):
+        router = ProviderRouter()
+        router.failure_threshold = 3
+        router.cooldown_s = 30
+        return router
+
+    def test_prefers_requested_provider_when_healthy(self, router):
+        """Test that the track's provider wins a tie"""
+        assert router.candidates("replicate") == ["replicate", "fal"]
+        assert router.candidates("fal") == ["fal", "replicate"]
+
+    def test_routes_by_health_score(self, router):
+        """Test that a failing provider drops below a healthy one"""
+        router.record_failure("fal")
+        router.record_success("fal", 10)
+        router.record_success("replicate", 10)
+
+        assert router.candidates("fal") == ["replicate", "fal"]
+
+    def test_breaker_opens_after_sustained_failure(self, router):
+        """Test that consecutive failures open the circuit"""
+        for _ in range(3):
+            router.record_failure("fal", "503")
+
+        assert router.snapshot()["fal"]["state"] == "open"
+        assert router.candidates("fal") == ["replicate"]
+        assert not router.acquire("fal")
+
+    def test_half_open_trial_closes_breaker(self, router):
+        """Test that one trial is allowed after the cooldown"""
+        with patch("app.services.provider_router.time.monotonic", return_value=100.0):
+            for _ in range(3):
+                router.record_failure("fal")
+
+        with patch("app.services.provider_router.time.monotonic", return_value=131.0):
+            assert "fal" in router.candidates("fal")
+            assert router.acquire("fal")
+            assert not router.acquire("fal")  # Only one trial at a time
+            router.record_success("fal", 5)
+
+        assert router.snapshot()["fal"]["state"] == "closed"
+
+    def test_trial_slot_lasts_for_the_render(self, router):
+        """Test that a long trial render keeps a second trial out until its budget lapses"""
+        with patch("app.services.provider_router.time.monotonic", return_value=100.0):
+            for _ in range(3):
+                router.record_failure("fal")
+
+        with patch("app.services.provider_router.time.monotonic", return_value=131.0):
+            assert router.acquire("fal", trial_ttl_s=400)
+        with patch("app.services.provider_router.time.monotonic", return_value=500.0):
+            assert not router.acquire("fal")  # Trial still within its budget
+        with patch("app.services.provider_router.time.monotonic", return_value=532.0):
+            assert router.acquire("fal")  # Lost trial's slot lapsed
+
+    def test_half_open_failure_reopens(self, router):
+        """Test that a failed trial re-opens the circuit"""
+        with patch("app.services.provider_router.time.monotonic", return_value=100.0):
+            for _ in range(3):
+                router.record_failure("fal")
+
+        with patch("app.services.provider_router.time.monotonic", return_value=131.0):
+            assert router.acquire("fal")
+            router.record_failure("fal")
+            assert not router.acquire("fal")
+
+    def test_all_open_fails_fast(self, router):
+        """Test that renders fail immediately when no provider is available"""
+        for name in ("fal", "replicate"):
+            for _ in range(3):
+                router.record_failure(name)
+
+        with pytest.raises(ProviderUnavailableError):
+            router.candidates("fal")
+
+    def test_old_outcomes_age_out(self, router):
+        """Test that a sidelined provider recovers its score over time"""
+        with patch("app.services.provider_router.time.monotonic", return_value=100.0):
+            router.record_failure("fal")
+            assert router.candidates("fal") == ["replicate", "fal"]
+
+        with patch("app.services.provider_router.time.monotonic", return_value=401.0):
+            assert router.candidates("fal") == ["fal", "replicate"]
+
+    def test_expected_latency_scales_with_duration(self, router):
+        """Test that observed render time is tracked per second of audio"""
+        assert router.expected_latency_s("fal", 60) is None
+        router.record_success("fal", 30, duration_s=30)
+
+        assert router.expected_latency_s("fal", 120) == pytest.approx(120)
+
+    def test_render_reports_unavailable_when_breakers_deny(self, router):
+        """Test that a render every breaker turns away isn't reported as a timeout"""
+        from unittest.mock import Mock
+        from app.workers import generate_music
+
+        router.candidates = Mock(return_value=["fal", "replicate"])
+        router.acquire = Mock(return_value=False)
+        job = Mock(provider_ticket=None)
+        track = Mock(duration_s=30, provider="fal")
+        with patch.object(generate_music, "get_provider_router", return_value=router):
+            with pytest.raises(ProviderUnavailableError, match="fal, replicate"):
+                generate_music.render_with_fallback(Mock(), Mock(), job, track, {}, Mock())
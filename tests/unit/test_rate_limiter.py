@@ -0,0 +1,115 @@
+"""
+Unit tests for rate limiter
+"""
+import pytest
+from app.services.rate_limiter import RateLimiter, RateLimitPolicy
+
+
+class TestLocalRateLimiter:
+    """Test the in-process GCRA fallback"""
+
+    @pytest.fixture
+    def limiter(self, monkeypatch):
+        monkeypatch.setenv("RATE_LIMIT_BACKEND", "memory")
+        limiter = RateLimiter()
+        limiter.policies["test"] = RateLimitPolicy("test", limit=3, period_s=60)
+        return limiter
+
+    def test_allows_burst_up_to_limit(self, limiter):
+        """Test that the full limit is available as a burst"""
+        policy = limiter.get_policy("test")
+        results = [limiter._hit_local(policy, "k", 100.0) for _ in range(4)]
+
+        assert [allowed for allowed, _, _ in results] == [True, True, True, False]
+        assert [remaining for _, remaining, _ in results[:3]] == [2, 1, 0]
+        assert results[3][2] == pytest.approx(20.0)
+
+    def test_capacity_recovers_over_time(self, limiter):
+        """Test that one request is allowed again after one interval"""
+        policy = limiter.get_policy("test")
+        for _ in range(3):
+            limiter._hit_local(policy, "k", 100.0)
+
+        assert not limiter._hit_local(policy, "k", 119.0)[0]
+        assert limiter._hit_local(policy, "k", 120.0)[0]
+
+    def test_identities_are_independent(self, limiter):
+        """Test that one client exhausting its limit doesn't affect another"""
+        policy = limiter.get_policy("test")
+        for _ in range(3):
+            limiter._hit_local(policy, "a", 100.0)
+
+        assert not limiter._hit_local(policy, "a", 100.0)[0]
+        assert limiter._hit_local(policy, "b", 100.0)[0]
+
+    def test_local_keys_are_bounded(self, limiter):
+        """Test that least recently used keys are evicted"""
+        limiter.max_local_keys = 2
+        policy = limiter.get_policy("test")
+        for key in ("a", "b", "c"):
+            limiter._hit_local(policy, key, 100.0)
+
+        assert list(limiter._local) == ["b", "c"]
+
+    @pytest.mark.asyncio
+    async def test_hit_uses_local_backend(self, limiter):
+        """Test the async entry point without Redis"""
+        allowed, remaining, retry_after_s = await limiter.hit("test", "user:1")
+
+        assert allowed
+        assert remaining == 2
+        assert retry_after_s == 0.0
+
+    @pytest.mark.asyncio
+    async def test_unknown_policy(self, limiter):
+        """Test that unknown policies are rejected"""
+        with pytest.raises(ValueError):
+            await limiter.hit("missing", "user:1")
+
+
+class TestRateLimitMiddleware:
+    """Test which requests the middleware limits"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        from fastapi import FastAPI
+        from fastapi.responses import StreamingResponse
+        from fastapi.testclient import TestClient
+        from app.middleware import rate_limit
+
+        class DenyTracks:
+            async def hit(self, policy_name, identity):
+                return policy_name != "track_create", 0, 30.0
+
+        monkeypatch.setattr(rate_limit, "get_rate_limiter", lambda: DenyTracks())
+        app = FastAPI()
+
+        @app.post("/api/providers/webhook/{name}")
+        @app.post("/api/stripe/webhook")
+        @app.post("/api/tracks")
+        def endpoint():
+            return {}
+
+        @app.get("/api/stream")
+        def stream():
+            return StreamingResponse(iter([b"a", b"b"]), media_type="text/event-stream")
+
+        app.add_middleware(rate_limit.RateLimitMiddleware)
+        return TestClient(app)
+
+    def test_callbacks_are_exempt(self, client):
+        """Test that provider and Stripe webhooks bypass rate limits"""
+        assert client.post("/api/providers/webhook/fal").status_code == 200
+        assert client.post("/api/stripe/webhook").status_code == 200
+
+    def test_api_requests_are_limited(self, client):
+        """Test that other API requests are still limited"""
+        response = client.post("/api/tracks")
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "30"
+
+    def test_allowed_streams_pass_through(self, client):
+        """Test that allowed streaming responses reach the client unchanged"""
+        response = client.get("/api/stream")
+        assert response.status_code == 200
+        assert response.content == b"ab"
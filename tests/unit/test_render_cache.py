@@ -0,0 +1,187 @@
+"""
+Unit tests for render cache keys and single-flight claims
+"""
+import pytest
+from unittest.mock import Mock, patch
+from app.services import render_cache
+from app.services.render_cache import RenderCache, render_cache_key
+from app.services.render_scheduler import RENDER_STORE_MARGIN_S, render_time_budget_s
+
+
+class TestRenderCacheKey:
+    """Test canonical render parameter hashing"""
+
+    @pytest.fixture
+    def params(self):
+        return {
+            "prompt": "lofi beat",
+            "duration_s": 30,
+            "lyrics": None,
+            "style_strength": 0.5,
+            "seed": 42,
+            "reference_url": None,
+        }
+
+    def test_unseeded_renders_are_not_cached(self, params):
+        """Test that renders without a seed have no cache key"""
+        params["seed"] = None
+        assert render_cache_key(params, "fal") is None
+
+    def test_key_is_order_independent(self, params):
+        """Test that parameter order doesn't change the key"""
+        reordered = dict(reversed(list(params.items())))
+        assert render_cache_key(params, "fal") == render_cache_key(reordered, "fal")
+
+    def test_key_depends_on_parameters_and_provider(self, params):
+        """Test that any determining input changes the key"""
+        key = render_cache_key(params, "fal")
+        assert key != render_cache_key(params, "replicate")
+        assert key != render_cache_key({**params, "seed": 43}, "fal")
+        assert key != render_cache_key({**params, "prompt": "lofi beats"}, "fal")
+
+    def test_style_strength_float_noise_ignored(self, params):
+        """Test that style strength is rounded before hashing"""
+        noisy = {**params, "style_strength": 0.5000000001}
+        assert render_cache_key(params, "fal") == render_cache_key(noisy, "fal")
+
+
+class TestRenderCoalescing:
+    """Test that single-flight coordination never blocks renders"""
+
+    @pytest.fixture
+    def cache(self, monkeypatch):
+        # Nothing listens here, so every Redis call fails
+        monkeypatch.setenv("REDIS_URL", "redis://127.0.0.1:1/0")
+        return RenderCache()
+
+    def test_unseeded_render_always_claims(self, cache):
+        """Test that unseeded renders skip coordination"""
+        assert cache.claim({"seed": None}, "fal", "task-1")
+
+    def test_claim_fails_open_without_redis(self, cache):
+        """Test that a Redis outage lets every render proceed"""
+        params = {"prompt": "lofi beat", "seed": 42, "style_strength": 0.5}
+        assert cache.claim(params, "fal", "task-1")
+        assert cache.wait(params, "fal", timeout=1) is None
+        assert cache.get(params, "fal") is None
+
+    def test_claim_outlives_longest_render(self, cache):
+        """Test that a claim can't expire while its leader is still within budget"""
+        longest_s = render_time_budget_s(3600, observed_latency_s=1e6) + RENDER_STORE_MARGIN_S
+        assert cache.inflight_ttl_s >= longest_s
+
+
+class FakeRedis:
+    """Just enough of redis-py for the single-flight claim (TTLs ignored)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def expire(self, key, ttl):
+        return int(key in self.data)
+
+    def zadd(self, *args, **kwargs):
+        return 0
+
+    def zremrangebyscore(self, *args):
+        return 0
+
+    def zcard(self, key):
+        return 0
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        def claim(keys, args):
+            current = self.data.get(keys[0])
+            if current is not None and current != args[0]:
+                return 0
+            self.data[keys[0]] = args[0]
+            return 1
+
+        def release(keys, args):
+            if self.data.get(keys[0]) == args[0]:
+                del self.data[keys[0]]
+                return 1
+            return 0
+
+        return claim if script == RenderCache.CLAIM_SCRIPT else release
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class TestSingleFlight:
+    """Test a waiter against a leader that renews its claim while resuming"""
+
+    @pytest.fixture
+    def cache(self, monkeypatch):
+        monkeypatch.setattr(render_cache.redis, "from_url", lambda *args, **kwargs: FakeRedis())
+        cache = RenderCache()
+        cache.poll_interval_s = 0.01
+        return cache
+
+    @pytest.fixture
+    def params(self):
+        return {"prompt": "lofi beat", "duration_s": 30, "seed": 42, "style_strength": 0.5}
+
+    def obtain(self, cache, params, owner):
+        from app.workers import generate_music
+
+        job = Mock(id=2, provider_ticket=None)
+        track = Mock(id=2, duration_s=30, provider="fal")
+        storage = Mock()
+        storage.copy_object.side_effect = lambda source, dest: f"https://cdn/{dest}"
+        with patch.object(generate_music, "get_render_cache", return_value=cache), \
+                patch.object(generate_music, "get_storage_service", return_value=storage), \
+                patch.object(generate_music, "render_time_budget_s", return_value=0.05), \
+                patch.object(generate_music, "render_with_fallback") as render:
+            try:
+                return generate_music.obtain_render(
+                    Mock(), Mock(), job, track, params, "tracks/2/b.mp3", owner=owner, events=Mock()
+                )
+            finally:
+                render.assert_not_called()
+
+    def test_same_owner_renews_claim(self, cache, params):
+        """Test that a resumed leader re-takes its own claim and others can't"""
+        assert cache.claim(params, "fal", "leader")
+        assert cache.claim(params, "fal", "leader")
+        assert not cache.claim(params, "fal", "waiter")
+
+    def test_waiter_never_renders_beside_resuming_leader(self, cache, params):
+        """Test that a waiter outlasted by the leader requeues instead of submitting"""
+        from app.workers.generate_music import RenderCoalescePending
+
+        assert cache.claim(params, "fal", "leader")
+        with pytest.raises(RenderCoalescePending):
+            self.obtain(cache, params, "waiter")
+
+        # The leader hits its deadline and resumes, renewing the claim
+        assert cache.claim(params, "fal", "leader")
+        with pytest.raises(RenderCoalescePending):
+            self.obtain(cache, params, "waiter")
+
+        # The resumed leader finishes and publishes its object
+        cache.put(params, "fal", "tracks/1/a.mp3")
+        cache.release(params, "fal", "leader", "tracks/1/a.mp3")
+        assert self.obtain(cache, params, "waiter") == "https://cdn/tracks/2/b.mp3"
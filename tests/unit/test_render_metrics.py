@@ -0,0 +1,34 @@
+"""
+Unit tests for render pipeline metrics
+"""
+import pytest
+from prometheus_client import REGISTRY
+from app.services.render_metrics import duration_bucket, stage_timer
+
+
+def stage_count(stage, provider, bucket):
+    return REGISTRY.get_sample_value(
+        "render_stage_duration_seconds_count",
+        {"stage": stage, "provider": provider, "duration_bucket": bucket},
+    ) or 0
+
+
+class TestRenderMetrics:
+    """Test stage timing and label bucketing"""
+
+    def test_duration_buckets(self):
+        """Test that track lengths map to a few fixed labels"""
+        assert duration_bucket(30) == "le30"
+        assert duration_bucket(31) == "le60"
+        assert duration_bucket(600) == "gt300"
+        assert duration_bucket(None) == "unknown"
+
+    def test_stage_timer_records_failures(self):
+        """Test that a failing stage is still observed and leaves no render in flight"""
+        before = stage_count("provider_render", "fal", "le60")
+        with pytest.raises(RuntimeError):
+            with stage_timer("provider_render", "fal", 45, in_flight=True):
+                assert REGISTRY.get_sample_value("render_in_flight", {"provider": "fal"}) == 1
+                raise RuntimeError("provider down")
+        assert stage_count("provider_render", "fal", "le60") == before + 1
+        assert REGISTRY.get_sample_value("render_in_flight", {"provider": "fal"}) == 0
@@ -0,0 +1,78 @@
+"""
+Unit tests for render queue routing
+"""
+import pytest
+from unittest.mock import Mock, patch
+from app.models.user import PlanType
+from app.services.render_scheduler import RenderScheduler, render_time_budget_s
+
+
+class TestRenderScheduler:
+    """Test plan routing and fair priorities"""
+
+    @pytest.fixture
+    def scheduler(self, monkeypatch):
+        # Nothing listens here, so the fairness counter is unavailable
+        monkeypatch.setenv("REDIS_URL", "redis://127.0.0.1:1/0")
+        return RenderScheduler()
+
+    def test_routes_by_plan(self, scheduler):
+        """Test that each plan gets its own queue"""
+        assert scheduler.queue_for(PlanType.ENTERPRISE, False) == "renders.enterprise"
+        assert scheduler.queue_for(PlanType.PRO, False) == "renders.pro"
+        assert scheduler.queue_for(PlanType.FREE, False) == "renders.free"
+
+    def test_free_mode_renders_use_free_queue(self, scheduler):
+        """Test that free mode renders never take paid capacity"""
+        assert scheduler.queue_for(PlanType.ENTERPRISE, True) == "renders.free"
+
+    def test_priority_drops_with_pending_renders(self, scheduler, monkeypatch):
+        """Test that a user's burst queues behind other users"""
+        pending = {}
+
+        class FakePipeline:
+            def incr(self, key):
+                pending[key] = pending.get(key, 0) + 1
+                self.value = pending[key]
+
+            def expire(self, key, ttl):
+                pass
+
+            def execute(self):
+                return [self.value, True]
+
+        monkeypatch.setattr(scheduler.redis_client, "pipeline", FakePipeline)
+        priorities = [scheduler.route(1, PlanType.PRO, False)["priority"] for _ in range(12)]
+
+        assert priorities[:3] == [0, 1, 2]
+        assert priorities[-1] == 9
+        assert scheduler.route(2, PlanType.PRO, False) == {"queue": "renders.pro", "priority": 0}
+
+    def test_route_fails_open_without_redis(self, scheduler):
+        """Test that a Redis outage still routes at top priority"""
+        assert scheduler.route(1, PlanType.FREE, False) == {"queue": "renders.free", "priority": 0}
+
+    def test_time_limits_scale_with_duration(self, scheduler):
+        """Test that long renders get longer limits than short ones"""
+        short = scheduler.route(1, PlanType.PRO, False, duration_s=10)
+        long = scheduler.route(1, PlanType.PRO, False, duration_s=240)
+
+        assert short["soft_time_limit"] < long["soft_time_limit"]
+        assert long["soft_time_limit"] < long["time_limit"]
+
+    def test_time_budget_widens_for_slow_provider(self):
+        """Test that observed latency raises the render budget"""
+        assert render_time_budget_s(30, observed_latency_s=200) > render_time_budget_s(30)
+
+    def test_worker_releases_slot_when_track_missing(self):
+        """Test that a task whose track is gone still frees the user's slot"""
+        from app.workers import generate_music
+
+        db = Mock()
+        db.query.return_value.filter.return_value.first.return_value = None
+        with patch.object(generate_music, "SessionLocal", return_value=db), \
+                patch.object(generate_music, "get_render_scheduler") as get_scheduler:
+            result = generate_music.generate_music_task.run(404, user_id=7)
+
+        assert result == {"error": "Track not found"}
+        get_scheduler.return_value.release.assert_called_once_with(7)
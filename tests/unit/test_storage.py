@@ -0,0 +1,51 @@
+"""
+Unit tests for storage service
+"""
+import pytest
+from unittest.mock import MagicMock, patch
+from app.services.storage import StorageService
+
+
+class TestUploadStream:
+    """Test bounded-buffer multipart uploads"""
+
+    @pytest.fixture
+    def service(self):
+        with patch("boto3.client"):
+            service = StorageService()
+        service.s3_client = MagicMock()
+        service.s3_client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+        service.s3_client.upload_part.side_effect = lambda **kwargs: {"ETag": f"etag-{kwargs['PartNumber']}"}
+        service.multipart_chunk_size = 10
+        return service
+
+    def test_small_stream_uses_single_put(self, service):
+        """Test that streams smaller than one part skip multipart"""
+        service.upload_stream([b"abc", b"def"], "tracks/1.mp3", content_type="audio/mpeg")
+
+        service.s3_client.put_object.assert_called_once_with(
+            Bucket="soundfoundry", Key="tracks/1.mp3", Body=b"abcdef", ContentType="audio/mpeg"
+        )
+        service.s3_client.create_multipart_upload.assert_not_called()
+
+    def test_large_stream_uploads_parts(self, service):
+        """Test that parts are cut at the configured size and completed in order"""
+        service.upload_stream([b"a" * 7, b"b" * 7, b"c" * 9], "tracks/2.mp3")
+
+        bodies = [c.kwargs["Body"] for c in service.s3_client.upload_part.call_args_list]
+        assert bodies == [b"a" * 7 + b"bbb", b"b" * 4 + b"c" * 6, b"ccc"]
+        parts = service.s3_client.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]
+        assert [p["PartNumber"] for p in parts] == [1, 2, 3]
+
+    def test_failure_aborts_multipart(self, service):
+        """Test that a failed stream aborts the multipart upload"""
+        def chunks():
+            yield b"x" * 12
+            raise IOError("connection reset")
+
+        with pytest.raises(IOError):
+            service.upload_stream(chunks(), "tracks/3.mp3")
+
+        service.s3_client.abort_multipart_upload.assert_called_once_with(
+            Bucket="soundfoundry", Key="tracks/3.mp3", UploadId="upload-1"
+        )